@@ -1,741 +1,4166 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import (Flask, Response, render_template, request, jsonify, redirect, url_for, flash, g,
+                   has_request_context, before_render_template, template_rendered)
+import numpy as np
 import psycopg
-import pandas as pd
-import plotly.express as px
-import plotly.utils
+from psycopg_pool import ConnectionPool, PoolTimeout
+import base64
+import csv
+import gzip
+import hashlib
+import importlib.util
+import io
 import json
-from datetime import datetime, timedelta
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
 app.secret_key = 'sua_chave_secreta_aqui'  # Necessário para flash messages
 
-# Configurações do banco de dados
+# Configurações do banco de dados (podem ser sobrescritas por variáveis de ambiente)
 DB_CONFIG = {
-    'host': 'englifeinfor.ddns.net',
-    'dbname': 'englife_db',
-    'user': 'englife',
-    'password': '449140',
-    'port': 4491,
+    'host': os.environ.get('DB_HOST', 'englifeinfor.ddns.net'),
+    'dbname': os.environ.get('DB_NAME', 'englife_db'),
+    'user': os.environ.get('DB_USER', 'englife'),
+    'password': os.environ.get('DB_PASSWORD', '449140'),
+    'port': int(os.environ.get('DB_PORT', 4491)),
     'connect_timeout': 5
 }
 
+# Configurações do pool de conexões (podem ser sobrescritas por variáveis de ambiente)
+POOL_CONFIG = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),          # espera máxima por uma conexão (s)
+    'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),  # recicla conexões antigas (s)
+    'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),       # fecha conexões ociosas excedentes (s)
+}
+
+# Consultas preparadas no servidor (PREPARE) e reaproveitadas por conexão;
+# desligar com DB_PREPARAR=0 atrás de um pgbouncer em modo transação
+DB_PREPARAR = os.environ.get('DB_PREPARAR', '1') == '1'
+
+# Conexões devolvidas ao pool há menos que isto (s) não são verificadas no
+# checkout: a verificação custa uma ida e volta ao banco
+POOL_VERIFICAR_APOS = float(os.environ.get('DB_POOL_VERIFICAR_APOS', 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+_devolucoes = weakref.WeakKeyDictionary()
+_emprestadas = 0    # conexões fora do pool, em blocos de get_db_connection
+_emprestadas_lock = threading.Lock()
+
+
+class DatabaseUnavailable(Exception):
+    """Não foi possível obter uma conexão com o banco de dados.
+
+    Marca a requisição corrente, para que as rotas de leitura sirvam a
+    última resposta boa (reserva_de_paginas).
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        if has_request_context():
+            g.banco_indisponivel = True
+
+
+def get_pool():
+    """Retorna o pool de conexões, criando-o no primeiro uso.
+
+    A criação é preguiçosa para que cada worker do gunicorn tenha o seu
+    próprio pool (as threads de manutenção não sobrevivem a um fork).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    kwargs=DB_CONFIG,
+                    configure=configurar_conexao,
+                    check=verificar_conexao,
+                    name='englife',
+                    open=True,
+                    **POOL_CONFIG
+                )
+    return _pool
+
+
+def marcar_devolucao(conn):
+    _devolucoes[conn] = time.monotonic()
+
+
+def conexao_recente(conn):
+    """Se a conexão voltou ao pool há menos de POOL_VERIFICAR_APOS s e depois da última queda do banco"""
+    devolvida = _devolucoes.get(conn)
+    return (devolvida is not None and devolvida > disjuntor_banco.fechado_em
+            and time.monotonic() - devolvida < POOL_VERIFICAR_APOS)
+
+
+def verificar_conexao(conn):
+    """Verificação do pool no checkout, só para conexões ociosas há algum tempo"""
+    if not conexao_recente(conn):
+        ConnectionPool.check_connection(conn)
+
+
+def emprestar(delta):
+    global _emprestadas
+    with _emprestadas_lock:
+        _emprestadas += delta
+
+
+def pool_esgotado(pool):
+    """Se todas as conexões do pool estão emprestadas (ocupado, não sem banco).
+
+    O pool_size das estatísticas do pool conta também as conexões que ele
+    ainda tenta abrir, então não distingue o pool cheio do banco fora do ar.
+    """
+    return _emprestadas >= pool.max_size
+
+
+@contextmanager
 def get_db_connection():
-    """Estabelece conexão com o banco de dados"""
+    """Empresta uma conexão do pool e a devolve ao final do bloco.
+
+    Faz commit se o bloco terminar sem erro e rollback caso contrário; a
+    conexão volta ao pool em qualquer caminho de execução. Com o circuito
+    do disjuntor_banco aberto, levanta DatabaseUnavailable sem tentar.
+    Timeout com o pool apenas ocupado também levanta DatabaseUnavailable,
+    mas não conta como falha do banco para o disjuntor.
+    """
+    pool = get_pool()
+    if disjuntor_banco.aberto:
+        # Falha na hora em vez de esperar o timeout de conexão
+        raise DatabaseUnavailable('circuito aberto: banco indisponível')
+
+    inicio = time.perf_counter()
+    try:
+        conn = pool.getconn()
+    except PoolTimeout as e:
+        if pool_esgotado(pool):
+            # Banco respondendo, só sem conexão livre: não abre o circuito
+            METRICA_CONEXAO_FALHAS.incrementar(1, 'pool_esgotado')
+        else:
+            METRICA_CONEXAO_FALHAS.incrementar(1, 'banco')
+            disjuntor_banco.registrar_falha(e)
+        print(f"Erro na conexão: {e}")
+        raise DatabaseUnavailable(str(e)) from e
+    except psycopg.OperationalError as e:
+        METRICA_CONEXAO_FALHAS.incrementar(1, 'banco')
+        disjuntor_banco.registrar_falha(e)
+        print(f"Erro na conexão: {e}")
+        raise DatabaseUnavailable(str(e)) from e
+    METRICA_CONEXAO.observar(time.perf_counter() - inicio)
+    emprestar(1)
+
     try:
-        conn = psycopg.connect(**DB_CONFIG)
-        return conn
+        yield conn
+        conn.commit()
+        disjuntor_banco.registrar_sucesso()
+    except BaseException as e:
+        try:
+            conn.rollback()
+        except psycopg.Error:
+            pass
+        if conn.broken:
+            # Conexão perdida no meio do bloco: também conta como banco indisponível
+            disjuntor_banco.registrar_falha(e)
+            raise DatabaseUnavailable(str(e)) from e
+        raise
+    finally:
+        emprestar(-1)
+        marcar_devolucao(conn)
+        pool.putconn(conn)
+
+
+def executar_em_pipeline(consultas):
+    """Executa as consultas em uma única ida e volta ao banco; retorna as linhas de cada uma.
+
+    Cada consulta é um SQL ou uma tupla (sql, params). A conexão fica em
+    autocommit e as consultas vão juntas em pipeline, sem BEGIN/COMMIT: o
+    servidor as executa em uma transação implícita até o Sync do fim do
+    pipeline, desfeita por inteiro se alguma falhar. Com DB_PREPARAR, são
+    preparadas no servidor no primeiro uso e reaproveitadas pela conexão.
+
+    No pipeline o execute() só enfileira: o tempo de execução é medido do
+    envio até o Sync, uma vez para o bloco inteiro (ver registrar_pipeline).
+    """
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        cursores = []
+        inicio = time.perf_counter()
+        try:
+            with conn.pipeline():
+                for consulta in consultas:
+                    sql, params = consulta if isinstance(consulta, tuple) else (consulta, None)
+                    cursor = conn.cursor()
+                    cursor.em_pipeline = True
+                    cursor.execute(sql, params, prepare=DB_PREPARAR or None)
+                    cursores.append(cursor)
+        finally:
+            conn.autocommit = False
+            registrar_pipeline(cursores, time.perf_counter() - inicio)
+        # Comandos sem RETURNING não têm linhas
+        return [cursor.fetchall() if cursor.description else [] for cursor in cursores]
+
+
+def consultar(*consultas):
+    """Consultas de leitura independentes em uma ida e volta; linhas de cada uma, na ordem"""
+    return executar_em_pipeline(consultas)
+
+
+def executar(*comandos):
+    """Comandos de escrita em uma ida e volta, todos ou nenhum; linhas do RETURNING de cada um"""
+    return executar_em_pipeline(comandos)
+
+
+def get_pool_stats():
+    """Estatísticas do pool: conexões em uso, espera e tempo de checkout"""
+    if _pool is None:
+        return {'aberto': False, 'circuito_aberto': disjuntor_banco.aberto}
+
+    stats = _pool.get_stats()
+    pool_size = stats.get('pool_size', 0)
+    pool_available = stats.get('pool_available', 0)
+    requests_num = stats.get('requests_num', 0)
+    requests_wait_ms = stats.get('requests_wait_ms', 0)
+
+    return {
+        'aberto': True,
+        'min_size': _pool.min_size,
+        'max_size': _pool.max_size,
+        'conexoes_abertas': pool_size,
+        'conexoes_disponiveis': pool_available,
+        'conexoes_em_uso': pool_size - pool_available,
+        'requisicoes_aguardando': stats.get('requests_waiting', 0),
+        'requisicoes_total': requests_num,
+        'requisicoes_enfileiradas': stats.get('requests_queued', 0),
+        'requisicoes_timeout': stats.get('requests_errors', 0),
+        'espera_checkout_total_ms': requests_wait_ms,
+        'espera_checkout_media_ms': round(requests_wait_ms / requests_num, 2) if requests_num else 0,
+        'conexoes_criadas': stats.get('connections_num', 0),
+        'conexoes_perdidas': stats.get('connections_lost', 0),
+        'erros_conexao': stats.get('connections_errors', 0),
+        'circuito_aberto': disjuntor_banco.aberto,
+    }
+
+# =============================================
+# MÉTRICAS
+# =============================================
+
+# Consultas que levam mais que isto (ms) são registradas no log
+CONSULTA_LENTA_MS = float(os.environ.get('CONSULTA_LENTA_MS', 500))
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def rotulos_prometheus(nomes, valores):
+    if not nomes:
+        return ''
+    pares = []
+    for nome, valor in zip(nomes, valores):
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nome}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+class Contador:
+    """Contador monotônico por combinação de rótulos, no formato do Prometheus"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, quantidade=1, *rotulos):
+        with self._lock:
+            self._series[rotulos] = self._series.get(rotulos, 0) + quantidade
+
+    def _amostras(self):
+        with self._lock:
+            series = list(self._series.items())
+        for rotulos, valor in series:
+            yield f"{self.nome}{rotulos_prometheus(self.rotulos, rotulos)} {valor}"
+
+    def exportar(self):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} {self.tipo}"
+        yield from self._amostras()
+
+
+class Histograma(Contador):
+    """Histograma cumulativo: uma contagem por bucket mais soma e total de observações"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = buckets
+
+    def observar(self, valor, *rotulos):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                # Contagens por bucket, bucket +Inf e soma
+                serie = self._series[rotulos] = [0] * (len(self.buckets) + 1) + [0.0]
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def _amostras(self):
+        with self._lock:
+            series = [(rotulos, list(serie)) for rotulos, serie in self._series.items()]
+        nomes = self.rotulos + ('le',)
+        for rotulos, serie in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ('+Inf',), serie):
+                acumulado += contagem
+                yield f"{self.nome}_bucket{rotulos_prometheus(nomes, rotulos + (limite,))} {acumulado}"
+            yield f"{self.nome}_sum{rotulos_prometheus(self.rotulos, rotulos)} {serie[-1]}"
+            yield f"{self.nome}_count{rotulos_prometheus(self.rotulos, rotulos)} {acumulado}"
+
+
+METRICA_REQUISICOES = Histograma('englife_http_requisicao_segundos',
+                                 'Duração das requisições por endpoint',
+                                 ('endpoint', 'metodo', 'status'))
+METRICA_TEMPLATES = Histograma('englife_template_segundos',
+                               'Tempo de renderização dos templates', ('template',))
+METRICA_CONEXAO = Histograma('englife_db_conexao_espera_segundos',
+                             'Espera para obter uma conexão do pool')
+METRICA_CONEXAO_FALHAS = Contador('englife_db_conexao_falhas_total',
+                                  'Conexões não obtidas (pool esgotado ou banco inacessível)', ('motivo',))
+METRICA_CONSULTAS = Histograma('englife_db_consulta_segundos',
+                               'Tempo de execução das consultas; as enviadas juntas em pipeline são '
+                               'medidas como um bloco, do envio ao Sync, com os nomes unidos por "+"',
+                               ('origem', 'consulta'))
+METRICA_LEITURA = Histograma('englife_db_leitura_segundos',
+                             'Tempo de fetch e conversão das linhas', ('origem', 'consulta'))
+METRICA_LINHAS = Contador('englife_db_linhas_total',
+                          'Linhas retornadas pelas consultas', ('origem', 'consulta'))
+METRICA_LENTAS = Contador('englife_db_consultas_lentas_total',
+                          f'Consultas acima de {CONSULTA_LENTA_MS:g} ms', ('origem', 'consulta'))
+
+METRICA_RESERVA = Contador('englife_respostas_desatualizadas_total',
+                           'Respostas servidas da reserva de páginas com o banco indisponível', ('endpoint',))
+METRICA_ALERTAS_FALHAS = Contador('englife_alertas_falhas_total',
+                                  'Lotes de leituras gravados cuja avaliação de alertas falhou')
+
+METRICAS = [METRICA_REQUISICOES, METRICA_TEMPLATES, METRICA_CONEXAO, METRICA_CONEXAO_FALHAS,
+            METRICA_CONSULTAS, METRICA_LEITURA, METRICA_LINHAS, METRICA_LENTAS, METRICA_RESERVA,
+            METRICA_ALERTAS_FALHAS]
+
+# Primeira tabela após FROM/INTO/UPDATE/JOIN (ignora colunas como EXTRACT(EPOCH FROM ls.timestamp))
+RE_TABELA = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_]\w*)(?![\w.])', re.IGNORECASE)
+
+
+# Nome explícito da consulta em um comentário inicial: /* ultimas_leituras */ SELECT ...
+RE_NOME_CONSULTA = re.compile(r'\s*/\*\s*(\w+)\s*\*/')
+
+
+@lru_cache(maxsize=512)
+def nome_consulta(sql):
+    """Nome estável da consulta para as métricas.
+
+    Usa o comentário inicial quando existe; senão, verbo e primeira tabela
+    ("select leituras_sensores").
+    """
+    nomeada = RE_NOME_CONSULTA.match(sql)
+    if nomeada:
+        return nomeada.group(1)
+    palavras = sql.split(None, 1)
+    verbo = palavras[0].lower() if palavras else ''
+    tabela = RE_TABELA.search(sql)
+    return f"{verbo} {tabela.group(1)}" if tabela else verbo
+
+
+def origem_consulta():
+    """Endpoint da requisição ou, fora dela, o nome da thread (tarefas de fundo)"""
+    if has_request_context():
+        return request.endpoint or 'desconhecido'
+    return threading.current_thread().name
+
+
+def registrar_consulta(consulta, segundos, sql):
+    METRICA_CONSULTAS.observar(segundos, *consulta)
+    if segundos * 1000 >= CONSULTA_LENTA_MS:
+        METRICA_LENTAS.incrementar(1, *consulta)
+        print(f"Consulta lenta ({segundos * 1000:.0f} ms) em {consulta[0]}: {' '.join(sql.split())[:300]}")
+
+
+def registrar_pipeline(cursores, segundos):
+    """Registra o tempo de um pipeline como uma consulta só, nomeada "a+b+..." pelas consultas dele"""
+    cursores = [cursor for cursor in cursores if cursor._consulta is not None]
+    if cursores:
+        consulta = (cursores[0]._consulta[0], '+'.join(cursor._consulta[1] for cursor in cursores))
+        registrar_consulta(consulta, segundos, '; '.join(cursor._sql for cursor in cursores))
+
+
+def registrar_leitura(consulta, inicio, linhas):
+    if consulta is not None:
+        METRICA_LEITURA.observar(time.perf_counter() - inicio, *consulta)
+        METRICA_LINHAS.incrementar(linhas, *consulta)
+
+
+class MedicaoCursor:
+    """Mede tempo de execução, tempo de leitura e linhas de cada consulta do cursor.
+
+    Com `em_pipeline`, o execute() só enfileira a consulta; quem abriu o
+    pipeline registra o tempo de execução (registrar_pipeline).
+    """
+
+    _consulta = None
+    _sql = ''
+    em_pipeline = False
+
+    def execute(self, query, params=None, **kwargs):
+        sql = query if isinstance(query, str) else str(query)
+        if not sql.strip():
+            # Verificação de conexão do pool (check_connection)
+            return super().execute(query, params, **kwargs)
+        self._consulta = (origem_consulta(), nome_consulta(sql))
+        if self.em_pipeline:
+            self._sql = sql
+            return super().execute(query, params, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            registrar_consulta(self._consulta, time.perf_counter() - inicio, sql)
+
+    def executemany(self, query, params_seq, **kwargs):
+        sql = query if isinstance(query, str) else str(query)
+        self._consulta = (origem_consulta(), nome_consulta(sql))
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            registrar_consulta(self._consulta, time.perf_counter() - inicio, sql)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        registrar_leitura(self._consulta, inicio, linha is not None)
+        return linha
+
+    def fetchmany(self, size=0):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(size)
+        registrar_leitura(self._consulta, inicio, len(linhas))
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        registrar_leitura(self._consulta, inicio, len(linhas))
+        return linhas
+
+
+class CursorMedido(MedicaoCursor, psycopg.Cursor):
+    pass
+
+
+class CursorServidorMedido(MedicaoCursor, psycopg.ServerCursor):
+    pass
+
+
+def configurar_conexao(conn):
+    """Configuração de cada conexão nova do pool: cursores instrumentados e preparo de consultas"""
+    conn.cursor_factory = CursorMedido
+    conn.server_cursor_factory = CursorServidorMedido
+    if not DB_PREPARAR:
+        conn.prepare_threshold = None
+
+
+@app.before_request
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+
+@app.after_request
+def registrar_requisicao(response):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is not None:
+        METRICA_REQUISICOES.observar(time.perf_counter() - inicio, request.endpoint or 'desconhecido',
+                                     request.method, response.status_code)
+    return response
+
+
+def iniciar_medicao_template(sender, template, context, **extra):
+    g.setdefault('inicio_templates', []).append(time.perf_counter())
+
+
+def registrar_template(sender, template, context, **extra):
+    inicios = g.get('inicio_templates')
+    if inicios:
+        METRICA_TEMPLATES.observar(time.perf_counter() - inicios.pop(), template.name or 'inline')
+
+
+before_render_template.connect(iniciar_medicao_template, app)
+template_rendered.connect(registrar_template, app)
+
+# =============================================
+# TAREFAS DE FUNDO
+# =============================================
+
+class TarefaPeriodica:
+    """Executa `executar()` em uma thread daemon a cada `intervalo` segundos.
+
+    A thread só é criada em `iniciar()`, chamado no primeiro uso, para que
+    cada worker do gunicorn tenha a sua. `acordar()` antecipa a próxima
+    execução.
+    """
+
+    nome = 'tarefa'
+    executar_ao_iniciar = False
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def executar(self):
+        raise NotImplementedError
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name=self.nome, daemon=True)
+                    self._thread.start()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def _loop(self):
+        if self.executar_ao_iniciar:
+            self._acordar.set()
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.executar()
+            except Exception as e:
+                print(f"Erro na tarefa {self.nome}: {e}")
+
+# =============================================
+# SNAPSHOT DE ESTATÍSTICAS DO DASHBOARD
+# =============================================
+
+# Intervalo (s) entre atualizações do snapshot pela thread de fundo
+STATS_REFRESH_INTERVAL = float(os.environ.get('STATS_REFRESH_INTERVAL', 15))
+
+
+class StatsSnapshot(TarefaPeriodica):
+    """Contadores do dashboard calculados em uma única consulta e servidos da memória.
+
+    Uma thread de fundo recalcula o snapshot a cada `intervalo` segundos.
+    `invalidate()` descarta o snapshot atual para que a próxima leitura já
+    reflita os cadastros recém-salvos.
+    """
+
+    nome = 'stats-snapshot'
+
+    QUERY = """
+        /* stats_snapshot */
+        SELECT
+            COUNT(*) AS total_dispositivos,
+            COUNT(*) FILTER (WHERE d.tipo = 'alimentador') AS total_alimentadores,
+            COUNT(*) FILTER (WHERE d.tipo = 'datalogger') AS total_dataloggers,
+            COUNT(*) FILTER (WHERE d.online = true) AS dispositivos_online,
+            (SELECT COUNT(*) FROM localizacoes) AS total_localizacoes,
+            (SELECT COUNT(*) FROM alertas WHERE resolvido = false) AS alertas_ativos,
+            ({temperatura_media}) AS temperatura_media
+        FROM dispositivos d
+    """
+
+    TEMPERATURA_MEDIA_BRUTA = """
+        SELECT AVG(valor) FROM leituras_sensores
+        WHERE timestamp >= NOW() - INTERVAL '10 minutes'
+    """
+
+    TEMPERATURA_MEDIA_ROLLUP = """
+        SELECT SUM(soma) / NULLIF(SUM(contagem), 0) FROM leituras_rollup_1m
+        WHERE bucket >= date_trunc('minute', NOW() - INTERVAL '10 minutes')
+    """
+
+    def __init__(self, intervalo):
+        super().__init__(intervalo)
+        self._dados = None
+        self._atualizado_em = None
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def _calcular(self):
+        # Usa o rollup de 1 minuto quando ele já estiver disponível
+        media = self.TEMPERATURA_MEDIA_ROLLUP if rollup_worker.pronto else self.TEMPERATURA_MEDIA_BRUTA
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.QUERY.format(temperatura_media=media))
+            row = cursor.fetchone()
+            colunas = [desc.name for desc in cursor.description]
+            cursor.close()
+
+        dados = dict(zip(colunas, row))
+        dados['temperatura_media'] = round(float(dados['temperatura_media'] or 0), 2)
+        return dados
+
+    def refresh(self):
+        """Recalcula o snapshot; descarta o resultado se houve invalidação no meio"""
+        with self._lock:
+            geracao = self._geracao
+
+        dados = self._calcular()
+
+        with self._lock:
+            if geracao == self._geracao:
+                self._dados = dados
+                self._atualizado_em = datetime.now()
+        return dados
+
+    executar = refresh
+
+    def invalidate(self):
+        """Descarta o snapshot atual e acorda a thread de atualização"""
+        with self._lock:
+            self._geracao += 1
+            self._dados = None
+        self.acordar()
+
+    def get(self):
+        """Retorna o snapshot atual, calculando-o se ainda não existir"""
+        self.iniciar()
+        dados = self._dados
+        if dados is None:
+            dados = self.refresh()
+        return dados
+
+    @property
+    def atualizado_em(self):
+        return self._atualizado_em
+
+
+stats_snapshot = StatsSnapshot(STATS_REFRESH_INTERVAL)
+
+# =============================================
+# CACHE DE METADADOS
+# =============================================
+
+# Validade (s) das entradas, para captar alterações feitas fora da aplicação
+METADADOS_TTL = float(os.environ.get('METADADOS_TTL', 300))
+
+
+class CacheMetadados:
+    """Cache em processo dos dados de referência usados em formulários e filtros.
+
+    Cada entrada tem a sua consulta; é invalidada pelo `salvar_*`
+    correspondente e expira após `ttl` segundos.
+    """
+
+    CONSULTAS = {
+        'localizacoes': "SELECT id, nome FROM localizacoes ORDER BY nome",
+        'nomes_localizacoes': "SELECT DISTINCT nome FROM localizacoes ORDER BY nome",
+        'posicoes_sensores': "SELECT DISTINCT posicao FROM sensores ORDER BY posicao",
+        'contexto_sensores': """
+            SELECT s.id, l.nome, s.posicao, dev.nome
+            FROM sensores s
+            JOIN dataloggers d ON s.datalogger_id = d.id
+            JOIN dispositivos dev ON d.dispositivo_id = dev.id
+            JOIN localizacoes l ON dev.localizacao_id = l.id
+        """,
+        'dataloggers': """
+            SELECT d.id, dev.nome, l.nome
+            FROM dataloggers d
+            JOIN dispositivos dev ON d.dispositivo_id = dev.id
+            JOIN localizacoes l ON dev.localizacao_id = l.id
+            ORDER BY dev.nome
+        """,
+        'alimentadores': """
+            SELECT a.id, dev.nome, l.nome
+            FROM alimentadores a
+            JOIN dispositivos dev ON a.dispositivo_id = dev.id
+            JOIN localizacoes l ON dev.localizacao_id = l.id
+            ORDER BY dev.nome
+        """,
+    }
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entradas = {}
+        self._geracoes = dict.fromkeys(self.CONSULTAS, 0)
+        self._lock = threading.Lock()
+
+    def obter(self, nome):
+        """Linhas da entrada `nome`, consultando o banco só se não houver cópia válida"""
+        entrada = self._entradas.get(nome)
+        if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+            return entrada[1]
+
+        with self._lock:
+            geracao = self._geracoes[nome]
+
+        linhas, = consultar(self.CONSULTAS[nome])
+
+        with self._lock:
+            # Não guarda o resultado se a entrada foi invalidada durante a consulta
+            if geracao == self._geracoes[nome]:
+                self._entradas[nome] = (time.monotonic(), linhas)
+        return linhas
+
+    def invalidate(self, *nomes):
+        with self._lock:
+            for nome in nomes:
+                self._geracoes[nome] += 1
+                self._entradas.pop(nome, None)
+
+
+cache_metadados = CacheMetadados(METADADOS_TTL)
+
+
+class DimensaoSensores:
+    """Dimensão de contexto dos sensores: sensor_id -> (localização, posição, datalogger).
+
+    As consultas de leituras tocam só `leituras_sensores` (ou os rollups) e
+    as linhas são enriquecidas aqui, em vez de repetir em cada consulta o join
+    com sensores, dataloggers, dispositivos e localizações. Os dados vêm da
+    entrada 'contexto_sensores' de cache_metadados (invalidada pelos
+    cadastros); os índices derivados só são refeitos quando ela muda.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._estado = (None, None)
+
+    def _montar(self, linhas):
+        contexto = {sensor_id: (localizacao, posicao, datalogger)
+                    for sensor_id, localizacao, posicao, datalogger in linhas}
+
+        # Grupos dos gráficos na mesma ordem do ORDER BY do banco (NULLs por último)
+        def ordem(valor):
+            return (valor is None, valor or '')
+
+        grupos = sorted({(loc, pos) for loc, pos, _ in contexto.values()},
+                        key=lambda grupo: (grupo[0], ordem(grupo[1])))
+        tipos = sorted({pos for _, pos, _ in contexto.values()}, key=ordem)
+        indice_grupo = {grupo: i for i, grupo in enumerate(grupos)}
+        indice_tipo = {tipo: i for i, tipo in enumerate(tipos)}
+        sensores = list(contexto)
+
+        return {
+            'contexto': contexto,
+            'ausentes': set(),
+            'grupos': grupos,
+            'tipos': tipos,
+            'parametros': {
+                'sensores': sensores,
+                'grupos': [indice_grupo[contexto[s][:2]] for s in sensores],
+                'tipos': [indice_tipo[contexto[s][1]] for s in sensores],
+            },
+        }
+
+    def _indices(self):
+        linhas = self._cache.obter('contexto_sensores')
+        origem, indices = self._estado
+        if origem is not linhas:
+            indices = self._montar(linhas)
+            self._estado = (linhas, indices)
+        return indices
+
+    def contexto(self, sensor_ids=()):
+        """Mapa sensor_id -> (localização, posição, datalogger).
+
+        Se algum dos `sensor_ids` não estiver no mapa (sensor cadastrado por
+        outro processo), recarrega uma vez; sensores sem localização
+        continuam de fora, como no join que a dimensão substitui.
+        """
+        indices = self._indices()
+        faltando = set(sensor_ids) - indices['contexto'].keys() - indices['ausentes']
+        if faltando:
+            self._cache.invalidate('contexto_sensores')
+            indices = self._indices()
+            indices['ausentes'].update(faltando - indices['contexto'].keys())
+        return indices['contexto']
+
+    def sensores(self, localizacao='', tipo=''):
+        """sensor_ids com a localização e/ou posição pedidas"""
+        return [sensor_id for sensor_id, (loc, posicao, _) in self.contexto().items()
+                if (not localizacao or loc == localizacao) and (not tipo or posicao == tipo)]
+
+    def graficos(self):
+        """(parâmetros, grupos, tipos) das consultas dos gráficos.
+
+        Os parâmetros `sensores`, `grupos` e `tipos` são arrays paralelos que
+        associam cada sensor ao índice do seu grupo (localização, posição) e
+        do seu tipo; o banco agrupa por esses índices.
+        """
+        indices = self._indices()
+        return indices['parametros'], indices['grupos'], indices['tipos']
+
+
+dimensao_sensores = DimensaoSensores(cache_metadados)
+
+# =============================================
+# VERSÕES DOS DADOS (GET CONDICIONAL)
+# =============================================
+
+# Passo (s) em que expiram os ETags de páginas com janela relativa a NOW()
+ETAG_JANELA = int(os.environ.get('ETAG_JANELA', 60))
+
+_versoes_disponiveis = None
+
+
+def versoes_disponiveis():
+    """Se a tabela versoes_dados (migração 007) existe; sem ela as páginas não usam ETag"""
+    global _versoes_disponiveis
+    if _versoes_disponiveis is None:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass('versoes_dados') IS NOT NULL")
+            _versoes_disponiveis = cursor.fetchone()[0]
+            cursor.close()
+    return _versoes_disponiveis
+
+
+def consulta_versao(leituras=False):
+    """Consulta de uma linha: (versão dos cadastros, última alteração[, maior id de leitura])"""
+    colunas = "versao, atualizado_em"
+    if leituras:
+        colunas += ", (SELECT max(id) FROM leituras_sensores)"
+    return f"/* versao_dados */ SELECT {colunas} FROM versoes_dados WHERE nome = 'cadastros'"
+
+
+def versao_atual(leituras=False):
+    """Linha de consulta_versao, ou None sem a migração 007"""
+    if not versoes_disponiveis():
+        return None
+    linhas, = consultar(consulta_versao(leituras))
+    return linhas[0] if linhas else None
+
+
+def consultar_com_versao(*consultas, leituras=False):
+    """(linha de versão, linhas de cada consulta), em uma ida e volta quando possível.
+
+    Sem If-None-Match/If-Modified-Since não há como responder 304: a versão vai
+    no mesmo pipeline que as consultas. Com eles, só a versão é consultada e as
+    linhas voltam como None; a rota chama consultar() se não responder 304.
+    """
+    if not versoes_disponiveis():
+        return None, None
+    if request.if_none_match or request.if_modified_since:
+        return versao_atual(leituras), None
+    versao, *resultados = consultar(consulta_versao(leituras), *consultas)
+    return (versao[0] if versao else None), resultados
+
+
+def calcular_etag(*partes):
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()[:20]
+
+
+def etag_leituras(versao, args):
+    """ETag da página de leituras: versões, filtros e, em janelas relativas, o passo de ETAG_JANELA"""
+    passo = None if (args.get('de') or args.get('ate')) else int(time.time() // ETAG_JANELA)
+    return calcular_etag('leituras', versao[0], versao[2], sorted(args.items(multi=True)), passo)
+
+
+def etag_graficos(versao, horas, largura, bucket):
+    """ETag de /api/graficos: versões, janela e o bucket corrente (a janela anda com NOW())"""
+    return calcular_etag('graficos', versao[0], versao[2], horas, largura, int(time.time() // bucket),
+                         rollup_worker.pronto)
+
+
+def marcar_versao(resposta, etag, ultima_alteracao=None):
+    """Adiciona ETag (fraco), Last-Modified e revalidação obrigatória à resposta"""
+    resposta = app.make_response(resposta)
+    resposta.set_etag(etag, weak=True)
+    if ultima_alteracao is not None:
+        resposta.last_modified = ultima_alteracao
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+
+def nao_modificado(etag, ultima_alteracao=None):
+    """Resposta 304 se o cliente já tem esta versão (If-None-Match ou If-Modified-Since), senão None"""
+    if request.if_none_match:
+        if not request.if_none_match.contains_weak(etag):
+            return None
+    elif (ultima_alteracao is None or request.if_modified_since is None
+          or ultima_alteracao.replace(microsecond=0) > request.if_modified_since):
+        return None
+    return marcar_versao(Response(status=304), etag, ultima_alteracao)
+
+# =============================================
+# COMPRESSÃO DAS RESPOSTAS
+# =============================================
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSAO_MINIMA = int(os.environ.get('COMPRESSAO_MINIMA', 1024))   # bytes
+COMPRESSAO_NIVEL_GZIP = 6
+COMPRESSAO_NIVEL_BROTLI = 5
+TIPOS_COMPRIMIVEIS = {'text/html', 'text/plain', 'text/css', 'text/csv', 'application/json',
+                      'application/javascript'}
+
+
+@app.after_request
+def comprimir_resposta(response):
+    """Comprime com brotli (se instalado) ou gzip as respostas acima de COMPRESSAO_MINIMA bytes.
+
+    Respostas transmitidas (NDJSON, SSE) e arquivos estáticos passam direto.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in TIPOS_COMPRIMIVEIS):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        codificacao = 'br'
+    elif aceitas['gzip']:
+        codificacao = 'gzip'
+    else:
+        return response
+
+    corpo = response.get_data()
+    if len(corpo) < COMPRESSAO_MINIMA:
+        return response
+
+    if codificacao == 'br':
+        corpo = brotli.compress(corpo, quality=COMPRESSAO_NIVEL_BROTLI)
+    else:
+        corpo = gzip.compress(corpo, compresslevel=COMPRESSAO_NIVEL_GZIP)
+    response.set_data(corpo)
+    response.headers['Content-Encoding'] = codificacao
+
+    # A versão comprimida não é idêntica byte a byte: um ETag forte passa a fraco
+    etag, fraco = response.get_etag()
+    if etag and not fraco:
+        response.set_etag(etag, weak=True)
+    return response
+
+# =============================================
+# DISJUNTOR DO BANCO E RESERVA DE PÁGINAS
+# =============================================
+
+DISJUNTOR_FALHAS = int(os.environ.get('DISJUNTOR_FALHAS', 3))            # falhas seguidas para abrir
+DISJUNTOR_SONDA = float(os.environ.get('DISJUNTOR_SONDA', 5))            # s entre sondas com o circuito aberto
+RESERVA_MAX_BYTES = int(os.environ.get('RESERVA_MAX_BYTES', 50 * 1024 * 1024))
+
+# Rotas de leitura que servem a última resposta boa com o banco indisponível
+ROTAS_COM_RESERVA = {'dashboard', 'dispositivos', 'alimentadores', 'dataloggers', 'leituras',
+                     'api_graficos', 'lista_cadastros', 'api_estatisticas', 'api_agenda_alimentador'}
+
+# Ponto de base.html onde entra o aviso de dados desatualizados
+MARCADOR_AVISO = b'<!-- aviso-dados-desatualizados -->'
+
+
+class DisjuntorBanco(TarefaPeriodica):
+    """Circuit breaker do acesso ao banco.
+
+    Após `limite` falhas de conexão seguidas o circuito abre: get_db_connection
+    falha na hora, sem esperar o timeout de conexão, e as rotas de leitura
+    servem a reserva de páginas. Com o circuito aberto, a thread de fundo sonda
+    o banco com uma conexão avulsa a cada `intervalo` segundos e fecha o
+    circuito na primeira sonda bem-sucedida.
+    """
+
+    nome = 'disjuntor-banco'
+
+    def __init__(self, intervalo, limite):
+        super().__init__(intervalo)
+        self.limite = limite
+        self.aberto_desde = None
+        self.fechado_em = 0.0    # time.monotonic() do último fechamento
+        self._falhas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self):
+        return self.aberto_desde is not None
+
+    def registrar_sucesso(self):
+        if self._falhas:
+            with self._lock:
+                self._falhas = 0
+
+    def registrar_falha(self, erro):
+        with self._lock:
+            self._falhas += 1
+            if self.aberto or self._falhas < self.limite:
+                return
+            self.aberto_desde = time.time()
+        print(f"Erro: banco indisponível após {self.limite} falhas seguidas, circuito aberto ({erro})")
+        self.iniciar()
+
+    def executar(self):
+        if not self.aberto:
+            return
+        try:
+            with psycopg.connect(**DB_CONFIG) as conn:
+                conn.execute("SELECT 1")
+        except psycopg.Error:
+            return
+
+        with self._lock:
+            self._falhas = 0
+            self.aberto_desde = None
+            # Conexões devolvidas ao pool antes disto voltam a ser verificadas no checkout
+            self.fechado_em = time.monotonic()
+        print("Banco disponível novamente, circuito fechado")
+
+
+disjuntor_banco = DisjuntorBanco(DISJUNTOR_SONDA, DISJUNTOR_FALHAS)
+
+
+class ReservaPaginas:
+    """Última resposta 200 de cada URL das rotas de leitura, em memória (LRU por bytes).
+
+    Quando a rota falha por banco indisponível, a cópia guardada é servida com
+    Age, Warning 110 e, nas páginas HTML, um aviso com a hora dos dados.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._paginas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def guardar(self, chave, resposta):
+        corpo = resposta.get_data()
+        with self._lock:
+            anterior = self._paginas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._paginas[chave] = (time.time(), corpo, resposta.content_type)
+            self._bytes += len(corpo)
+            while self._bytes > self.max_bytes and self._paginas:
+                self._bytes -= len(self._paginas.popitem(last=False)[1][1])
+
+    def responder(self, chave):
+        """Resposta marcada como desatualizada com a cópia guardada, ou None"""
+        with self._lock:
+            entrada = self._paginas.get(chave)
+        if entrada is None:
+            return None
+
+        guardada_em, corpo, content_type = entrada
+        hora = datetime.fromtimestamp(guardada_em).strftime('%d/%m/%Y %H:%M:%S')
+        if content_type.startswith('text/html'):
+            aviso = ('<div class="alert alert-warning" role="alert">'
+                     '<i class="fas fa-exclamation-triangle"></i> '
+                     f'Banco de dados indisponível: exibindo os dados de {hora}.</div>')
+            corpo = corpo.replace(MARCADOR_AVISO, aviso.encode('utf-8'), 1)
+
+        resposta = Response(corpo, content_type=content_type)
+        resposta.headers['Age'] = str(int(time.time() - guardada_em))
+        resposta.headers['Warning'] = '110 - "Response is Stale"'
+        resposta.headers['X-Dados-Desatualizados'] = hora
+        resposta.headers['Cache-Control'] = 'no-store'
+        return resposta
+
+
+reserva_paginas = ReservaPaginas(RESERVA_MAX_BYTES)
+
+
+@app.after_request
+def reserva_de_paginas(response):
+    """Guarda as respostas boas das rotas de leitura e as serve se o banco cair.
+
+    Registrado depois de comprimir_resposta, roda antes dele: a reserva guarda
+    e serve o corpo sem compressão.
+    """
+    if request.method not in ('GET', 'HEAD') or request.endpoint not in ROTAS_COM_RESERVA:
+        return response
+
+    chave = request.full_path
+    if response.status_code == 200 and request.method == 'GET' and not response.is_streamed:
+        reserva_paginas.guardar(chave, response)
+    elif g.get('banco_indisponivel'):
+        reserva = reserva_paginas.responder(chave)
+        if reserva is not None:
+            METRICA_RESERVA.incrementar(1, request.endpoint)
+            return reserva
+    return response
+
+# =============================================
+# ROLLUPS DE LEITURAS
+# =============================================
+
+ROLLUP_ATIVO = os.environ.get('ROLLUP_ATIVO', '1') == '1'
+ROLLUP_INTERVAL = float(os.environ.get('ROLLUP_INTERVAL', 30))   # s entre passadas do worker
+ROLLUP_LOTE = int(os.environ.get('ROLLUP_LOTE', 100000))         # leituras por transação
+
+# Resoluções mantidas: (segundos, tabela, unidade do date_trunc)
+ROLLUP_RESOLUCOES = [
+    (60, 'leituras_rollup_1m', 'minute'),
+    (3600, 'leituras_rollup_1h', 'hour'),
+    (86400, 'leituras_rollup_1d', 'day'),
+]
+
+# Chave do advisory lock que impede dois processos de agregar o mesmo lote
+ROLLUP_LOCK_ID = 4491001
+
+# Folga para transações que já pegaram um id da sequência mas ainda não têm xid
+HORIZONTE_FOLGA = float(os.environ.get('HORIZONTE_FOLGA', 5))
+
+# O snapshot é tirado antes da leitura da sequência: quem pegou um id até o
+# valor lido já tinha xid menor que o xmax retornado (ou o recebe na folga)
+SQL_HORIZONTE = """
+    SELECT COALESCE(pg_sequence_last_value('leituras_sensores_id_seq'), 0),
+           pg_snapshot_xmax(s)::text::bigint,
+           pg_snapshot_xmin(s)::text::bigint
+    FROM pg_current_snapshot() s
+"""
+
+
+class HorizonteLeituras:
+    """Maior id de leituras_sensores abaixo do qual nenhuma leitura nova ainda pode aparecer.
+
+    Os ids da sequência são distribuídos no INSERT, não no commit: uma
+    transação com ids menores pode ficar visível depois de outra com ids
+    maiores, então as marcas d'água por id não podem avançar até o MAX(id)
+    visível. Cada linha de SQL_HORIZONTE vira um candidato (último id da
+    sequência, xmax do snapshot), que passa a valer quando todas as
+    transações anteriores àquele snapshot terminaram (xmin atual >= xmax do
+    candidato) e depois de HORIZONTE_FOLGA segundos. Os ids até o horizonte
+    que não estão visíveis são de transações desfeitas.
+    """
+
+    def __init__(self, folga):
+        self.folga = folga
+        self._seguro = 0
+        self._candidato = None      # (último id, xmax, instante)
+        self._lock = threading.Lock()
+
+    def observar(self, ultimo_id, xmax, xmin, agora=None):
+        """Registra uma linha de SQL_HORIZONTE; retorna o horizonte seguro atual"""
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            if self._candidato is not None:
+                candidato_id, candidato_xmax, instante = self._candidato
+                if xmin >= candidato_xmax and agora - instante >= self.folga:
+                    self._seguro = max(self._seguro, candidato_id)
+                    self._candidato = None
+            if self._candidato is None and ultimo_id > self._seguro:
+                self._candidato = (ultimo_id, xmax, agora)
+            return self._seguro
+
+
+horizonte_leituras = HorizonteLeituras(HORIZONTE_FOLGA)
+
+# Mesmo horizonte para a sequência de alertas (DifusorEstatisticas)
+SQL_HORIZONTE_ALERTAS = """
+    SELECT COALESCE(pg_sequence_last_value('alertas_id_seq'), 0),
+           pg_snapshot_xmax(s)::text::bigint,
+           pg_snapshot_xmin(s)::text::bigint
+    FROM pg_current_snapshot() s
+"""
+
+
+class RollupWorker(TarefaPeriodica):
+    """Mantém os rollups por sensor (contagem/mín/máx/soma/soma dos quadrados).
+
+    A cada passada agrega apenas as leituras com id acima da marca d'água
+    gravada em `rollup_controle` e até o horizonte_leituras, e as incorpora
+    às tabelas de 1 minuto, 1 hora e 1 dia com upserts, na mesma transação
+    que avança a marca. As tabelas vêm da migração 010.
+    """
+
+    nome = 'rollup-leituras'
+    executar_ao_iniciar = True
+
+    def __init__(self, intervalo):
+        super().__init__(intervalo)
+        self.pronto = False
+
+    def processar_lote(self):
+        """Agrega um lote de leituras novas; retorna quantas foram incorporadas"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Outro worker já está agregando: deixa para a próxima passada
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (ROLLUP_LOCK_ID,))
+            if not cursor.fetchone()[0]:
+                return 0
+
+            cursor.execute("SELECT ultimo_id FROM rollup_controle WHERE nome = 'leituras_sensores'")
+            ultimo_id = cursor.fetchone()[0]
+            cursor.execute(SQL_HORIZONTE)
+            horizonte = horizonte_leituras.observar(*cursor.fetchone())
+
+            cursor.execute("""
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT id FROM leituras_sensores
+                    WHERE id > %s AND id <= %s
+                    ORDER BY id
+                    LIMIT %s
+                ) lote
+            """, (ultimo_id, horizonte, ROLLUP_LOTE))
+            limite_id, quantidade = cursor.fetchone()
+            if quantidade < ROLLUP_LOTE:
+                # Lote incompleto: até o horizonte não falta mais nenhuma leitura
+                limite_id = max(ultimo_id, horizonte)
+
+            if quantidade:
+                # Agrega o lote por minuto uma única vez; as resoluções maiores
+                # são derivadas desse delta (todas as medidas são combináveis)
+                cursor.execute("""
+                    CREATE TEMP TABLE rollup_delta ON COMMIT DROP AS
+                    SELECT
+                        sensor_id,
+                        date_trunc('minute', timestamp) AS bucket,
+                        COUNT(*) AS contagem,
+                        MIN(valor) AS minimo,
+                        MAX(valor) AS maximo,
+                        SUM(valor) AS soma,
+                        SUM(valor * valor) AS soma_quadrados
+                    FROM leituras_sensores
+                    WHERE id > %s AND id <= %s
+                    GROUP BY 1, 2
+                """, (ultimo_id, limite_id))
+
+                for _, tabela, unidade in ROLLUP_RESOLUCOES:
+                    cursor.execute(f"""
+                        INSERT INTO {tabela} AS r
+                            (sensor_id, bucket, contagem, minimo, maximo, soma, soma_quadrados)
+                        SELECT
+                            sensor_id,
+                            date_trunc('{unidade}', bucket),
+                            SUM(contagem),
+                            MIN(minimo),
+                            MAX(maximo),
+                            SUM(soma),
+                            SUM(soma_quadrados)
+                        FROM rollup_delta
+                        GROUP BY 1, 2
+                        ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+                            contagem = r.contagem + EXCLUDED.contagem,
+                            minimo = LEAST(r.minimo, EXCLUDED.minimo),
+                            maximo = GREATEST(r.maximo, EXCLUDED.maximo),
+                            soma = r.soma + EXCLUDED.soma,
+                            soma_quadrados = r.soma_quadrados + EXCLUDED.soma_quadrados
+                    """)
+
+            if limite_id > ultimo_id:
+                cursor.execute("""
+                    UPDATE rollup_controle SET ultimo_id = %s
+                    WHERE nome = 'leituras_sensores'
+                """, (limite_id,))
+
+            cursor.close()
+
+        self.pronto = True
+        return quantidade
+
+    def executar(self):
+        # Esvazia o atraso acumulado antes de dormir novamente
+        while self.processar_lote() >= ROLLUP_LOTE:
+            pass
+
+
+def escolher_rollup(bucket):
+    """Tabela de rollup mais grossa cuja resolução cabe no bucket pedido (ou None)"""
+    if not rollup_worker.pronto:
+        return None
+
+    escolhida = None
+    for segundos, tabela, _ in ROLLUP_RESOLUCOES:
+        if segundos <= bucket:
+            escolhida = tabela
+    return escolhida
+
+
+rollup_worker = RollupWorker(ROLLUP_INTERVAL)
+
+# =============================================
+# PARTIÇÕES E ARQUIVO DE LEITURAS
+# =============================================
+
+# leituras_sensores é particionada por mês (migração 005). A tarefa abaixo
+# mantém os próximos meses criados e, com RETENCAO_DIAS > 0, exporta para
+# Parquet e remove as partições mais antigas que isso.
+PARTICOES_ATIVO = os.environ.get('PARTICOES_ATIVO', '1') == '1'
+PARTICOES_INTERVAL = float(os.environ.get('PARTICOES_INTERVAL', 3600))
+PARTICOES_FUTURAS = int(os.environ.get('PARTICOES_FUTURAS', 3))        # meses criados à frente
+RETENCAO_DIAS = int(os.environ.get('RETENCAO_DIAS', 0))                # 0 desliga o arquivamento
+ARQUIVO_DIR = os.environ.get('ARQUIVO_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'arquivo'))
+ARQUIVO_COMPRESSAO = os.environ.get('ARQUIVO_COMPRESSAO', 'zstd')
+ARQUIVO_LOTE = int(os.environ.get('ARQUIVO_LOTE', 100000))             # linhas por row group
+
+# Mesmo lock usado por criar_particoes_leituras() no banco
+PARTICOES_LOCK_ID = 4491003
+
+RE_PARTICAO = re.compile(r'^leituras_sensores_(\d{4})_(\d{2})$')
+RE_ARQUIVO_MES = re.compile(r'^leituras_(\d{4})_(\d{2})\.parquet$')
+
+
+def proximo_mes(mes):
+    return mes.replace(year=mes.year + mes.month // 12, month=mes.month % 12 + 1)
+
+
+def esquema_parquet():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('sensor_id', pa.int32()),
+        ('valor', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+    ])
+
+
+def exportar_parquet(cursor, tabela, caminho):
+    """Grava a partição em Parquet ordenada por (timestamp, id); retorna o número de linhas.
+
+    O arquivo é escrito ao lado com sufixo .tmp, sincronizado em disco e só
+    então renomeado, para que uma falha nunca deixe um arquivo parcial.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = esquema_parquet()
+    temporario = caminho + '.tmp'
+    linhas = 0
+    with pq.ParquetWriter(temporario, esquema, compression=ARQUIVO_COMPRESSAO) as escritor:
+        cursor.execute(f"SELECT id, sensor_id, valor, timestamp FROM {tabela} ORDER BY timestamp, id")
+        while True:
+            rows = cursor.fetchmany(ARQUIVO_LOTE)
+            if not rows:
+                break
+            ids, sensores, valores, instantes = zip(*rows)
+            escritor.write_table(pa.Table.from_arrays([
+                pa.array(ids, pa.int64()),
+                pa.array(sensores, pa.int32()),
+                pa.array([float(valor) for valor in valores], pa.float64()),
+                pa.array(instantes, pa.timestamp('us')),
+            ], schema=esquema))
+            linhas += len(rows)
+
+    with open(temporario, 'rb') as arquivo:
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return linhas
+
+
+class GerenciadorParticoes(TarefaPeriodica):
+    """Cria as partições mensais futuras e aplica a retenção com arquivamento em Parquet"""
+
+    nome = 'particoes'
+    executar_ao_iniciar = True
+
+    def executar(self):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Sem a migração 005 a tabela não é particionada: nada a fazer
+            cursor.execute("SELECT to_regprocedure('criar_particoes_leituras(date, date)') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                return
+            cursor.execute("""
+                SELECT criar_particoes_leituras(CURRENT_DATE, (CURRENT_DATE + make_interval(months => %s))::date)
+            """, (PARTICOES_FUTURAS,))
+            criadas = cursor.fetchone()[0]
+            cursor.close()
+        if criadas:
+            print(f"{criadas} partição(ões) de leituras criada(s)")
+
+        if RETENCAO_DIAS > 0:
+            for tabela, mes in self.particoes_expiradas():
+                self.arquivar(tabela, mes)
+
+    def particoes_expiradas(self):
+        """Partições mensais cujo mês inteiro é mais antigo que RETENCAO_DIAS"""
+        limite = datetime.now() - timedelta(days=RETENCAO_DIAS)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'leituras_sensores'::regclass
+                ORDER BY c.relname
+            """)
+            nomes = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+
+        expiradas = []
+        for nome in nomes:
+            particao = RE_PARTICAO.match(nome)
+            if particao:
+                mes = datetime(int(particao.group(1)), int(particao.group(2)), 1)
+                if proximo_mes(mes) <= limite:
+                    expiradas.append((nome, mes))
+        return expiradas
+
+    def arquivar(self, tabela, mes):
+        """Exporta a partição para ARQUIVO_DIR, registra em leituras_arquivo e a remove"""
+        os.makedirs(ARQUIVO_DIR, exist_ok=True)
+        caminho = os.path.join(ARQUIVO_DIR, f"leituras_{mes:%Y_%m}.parquet")
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (PARTICOES_LOCK_ID,))
+            if not cursor.fetchone()[0]:
+                return
+            # Leituras atrasadas para este mês esperam a remoção em vez de se perderem
+            cursor.execute(f"LOCK TABLE {tabela} IN SHARE MODE")
+
+            with conn.cursor(name='arquivo_leituras') as origem:
+                origem.itersize = ARQUIVO_LOTE
+                linhas = exportar_parquet(origem, tabela, caminho)
+
+            cursor.execute("""
+                INSERT INTO leituras_arquivo (mes, arquivo, linhas)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (mes) DO UPDATE
+                SET arquivo = EXCLUDED.arquivo, linhas = EXCLUDED.linhas, arquivado_em = NOW()
+            """, (mes.date(), caminho, linhas))
+            cursor.execute(f"DROP TABLE {tabela}")
+            cursor.close()
+
+        print(f"Partição {tabela} arquivada em {caminho} ({linhas} leituras)")
+
+
+gerenciador_particoes = GerenciadorParticoes(PARTICOES_INTERVAL)
+
+
+def janela_leituras(args):
+    """Intervalo [inicio, fim) dos filtros de leituras; fim None significa até agora"""
+    de = args.get('de', '')
+    ate = args.get('ate', '')
+    if de or ate:
+        return (datetime.fromisoformat(de) if de else datetime.min,
+                datetime.fromisoformat(ate) if ate else None)
+    return datetime.now() - timedelta(hours=int(args.get('horas', '24'))), None
+
+
+def arquivos_do_periodo(inicio, fim):
+    """Arquivos Parquet de ARQUIVO_DIR cujos meses cruzam [inicio, fim), em ordem cronológica"""
+    if not os.path.isdir(ARQUIVO_DIR):
+        return []
+
+    arquivos = []
+    for nome in sorted(os.listdir(ARQUIVO_DIR)):
+        arquivo = RE_ARQUIVO_MES.match(nome)
+        if not arquivo:
+            continue
+        mes = datetime(int(arquivo.group(1)), int(arquivo.group(2)), 1)
+        if proximo_mes(mes) > inicio and (fim is None or mes < fim):
+            arquivos.append(os.path.join(ARQUIVO_DIR, nome))
+    return arquivos
+
+
+def grupo_fora_da_janela(arquivo, grupo, coluna_tempo, inicio, fim):
+    """Verdadeiro se as estatísticas do row group mostram que ele não cruza [inicio, fim)"""
+    estatisticas = arquivo.metadata.row_group(grupo).column(coluna_tempo).statistics
+    if estatisticas is None or not estatisticas.has_min_max:
+        return False
+    return estatisticas.max < inicio or (fim is not None and estatisticas.min >= fim)
+
+
+def leituras_arquivadas(args, pagina):
+    """Linhas dos meses arquivados para a página pedida, no formato de consulta_leituras.
+
+    Os arquivos estão ordenados por (timestamp, id), então os row groups são
+    lidos na direção da página, pulando os que estão fora da janela pelas
+    estatísticas do Parquet, até juntar por_pagina + 1 linhas.
+    """
+    inicio, fim = janela_leituras(args)
+    arquivos = arquivos_do_periodo(inicio, fim)
+    if not arquivos:
+        return []
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    contexto = dimensao_sensores.contexto()
+    sensores = dimensao_sensores.sensores(args.get('localizacao', ''), args.get('tipo', ''))
+
+    ascendente = bool(pagina['depois'])
+    limite = None
+    if pagina['depois'] or pagina['antes']:
+        limite = decodificar_cursor(pagina['depois'] or pagina['antes'])
+    quantidade = pagina['por_pagina'] + 1
+
+    def mascara(tabela):
+        instantes = tabela['timestamp']
+        condicao = pc.greater_equal(instantes, inicio)
+        if fim is not None:
+            condicao = pc.and_(condicao, pc.less(instantes, fim))
+        condicao = pc.and_(condicao, pc.is_in(tabela['sensor_id'], value_set=pa.array(sensores, pa.int32())))
+        if limite is not None:
+            comparar = pc.greater if ascendente else pc.less
+            mesmo_instante = pc.and_(pc.equal(instantes, limite[0]), comparar(tabela['id'], limite[1]))
+            condicao = pc.and_(condicao, pc.or_(comparar(instantes, limite[0]), mesmo_instante))
+        return condicao
+
+    linhas = []
+    for caminho in (arquivos if ascendente else reversed(arquivos)):
+        arquivo = pq.ParquetFile(caminho)
+        coluna_tempo = arquivo.schema_arrow.get_field_index('timestamp')
+        grupos = range(arquivo.num_row_groups)
+        for grupo in (grupos if ascendente else reversed(grupos)):
+            if grupo_fora_da_janela(arquivo, grupo, coluna_tempo, inicio, fim):
+                continue
+
+            tabela = arquivo.read_row_group(grupo, columns=['id', 'sensor_id', 'valor', 'timestamp'])
+            tabela = tabela.filter(mascara(tabela))
+            colunas = [tabela[nome].to_pylist() for nome in ('sensor_id', 'valor', 'timestamp', 'id')]
+            grupo_linhas = []
+            for sensor_id, valor, instante, leitura_id in zip(*colunas):
+                localizacao_sensor, posicao, datalogger = contexto[sensor_id]
+                grupo_linhas.append((localizacao_sensor, posicao, valor, instante, datalogger, leitura_id))
+            if not ascendente:
+                grupo_linhas.reverse()
+            linhas.extend(grupo_linhas)
+            if len(linhas) >= quantidade:
+                return linhas[:quantidade]
+    return linhas
+
+
+def mesclar_leituras(do_banco, do_arquivo, pagina):
+    """Junta as linhas do banco e do arquivo na ordem da página (timestamp, id)"""
+    if not do_arquivo:
+        return do_banco
+    ascendente = bool(pagina['depois'])
+    linhas = sorted(do_banco + do_arquivo, key=lambda linha: (linha[3], linha[5]), reverse=not ascendente)
+    return linhas[:pagina['por_pagina'] + 1]
+
+
+@app.before_request
+def iniciar_tarefas_de_fundo():
+    """Garante que as tarefas de fundo deste processo estejam rodando"""
+    if ROLLUP_ATIVO:
+        rollup_worker.iniciar()
+    if PARTICOES_ATIVO:
+        gerenciador_particoes.iniciar()
+    if ALERTAS_ATIVO:
+        motor_alertas.iniciar()
+    if PRESENCA_ATIVO:
+        monitor_presenca.iniciar()
+    if ESTATISTICAS_ATIVO:
+        estatisticas_sensores.iniciar()
+
+@app.route('/')
+def index():
+    """Página inicial - redireciona para dashboard"""
+    return redirect(url_for('dashboard'))
+
+# Consultas das páginas de leitura (compartilhadas com o modo assíncrono em asgi.py)
+SQL_ULTIMAS_LEITURAS = """
+    /* ultimas_leituras */
+    SELECT ls.sensor_id, ls.valor, ls.timestamp
+    FROM leituras_sensores ls
+    WHERE ls.timestamp >= NOW() - INTERVAL '1 hour'
+      AND ls.sensor_id = ANY(%s)
+    ORDER BY ls.timestamp DESC
+    LIMIT 10
+"""
+
+
+def enriquecer_ultimas_leituras(linhas):
+    """(sensor_id, valor, timestamp) -> (localizacao, posicao, valor, timestamp) pela dimensão de sensores"""
+    contexto = dimensao_sensores.contexto(linha[0] for linha in linhas)
+    return [(*contexto[sensor_id][:2], valor, timestamp)
+            for sensor_id, valor, timestamp in linhas if sensor_id in contexto]
+
+SQL_ALERTAS_ATIVOS = """
+    /* alertas_ativos */
+    SELECT tipo, mensagem, timestamp, severidade
+    FROM alertas
+    WHERE resolvido = false
+    ORDER BY timestamp DESC
+    LIMIT 5
+"""
+
+SQL_DISPOSITIVOS = """
+    /* dispositivos */
+    SELECT d.id, d.nome, d.tipo, d.mac_address, d.ip_address,
+           d.online, d.ultima_comunicacao, l.nome as localizacao
+    FROM dispositivos d
+    LEFT JOIN localizacoes l ON d.localizacao_id = l.id
+    ORDER BY d.tipo, d.nome
+"""
+
+SQL_ALIMENTADORES = """
+    /* alimentadores */
+    SELECT
+        a.id, dev.nome, l.nome as localizacao,
+        a.capacidade_racao, a.vazao_media, a.motor_ligado,
+        dev.online, c.ativa as config_ativa, c.peso_diario
+    FROM alimentadores a
+    JOIN dispositivos dev ON a.dispositivo_id = dev.id
+    JOIN localizacoes l ON dev.localizacao_id = l.id
+    LEFT JOIN config_alimentadores c ON a.id = c.alimentador_id
+    ORDER BY dev.nome
+"""
+
+SQL_DATALOGGERS = """
+    /* dataloggers */
+    SELECT
+        d.id, dev.nome, l.nome as localizacao,
+        d.quantidade_sensores, d.intervalo_leitura,
+        dev.online, dev.ultima_comunicacao
+    FROM dataloggers d
+    JOIN dispositivos dev ON d.dispositivo_id = dev.id
+    JOIN localizacoes l ON dev.localizacao_id = l.id
+    ORDER BY dev.nome
+"""
+
+@app.route('/dashboard')
+def dashboard():
+    """Dashboard principal com estatísticas"""
+    try:
+        # Estatísticas gerais (servidas do snapshot em memória)
+        stats = stats_snapshot.get()
+
+        # Últimas leituras e alertas ativos em uma ida e volta
+        ultimas_leituras, alertas_ativos = consultar((SQL_ULTIMAS_LEITURAS, (dimensao_sensores.sensores(),)),
+                                                     SQL_ALERTAS_ATIVOS)
+        ultimas_leituras = enriquecer_ultimas_leituras(ultimas_leituras)
+
+        return render_template('dashboard.html',
+                             stats=stats,
+                             ultimas_leituras=ultimas_leituras,
+                             alertas_ativos=alertas_ativos)
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dashboard: {e}"), 500
+
+@app.route('/dispositivos')
+def dispositivos():
+    """Lista todos os dispositivos"""
+    try:
+        dispositivos, = consultar(SQL_DISPOSITIVOS)
+
+        return render_template('dispositivos.html', dispositivos=dispositivos)
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dispositivos: {e}"), 500
+
+@app.route('/alimentadores')
+def alimentadores():
+    """Página de alimentadores"""
+    try:
+        # Alimentadores com informações completas
+        alimentadores, = consultar(SQL_ALIMENTADORES)
+
+        return render_template('alimentadores.html', alimentadores=alimentadores)
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar alimentadores: {e}"), 500
+
+@app.route('/dataloggers')
+def dataloggers():
+    """Página de dataloggers"""
+    try:
+        dataloggers, = consultar(SQL_DATALOGGERS)
+
+        return render_template('dataloggers.html', dataloggers=dataloggers)
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dataloggers: {e}"), 500
+
+def parametro_int(nome, padrao, minimo, maximo):
+    """Lê um parâmetro inteiro da query string, limitado a [minimo, maximo]"""
+    try:
+        valor = int(request.args.get(nome, padrao))
+    except (TypeError, ValueError):
+        valor = padrao
+    return max(minimo, min(valor, maximo))
+
+
+def montar_filtros_leituras(args, so_conhecidos=True):
+    """Monta as condições WHERE das consultas de leituras a partir da query string.
+
+    Aceita `localizacao`, `tipo` e `horas` como na página de leituras, ou um
+    intervalo explícito `de`/`ate` (ISO 8601). Com `so_conhecidos`, mesmo sem
+    filtro a consulta fica nos sensores da dimensão, os únicos que ela
+    enriquece. Lança ValueError se algum parâmetro for inválido.
+    """
+    condicoes = []
+    params = []
+
+    de = args.get('de', '')
+    ate = args.get('ate', '')
+
+    if de or ate:
+        if de:
+            condicoes.append("ls.timestamp >= %s")
+            params.append(datetime.fromisoformat(de))
+        if ate:
+            condicoes.append("ls.timestamp < %s")
+            params.append(datetime.fromisoformat(ate))
+    else:
+        condicoes.append("ls.timestamp >= NOW() - make_interval(hours => %s)")
+        params.append(int(args.get('horas', '24')))
+
+    # Localização e tipo viram a lista de sensores correspondente (dimensão em memória)
+    localizacao = args.get('localizacao', '')
+    sensor_type = args.get('tipo', '')
+    if localizacao or sensor_type or so_conhecidos:
+        condicoes.append("ls.sensor_id = ANY(%s)")
+        params.append(dimensao_sensores.sensores(localizacao, sensor_type))
+
+    return condicoes, params
+
+# Paginação da página de leituras
+LEITURAS_POR_PAGINA_PADRAO = 100
+LEITURAS_POR_PAGINA_MAX = 1000
+
+
+def codificar_cursor(timestamp, leitura_id):
+    """Codifica a posição (timestamp, id) de uma leitura para uso na URL"""
+    return f"{timestamp.isoformat()}_{leitura_id}"
+
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor; lança ValueError se o cursor for inválido"""
+    timestamp, _, leitura_id = cursor.rpartition('_')
+    return datetime.fromisoformat(timestamp), int(leitura_id)
+
+def consulta_leituras(args):
+    """Monta a consulta paginada da página de leituras.
+
+    Só sensores da dimensão entram, já no banco: o LIMIT conta apenas linhas
+    que enriquecer_leituras mantém, então a página vem cheia e a linha extra
+    indica de fato outra página. Retorna (query, params, pagina); lança
+    ValueError se algum filtro ou cursor for inválido.
+    """
+    pagina = {
+        'por_pagina': parametro_int('por_pagina', LEITURAS_POR_PAGINA_PADRAO, 1, LEITURAS_POR_PAGINA_MAX),
+        'antes': args.get('antes', ''),
+        'depois': args.get('depois', ''),
+    }
+
+    # Filtros
+    condicoes, params = montar_filtros_leituras(args)
+
+    # Keyset: cada página é uma varredura de intervalo no índice, sem OFFSET
+    if pagina['depois']:
+        condicoes.append("(ls.timestamp, ls.id) > (%s, %s)")
+        params.extend(decodificar_cursor(pagina['depois']))
+        ordem = "ASC"
+    else:
+        if pagina['antes']:
+            condicoes.append("(ls.timestamp, ls.id) < (%s, %s)")
+            params.extend(decodificar_cursor(pagina['antes']))
+        ordem = "DESC"
+
+    query = """
+        SELECT ls.sensor_id, ls.valor, ls.timestamp, ls.id
+        FROM leituras_sensores ls
+        WHERE """ + " AND ".join(condicoes) + f"""
+        ORDER BY ls.timestamp {ordem}, ls.id {ordem}
+        LIMIT %s
+    """
+    # Uma linha a mais indica se existe página seguinte nessa direção
+    params.append(pagina['por_pagina'] + 1)
+
+    return query, params, pagina
+
+
+def enriquecer_leituras(linhas):
+    """Linhas de consulta_leituras no formato da página:
+    (localizacao, tipo_sensor, valor, timestamp, datalogger, id)"""
+    contexto = dimensao_sensores.contexto(linha[0] for linha in linhas)
+    enriquecidas = []
+    for sensor_id, valor, timestamp, leitura_id in linhas:
+        if sensor_id in contexto:
+            localizacao, posicao, datalogger = contexto[sensor_id]
+            enriquecidas.append((localizacao, posicao, valor, timestamp, datalogger, leitura_id))
+    return enriquecidas
+
+
+def contexto_leituras(leituras, pagina):
+    """Aplica a paginação às linhas buscadas e monta os links anterior/próxima"""
+    por_pagina = pagina['por_pagina']
+    mais_linhas = len(leituras) > por_pagina
+    leituras = leituras[:por_pagina]
+
+    if pagina['depois']:
+        leituras.reverse()
+        tem_anterior, tem_proxima = mais_linhas, True
+    else:
+        tem_anterior, tem_proxima = bool(pagina['antes']), mais_linhas
+
+    filtros = request.args.to_dict()
+    filtros.pop('antes', None)
+    filtros.pop('depois', None)
+
+    url_anterior = url_proxima = None
+    if leituras and tem_anterior:
+        url_anterior = url_for('leituras', **filtros, depois=codificar_cursor(leituras[0][3], leituras[0][5]))
+    if leituras and tem_proxima:
+        url_proxima = url_for('leituras', **filtros, antes=codificar_cursor(leituras[-1][3], leituras[-1][5]))
+
+    return {
+        'leituras': leituras,
+        'filtros': request.args,
+        'por_pagina': por_pagina,
+        'url_anterior': url_anterior,
+        'url_proxima': url_proxima,
+    }
+
+@app.route('/leituras')
+def leituras():
+    """Página de leituras dos sensores, paginada por (timestamp, id)"""
+    try:
+        query, params, pagina = consulta_leituras(request.args)
+    except ValueError as e:
+        return render_template('error.html', message=f"Parâmetro inválido: {e}"), 400
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+
+    try:
+        # Página inalterada desde a última visita: 304 sem consultar as leituras
+        versao, resultados = consultar_com_versao((query, params), leituras=True)
+        etag = versao and etag_leituras(versao, request.args)
+        if etag:
+            resposta = nao_modificado(etag)
+            if resposta:
+                return resposta
+
+        leituras, = resultados or consultar((query, params))
+        leituras = enriquecer_leituras(leituras)
+
+        # Meses já arquivados em Parquet entram na mesma página
+        leituras = mesclar_leituras(leituras, leituras_arquivadas(request.args, pagina), pagina)
+
+        # Localizações e tipos de sensor para o filtro
+        localizacoes = [row[0] for row in cache_metadados.obter('nomes_localizacoes')]
+        tipos_sensor = [row[0] for row in cache_metadados.obter('posicoes_sensores')]
+
+        resposta = render_template('leituras.html',
+                                   localizacoes=localizacoes,
+                                   tipos_sensor=tipos_sensor,
+                                   **contexto_leituras(leituras, pagina))
+        return marcar_versao(resposta, etag) if etag else resposta
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar leituras: {e}"), 500
+
+# Janelas e orçamento de pontos dos gráficos
+GRAFICO_HORAS_PADRAO = 24
+GRAFICO_HORAS_MAX = 24 * 90
+GRAFICO_LARGURA_PADRAO = 1200   # largura do gráfico em pixels
+GRAFICO_PONTOS_MIN = 100
+GRAFICO_PONTOS_MAX = 2000
+
+
+def calcular_bucket(horas, largura):
+    """Tamanho do bucket (s) para que cada série tenha no máximo ~1 ponto por pixel"""
+    pontos = max(GRAFICO_PONTOS_MIN, min(largura, GRAFICO_PONTOS_MAX))
+    return max(1, -(-horas * 3600 // pontos))
+
+def consultas_graficos(bucket):
+    """Consultas da série agregada e dos quartis para o tamanho de bucket pedido.
+
+    Lê do rollup mais grosso que ainda cabe no bucket; sem rollup, das
+    leituras brutas. Ambas usam os parâmetros nomeados `bucket` e `horas` e
+    os arrays de DimensaoSensores.graficos(), que substituem o join com os
+    cadastros: a série agrupa pelo índice do grupo e os quartis pelo do tipo.
+    """
+    tabela = escolher_rollup(bucket)
+    if tabela:
+        origem = f"{tabela} ls"
+        coluna_tempo = "ls.bucket"
+        valor = "ls.soma / ls.contagem"
+        minimo, media, maximo = "MIN(ls.minimo)", "SUM(ls.soma) / SUM(ls.contagem)", "MAX(ls.maximo)"
+    else:
+        origem = "leituras_sensores ls"
+        coluna_tempo = "ls.timestamp"
+        valor = "ls.valor"
+        minimo, media, maximo = "MIN(ls.valor)", "AVG(ls.valor)", "MAX(ls.valor)"
+
+    # Série temporal agregada em buckets (mín/média/máx) por localização e sensor
+    serie = f"""
+        /* graficos_serie */
+        SELECT
+            g.grupo,
+            to_timestamp(floor(extract(epoch FROM {coluna_tempo}) / %(bucket)s) * %(bucket)s)
+                AT TIME ZONE 'UTC' as bucket,
+            {minimo} as minimo,
+            {media} as media,
+            {maximo} as maximo
+        FROM {origem}
+        JOIN unnest(%(sensores)s::int[], %(grupos)s::int[]) AS g(sensor_id, grupo)
+            ON g.sensor_id = ls.sensor_id
+        WHERE {coluna_tempo} >= NOW() - make_interval(hours => %(horas)s)
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """
+
+    # Quartis por tipo de sensor calculados no banco (evita trafegar as leituras brutas);
+    # sobre rollups, os quartis são das médias de cada intervalo
+    quartis = f"""
+        /* graficos_quartis */
+        SELECT
+            g.tipo,
+            {minimo},
+            percentile_cont(0.25) WITHIN GROUP (ORDER BY {valor}),
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY {valor}),
+            percentile_cont(0.75) WITHIN GROUP (ORDER BY {valor}),
+            {maximo}
+        FROM {origem}
+        JOIN unnest(%(sensores)s::int[], %(tipos)s::int[]) AS g(sensor_id, tipo)
+            ON g.sensor_id = ls.sensor_id
+        WHERE {coluna_tempo} >= NOW() - make_interval(hours => %(horas)s)
+        GROUP BY g.tipo
+        ORDER BY g.tipo
+    """
+
+    return serie, quartis
+
+
+def array_base64(tipo, valores):
+    """Codifica valores como array tipado little-endian em base64 (Float32Array/Int32Array no navegador)"""
+    arr = array(tipo, valores)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode('ascii')
+
+
+# Origem dos instantes dos gráficos. As leituras guardam a hora local sem fuso e os
+# segundos contados desta data, também sem fuso, representam essa mesma hora de parede
+EPOCA_GRAFICOS = datetime(1970, 1, 1)
+
+
+def montar_dados_graficos(dados, quartis, bucket, grupos, tipos):
+    """Payload colunar dos gráficos: uma entrada por série e os quartis por tipo de sensor.
+
+    Os instantes são deslocamentos em segundos a partir de `inicio` (Int32),
+    na hora gravada, sem fuso (ver EPOCA_GRAFICOS), e os valores são Float32,
+    ambos em base64; as figuras são montadas no navegador. `grupos` e `tipos`
+    traduzem os índices devolvidos pelo banco.
+    """
+    series = {}
+    for grupo, instante, minimo, media, maximo in dados:
+        serie = series.setdefault(grupos[grupo], ([], [], [], []))
+        serie[0].append(int((instante - EPOCA_GRAFICOS).total_seconds()))
+        serie[1].append(float(minimo))
+        serie[2].append(float(media))
+        serie[3].append(float(maximo))
+
+    inicio = min((serie[0][0] for serie in series.values()), default=0)
+
+    return {
+        'bucket': bucket,
+        'inicio': inicio,
+        'series': [
+            {
+                'localizacao': localizacao,
+                'tipo_sensor': tipo_sensor,
+                't': array_base64('i', [instante - inicio for instante in instantes]),
+                'minimo': array_base64('f', minimos),
+                'media': array_base64('f', medias),
+                'maximo': array_base64('f', maximos),
+            }
+            for (localizacao, tipo_sensor), (instantes, minimos, medias, maximos) in series.items()
+        ],
+        'quartis': [
+            {
+                'tipo_sensor': tipos[tipo],
+                'minimo': float(minimo),
+                'q1': float(q1),
+                'mediana': float(mediana),
+                'q3': float(q3),
+                'maximo': float(maximo),
+            }
+            for tipo, minimo, q1, mediana, q3, maximo in quartis
+        ],
+    }
+
+@app.route('/graficos')
+def graficos():
+    """Página com gráficos das leituras (os dados vêm de /api/graficos)"""
+    horas = parametro_int('horas', GRAFICO_HORAS_PADRAO, 1, GRAFICO_HORAS_MAX)
+    return render_template('graficos.html', horas=horas)
+
+@app.route('/api/graficos')
+def api_graficos():
+    """Dados agregados dos gráficos em formato colunar compacto"""
+    horas = parametro_int('horas', GRAFICO_HORAS_PADRAO, 1, GRAFICO_HORAS_MAX)
+    largura = parametro_int('largura', GRAFICO_LARGURA_PADRAO, 1, 10000)
+    bucket = calcular_bucket(horas, largura)
+    sql_serie, sql_quartis = consultas_graficos(bucket)
+
+    try:
+        parametros, grupos, tipos = dimensao_sensores.graficos()
+        params = {'bucket': bucket, 'horas': horas, **parametros}
+        consultas = ((sql_serie, params), (sql_quartis, params))
+
+        versao, resultados = consultar_com_versao(*consultas, leituras=True)
+        etag = versao and etag_graficos(versao, horas, largura, bucket)
+        if etag:
+            resposta = nao_modificado(etag)
+            if resposta:
+                return resposta
+
+        dados, quartis = resultados or consultar(*consultas)
+
+        resposta = jsonify(montar_dados_graficos(dados, quartis, bucket, grupos, tipos))
+        return marcar_versao(resposta, etag) if etag else resposta
+
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# =============================================
+# ROTAS DE CADASTRO
+# =============================================
+
+@app.route('/cadastros')
+def cadastros():
+    """Página principal de cadastros"""
+    return render_template('cadastros.html')
+
+# CADASTRO DE LOCALIZAÇÕES
+@app.route('/cadastros/localizacoes')
+def cadastrar_localizacao():
+    """Formulário para cadastrar localização"""
+    return render_template('cadastros/localizacao.html')
+
+@app.route('/cadastros/localizacoes/salvar', methods=['POST'])
+def salvar_localizacao():
+    """Salva uma nova localização"""
+    try:
+        nome = request.form['nome']
+        descricao = request.form['descricao']
+        tipo = request.form['tipo']
+
+        executar(("""
+            INSERT INTO localizacoes (nome, descricao, tipo)
+            VALUES (%s, %s, %s)
+        """, (nome, descricao, tipo)))
+
+        stats_snapshot.invalidate()
+        cache_metadados.invalidate('localizacoes', 'nomes_localizacoes', 'contexto_sensores')
+        flash('Localização cadastrada com sucesso!', 'success')
+        return redirect(url_for('cadastros'))
+
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastrar_localizacao'))
+    except Exception as e:
+        flash(f'Erro ao cadastrar localização: {str(e)}', 'error')
+        return redirect(url_for('cadastrar_localizacao'))
+
+# CADASTRO DE DISPOSITIVOS
+@app.route('/cadastros/dispositivos')
+def cadastrar_dispositivo():
+    """Formulário para cadastrar dispositivo"""
+    try:
+        localizacoes = cache_metadados.obter('localizacoes')
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastros'))
+    except Exception as e:
+        flash(f'Erro ao carregar localizações: {str(e)}', 'error')
+        return redirect(url_for('cadastros'))
+
+    return render_template('cadastros/dispositivo.html', localizacoes=localizacoes)
+
+@app.route('/cadastros/dispositivos/salvar', methods=['POST'])
+def salvar_dispositivo():
+    """Salva um novo dispositivo"""
+    try:
+        nome = request.form['nome']
+        descricao = request.form['descricao']
+        mac_address = request.form['mac_address']
+        ip_address = request.form.get('ip_address', '')
+        tipo = request.form['tipo']
+        modelo = request.form.get('modelo', '')
+        localizacao_id = request.form.get('localizacao_id') or None
+
+        # Dispositivo e registros da tabela específica em um único comando:
+        # alimentador ganha configuração e calibração padrão
+        executar(("""
+            WITH dispositivo AS (
+                INSERT INTO dispositivos (localizacao_id, nome, descricao, mac_address, ip_address, tipo, modelo)
+                VALUES (%(localizacao_id)s, %(nome)s, %(descricao)s, %(mac_address)s,
+                        %(ip_address)s, %(tipo)s, %(modelo)s)
+                RETURNING id, tipo
+            ), alimentador AS (
+                INSERT INTO alimentadores (dispositivo_id, capacidade_racao, vazao_media)
+                SELECT id, 0, 0 FROM dispositivo WHERE tipo = 'alimentador'
+                RETURNING id
+            ), config AS (
+                INSERT INTO config_alimentadores (alimentador_id, ativa)
+                SELECT id, false FROM alimentador
+            ), calibracao AS (
+                INSERT INTO calibracao_alimentadores (alimentador_id)
+                SELECT id FROM alimentador
+            )
+            INSERT INTO dataloggers (dispositivo_id)
+            SELECT id FROM dispositivo WHERE tipo = 'datalogger'
+        """, {'localizacao_id': localizacao_id, 'nome': nome, 'descricao': descricao,
+              'mac_address': mac_address, 'ip_address': ip_address, 'tipo': tipo, 'modelo': modelo}))
+
+        stats_snapshot.invalidate()
+        cache_metadados.invalidate('dataloggers', 'alimentadores', 'contexto_sensores')
+        agenda_alimentadores.invalidate()
+        motor_alertas.invalidate()
+        mapa_sensores.invalidate()
+        flash('Dispositivo cadastrado com sucesso!', 'success')
+        return redirect(url_for('cadastros'))
+
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastrar_dispositivo'))
+    except Exception as e:
+        flash(f'Erro ao cadastrar dispositivo: {str(e)}', 'error')
+        return redirect(url_for('cadastrar_dispositivo'))
+
+# CADASTRO DE SENSORES
+@app.route('/cadastros/sensores')
+def cadastrar_sensor():
+    """Formulário para cadastrar sensor"""
+    try:
+        dataloggers = cache_metadados.obter('dataloggers')
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastros'))
+    except Exception as e:
+        flash(f'Erro ao carregar dataloggers: {str(e)}', 'error')
+        return redirect(url_for('cadastros'))
+
+    return render_template('cadastros/sensor.html', dataloggers=dataloggers)
+
+@app.route('/cadastros/sensores/salvar', methods=['POST'])
+def salvar_sensor():
+    """Salva um novo sensor"""
+    try:
+        datalogger_id = request.form['datalogger_id']
+        nome = request.form['nome']
+        tipo = request.form['tipo']
+        unidade = request.form['unidade']
+        posicao = request.form['posicao']
+        endereco = request.form.get('endereco', '')
+
+        executar(("""
+            INSERT INTO sensores (datalogger_id, nome, tipo, unidade, posicao, endereco)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (datalogger_id, nome, tipo, unidade, posicao, endereco)))
+
+        stats_snapshot.invalidate()
+        cache_metadados.invalidate('posicoes_sensores', 'contexto_sensores')
+        motor_alertas.invalidate()
+        mapa_sensores.invalidate()
+        flash('Sensor cadastrado com sucesso!', 'success')
+        return redirect(url_for('cadastros'))
+
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastrar_sensor'))
+    except Exception as e:
+        flash(f'Erro ao cadastrar sensor: {str(e)}', 'error')
+        return redirect(url_for('cadastrar_sensor'))
+
+# CADASTRO DE CONFIGURAÇÕES DE ALIMENTADOR
+@app.route('/cadastros/config-alimentador')
+def cadastrar_config_alimentador():
+    """Formulário para configurar alimentador"""
+    try:
+        alimentadores = cache_metadados.obter('alimentadores')
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastros'))
+    except Exception as e:
+        flash(f'Erro ao carregar alimentadores: {str(e)}', 'error')
+        return redirect(url_for('cadastros'))
+
+    return render_template('cadastros/config_alimentador.html', alimentadores=alimentadores)
+
+@app.route('/cadastros/config-alimentador/salvar', methods=['POST'])
+def salvar_config_alimentador():
+    """Salva configuração do alimentador"""
+    try:
+        alimentador_id = request.form['alimentador_id']
+        horario_inicio = request.form['horario_inicio']
+        horario_fim = request.form['horario_fim']
+        intervalo = request.form['intervalo']
+        peso_diario = request.form['peso_diario']
+        porcoes = request.form['porcoes']
+        ativa = 'ativa' in request.form
+
+        # Uma configuração por alimentador (migração 008): insere ou atualiza
+        executar(("""
+            INSERT INTO config_alimentadores
+            (alimentador_id, horario_inicio, horario_fim, intervalo, peso_diario, porcoes, ativa)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (alimentador_id) DO UPDATE
+            SET horario_inicio = EXCLUDED.horario_inicio, horario_fim = EXCLUDED.horario_fim,
+                intervalo = EXCLUDED.intervalo, peso_diario = EXCLUDED.peso_diario,
+                porcoes = EXCLUDED.porcoes, ativa = EXCLUDED.ativa, updated_at = CURRENT_TIMESTAMP
+        """, (alimentador_id, horario_inicio, horario_fim, intervalo, peso_diario, porcoes, ativa)))
+
+        stats_snapshot.invalidate()
+        agenda_alimentadores.invalidate()
+        flash('Configuração do alimentador salva com sucesso!', 'success')
+        return redirect(url_for('cadastros'))
+
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastrar_config_alimentador'))
+    except Exception as e:
+        flash(f'Erro ao salvar configuração: {str(e)}', 'error')
+        return redirect(url_for('cadastrar_config_alimentador'))
+
+# CADASTRO DE LIMITES DE TEMPERATURA
+@app.route('/cadastros/limites-temperatura')
+def cadastrar_limites_temperatura():
+    """Formulário para cadastrar limites de temperatura"""
+    try:
+        localizacoes = cache_metadados.obter('localizacoes')
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastros'))
+    except Exception as e:
+        flash(f'Erro ao carregar localizações: {str(e)}', 'error')
+        return redirect(url_for('cadastros'))
+
+    return render_template('cadastros/limites_temperatura.html', localizacoes=localizacoes)
+
+@app.route('/cadastros/limites-temperatura/salvar', methods=['POST'])
+def salvar_limites_temperatura():
+    """Salva limites de temperatura"""
+    try:
+        localizacao_id = request.form['localizacao_id']
+        tipo_sensor = request.form['tipo_sensor']
+        maximo = float(request.form['maximo'])
+        minimo = float(request.form['minimo'])
+
+        # Um limite por localização e tipo de sensor (migração 008): insere ou atualiza
+        executar(("""
+            INSERT INTO limites_temperatura (localizacao_id, tipo_sensor, maximo, minimo)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (localizacao_id, tipo_sensor) DO UPDATE
+            SET maximo = EXCLUDED.maximo, minimo = EXCLUDED.minimo, updated_at = CURRENT_TIMESTAMP
+        """, (localizacao_id, tipo_sensor, maximo, minimo)))
+
+        stats_snapshot.invalidate()
+        motor_alertas.invalidate()
+        flash('Limites de temperatura salvos com sucesso!', 'success')
+        return redirect(url_for('cadastros'))
+
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('cadastrar_limites_temperatura'))
+    except Exception as e:
+        flash(f'Erro ao salvar limites: {str(e)}', 'error')
+        return redirect(url_for('cadastrar_limites_temperatura'))
+
+# IMPORTAÇÃO DE CADASTROS EM LOTE (CSV)
+IMPORTACAO_MAX_ERROS = 20          # erros exibidos ao usuário
+INTERVALO_LEITURA_PADRAO = 60      # mesmo default de dataloggers.intervalo_leitura
+
+# Colunas aceitas em cada arquivo: coluna -> (obrigatória, tamanho máximo)
+COLUNAS_IMPORTACAO = {
+    'localizacoes': {
+        'nome': (True, 100), 'tipo': (True, 50), 'descricao': (False, None),
+    },
+    'dispositivos': {
+        'nome': (True, 100), 'mac_address': (True, 17), 'tipo': (True, 20), 'localizacao': (False, 100),
+        'descricao': (False, None), 'ip_address': (False, 45), 'modelo': (False, 50),
+        'intervalo_leitura': (False, None), 'capacidade_racao': (False, None), 'vazao_media': (False, None),
+    },
+    'sensores': {
+        'datalogger_mac': (True, 17), 'nome': (True, 100), 'tipo': (True, 50), 'unidade': (False, 20),
+        'posicao': (False, 50), 'endereco': (False, 50),
+    },
+}
+
+
+class ImportacaoCadastros:
+    """Importação de localizações, dispositivos e sensores a partir de arquivos CSV.
+
+    Tudo é validado antes de qualquer escrita: colunas, campos obrigatórios,
+    tamanhos, números, duplicidades e referências. As referências usam chaves
+    naturais (a localização do dispositivo pelo nome e o datalogger do sensor
+    pelo MAC) e valem tanto para linhas do próprio lote quanto para cadastros
+    existentes. A gravação é uma única transação: cada tabela recebe um
+    INSERT ... SELECT FROM unnest, com RETURNING para resolver as chaves, e os
+    sensores entram por COPY.
+    """
+
+    def __init__(self, arquivos):
+        self.linhas = {nome: [] for nome in COLUNAS_IMPORTACAO}
+        self.erros = []
+        self._localizacoes = {}    # nome -> id das localizações existentes referenciadas
+        self._dataloggers = {}     # mac -> id dos dataloggers existentes referenciados
+
+        for nome, conteudo in arquivos.items():
+            self._ler(nome, conteudo)
+        self._validar()
+
+    def _erro(self, arquivo, linha, mensagem):
+        self.erros.append(f"{arquivo}.csv, linha {linha}: {mensagem}")
+
+    def _ler(self, arquivo, conteudo):
+        colunas = COLUNAS_IMPORTACAO[arquivo]
+        try:
+            dialeto = csv.Sniffer().sniff(conteudo.split('\n', 1)[0], delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+        cabecalho = [(coluna or '').strip().lower() for coluna in (leitor.fieldnames or [])]
+        leitor.fieldnames = cabecalho
+
+        desconhecidas = [coluna for coluna in cabecalho if coluna not in colunas]
+        faltando = [coluna for coluna, (obrigatoria, _) in colunas.items() if obrigatoria and coluna not in cabecalho]
+        if desconhecidas:
+            self._erro(arquivo, 1, f"colunas desconhecidas: {', '.join(desconhecidas)}")
+        if faltando:
+            self._erro(arquivo, 1, f"colunas obrigatórias ausentes: {', '.join(faltando)}")
+        if desconhecidas or faltando:
+            return
+
+        for registro in leitor:
+            linha = {'_linha': leitor.line_num}
+            if None in registro:
+                # Campos além do cabeçalho (DictReader os guarda na chave None)
+                self._erro(arquivo, leitor.line_num, f"{len(registro[None])} campo(s) a mais que o cabeçalho")
+            for coluna, (obrigatoria, tamanho) in colunas.items():
+                valor = (registro.get(coluna) or '').strip() or None
+                if valor is None and obrigatoria:
+                    self._erro(arquivo, leitor.line_num, f"'{coluna}' é obrigatório")
+                elif valor is not None and tamanho and len(valor) > tamanho:
+                    self._erro(arquivo, leitor.line_num, f"'{coluna}' excede {tamanho} caracteres")
+                linha[coluna] = valor
+            self.linhas[arquivo].append(linha)
+
+    def _numero(self, arquivo, linha, coluna, tipo, padrao):
+        valor = linha[coluna]
+        if valor is None:
+            return padrao
+        try:
+            numero = tipo(valor.replace(',', '.') if tipo is float else valor)
+        except ValueError:
+            self._erro(arquivo, linha['_linha'], f"'{coluna}' não é um número válido: {valor}")
+            return padrao
+        if numero < 0 or (tipo is int and numero == 0):
+            self._erro(arquivo, linha['_linha'], f"'{coluna}' fora do intervalo: {valor}")
+        return numero
+
+    def _validar(self):
+        """Validações que dependem só dos arquivos"""
+        nomes = set()
+        for linha in self.linhas['localizacoes']:
+            if linha['nome'] in nomes:
+                self._erro('localizacoes', linha['_linha'], f"localização repetida: {linha['nome']}")
+            nomes.add(linha['nome'])
+
+        macs = {}
+        for linha in self.linhas['dispositivos']:
+            if linha['tipo'] is not None and linha['tipo'] not in ('alimentador', 'datalogger'):
+                self._erro('dispositivos', linha['_linha'], f"tipo deve ser alimentador ou datalogger: {linha['tipo']}")
+            if linha['mac_address'] is not None and linha['mac_address'] in macs:
+                self._erro('dispositivos', linha['_linha'], f"MAC repetido: {linha['mac_address']}")
+            macs[linha['mac_address']] = linha['tipo']
+            linha['intervalo_leitura'] = self._numero('dispositivos', linha, 'intervalo_leitura', int,
+                                                      INTERVALO_LEITURA_PADRAO)
+            linha['capacidade_racao'] = self._numero('dispositivos', linha, 'capacidade_racao', float, 0.0)
+            linha['vazao_media'] = self._numero('dispositivos', linha, 'vazao_media', float, 0.0)
+
+        enderecos = set()
+        for linha in self.linhas['sensores']:
+            if macs.get(linha['datalogger_mac'], 'datalogger') != 'datalogger':
+                self._erro('sensores', linha['_linha'], f"{linha['datalogger_mac']} não é um datalogger")
+            chave = (linha['datalogger_mac'], linha['endereco'])
+            if linha['endereco'] is not None and chave in enderecos:
+                self._erro('sensores', linha['_linha'],
+                           f"endereço {linha['endereco']} repetido no datalogger {linha['datalogger_mac']}")
+            enderecos.add(chave)
+
+    def validar_no_banco(self, cursor):
+        """Validações contra os cadastros existentes; resolve as referências a eles"""
+        novas = {linha['nome'] for linha in self.linhas['localizacoes']}
+        referenciadas = {linha['localizacao'] for linha in self.linhas['dispositivos'] if linha['localizacao']}
+        cursor.execute("""
+            SELECT nome, array_agg(id) FROM localizacoes WHERE nome = ANY(%s) GROUP BY nome
+        """, (list(novas | referenciadas),))
+        existentes = dict(cursor.fetchall())
+
+        for linha in self.linhas['localizacoes']:
+            if linha['nome'] in existentes:
+                self._erro('localizacoes', linha['_linha'], f"localização já cadastrada: {linha['nome']}")
+        for linha in self.linhas['dispositivos']:
+            nome = linha['localizacao']
+            if nome is None or nome in novas:
+                continue
+            if nome not in existentes:
+                self._erro('dispositivos', linha['_linha'], f"localização não encontrada: {nome}")
+            elif len(existentes[nome]) > 1:
+                self._erro('dispositivos', linha['_linha'], f"localização ambígua (nome repetido no banco): {nome}")
+            else:
+                self._localizacoes[nome] = existentes[nome][0]
+
+        macs = [linha['mac_address'] for linha in self.linhas['dispositivos']]
+        cursor.execute("SELECT mac_address FROM dispositivos WHERE mac_address = ANY(%s)", (macs,))
+        repetidos = {row[0] for row in cursor.fetchall()}
+        for linha in self.linhas['dispositivos']:
+            if linha['mac_address'] in repetidos:
+                self._erro('dispositivos', linha['_linha'], f"MAC já cadastrado: {linha['mac_address']}")
+
+        novos = set(macs)
+        externos = list({linha['datalogger_mac'] for linha in self.linhas['sensores']} - novos)
+        cursor.execute("""
+            SELECT dev.mac_address, d.id
+            FROM dataloggers d
+            JOIN dispositivos dev ON d.dispositivo_id = dev.id
+            WHERE dev.mac_address = ANY(%s)
+        """, (externos,))
+        self._dataloggers = dict(cursor.fetchall())
+        cursor.execute("""
+            SELECT dev.mac_address, s.endereco
+            FROM sensores s
+            JOIN dataloggers d ON s.datalogger_id = d.id
+            JOIN dispositivos dev ON d.dispositivo_id = dev.id
+            WHERE dev.mac_address = ANY(%s) AND s.endereco IS NOT NULL
+        """, (externos,))
+        enderecos = set(cursor.fetchall())
+
+        for linha in self.linhas['sensores']:
+            mac = linha['datalogger_mac']
+            if mac not in novos and mac not in self._dataloggers:
+                self._erro('sensores', linha['_linha'], f"datalogger não encontrado: {mac}")
+            elif (mac, linha['endereco']) in enderecos:
+                self._erro('sensores', linha['_linha'], f"endereço {linha['endereco']} já cadastrado no datalogger {mac}")
+
+    def gravar(self, cursor):
+        """Grava o lote (na transação do cursor); retorna a quantidade por tabela"""
+        localizacoes = dict(self._localizacoes)
+        novas = self.linhas['localizacoes']
+        if novas:
+            cursor.execute("""
+                INSERT INTO localizacoes (nome, tipo, descricao)
+                SELECT * FROM unnest(%s::text[], %s::text[], %s::text[])
+                RETURNING nome, id
+            """, tuple([linha[coluna] for linha in novas] for coluna in ('nome', 'tipo', 'descricao')))
+            localizacoes.update(cursor.fetchall())
+
+        dispositivos = self.linhas['dispositivos']
+        dataloggers = dict(self._dataloggers)
+        if dispositivos:
+            cursor.execute("""
+                INSERT INTO dispositivos (localizacao_id, nome, descricao, mac_address, ip_address, tipo, modelo)
+                SELECT * FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[])
+                RETURNING mac_address, id
+            """, (
+                [localizacoes.get(linha['localizacao']) for linha in dispositivos],
+                *([linha[coluna] for linha in dispositivos]
+                  for coluna in ('nome', 'descricao', 'mac_address', 'ip_address', 'tipo', 'modelo')),
+            ))
+            ids = dict(cursor.fetchall())
+
+            novos_dataloggers = [linha for linha in dispositivos if linha['tipo'] == 'datalogger']
+            if novos_dataloggers:
+                cursor.execute("""
+                    INSERT INTO dataloggers (dispositivo_id, intervalo_leitura)
+                    SELECT * FROM unnest(%s::int[], %s::int[])
+                    RETURNING dispositivo_id, id
+                """, ([ids[linha['mac_address']] for linha in novos_dataloggers],
+                      [linha['intervalo_leitura'] for linha in novos_dataloggers]))
+                macs = {ids[linha['mac_address']]: linha['mac_address'] for linha in novos_dataloggers}
+                dataloggers.update((macs[dispositivo_id], datalogger_id) for dispositivo_id, datalogger_id in cursor.fetchall())
+
+            # Alimentadores com configuração e calibração padrão, como em salvar_dispositivo()
+            novos_alimentadores = [linha for linha in dispositivos if linha['tipo'] == 'alimentador']
+            if novos_alimentadores:
+                cursor.execute("""
+                    WITH novos AS (
+                        INSERT INTO alimentadores (dispositivo_id, capacidade_racao, vazao_media)
+                        SELECT * FROM unnest(%s::int[], %s::float8[], %s::float8[])
+                        RETURNING id
+                    ), configuracoes AS (
+                        INSERT INTO config_alimentadores (alimentador_id, ativa)
+                        SELECT id, false FROM novos
+                    )
+                    INSERT INTO calibracao_alimentadores (alimentador_id)
+                    SELECT id FROM novos
+                """, ([ids[linha['mac_address']] for linha in novos_alimentadores],
+                      [linha['capacidade_racao'] for linha in novos_alimentadores],
+                      [linha['vazao_media'] for linha in novos_alimentadores]))
+
+        sensores = self.linhas['sensores']
+        if sensores:
+            with cursor.copy("""
+                COPY sensores (datalogger_id, nome, tipo, unidade, posicao, endereco) FROM STDIN
+            """) as copy:
+                for linha in sensores:
+                    copy.write_row((dataloggers[linha['datalogger_mac']], linha['nome'], linha['tipo'],
+                                    linha['unidade'], linha['posicao'], linha['endereco']))
+
+        return {nome: len(linhas) for nome, linhas in self.linhas.items()}
+
+
+@app.route('/cadastros/importar')
+def importar_cadastros():
+    """Formulário de importação de cadastros em lote"""
+    return render_template('cadastros/importar.html', colunas=COLUNAS_IMPORTACAO)
+
+@app.route('/cadastros/importar/salvar', methods=['POST'])
+def salvar_importacao():
+    """Importa localizações, dispositivos e sensores de arquivos CSV em uma única transação"""
+    try:
+        arquivos = {}
+        for nome in COLUNAS_IMPORTACAO:
+            arquivo = request.files.get(nome)
+            if arquivo and arquivo.filename:
+                arquivos[nome] = arquivo.read().decode('utf-8-sig')
+        if not arquivos:
+            flash('Selecione ao menos um arquivo CSV', 'error')
+            return redirect(url_for('importar_cadastros'))
+
+        importacao = ImportacaoCadastros(arquivos)
+        resumo = None
+        if not importacao.erros:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                importacao.validar_no_banco(cursor)
+                if not importacao.erros:
+                    resumo = importacao.gravar(cursor)
+                cursor.close()
+
+        if importacao.erros:
+            for erro in importacao.erros[:IMPORTACAO_MAX_ERROS]:
+                flash(erro, 'error')
+            if len(importacao.erros) > IMPORTACAO_MAX_ERROS:
+                flash(f'... e mais {len(importacao.erros) - IMPORTACAO_MAX_ERROS} erros. Nada foi importado.', 'error')
+            else:
+                flash('Nada foi importado.', 'error')
+            return redirect(url_for('importar_cadastros'))
+
+        stats_snapshot.invalidate()
+        cache_metadados.invalidate('localizacoes', 'nomes_localizacoes', 'posicoes_sensores', 'dataloggers',
+                                   'alimentadores', 'contexto_sensores')
+        agenda_alimentadores.invalidate()
+        motor_alertas.invalidate()
+        mapa_sensores.invalidate()
+        flash(f"Importação concluída: {resumo['localizacoes']} localizações, {resumo['dispositivos']} dispositivos "
+              f"e {resumo['sensores']} sensores", 'success')
+        return redirect(url_for('cadastros'))
+
+    except UnicodeDecodeError:
+        flash('Os arquivos devem estar em UTF-8', 'error')
+        return redirect(url_for('importar_cadastros'))
+    except DatabaseUnavailable:
+        flash('Erro de conexão com o banco de dados', 'error')
+        return redirect(url_for('importar_cadastros'))
+    except Exception as e:
+        flash(f'Erro ao importar cadastros: {str(e)}', 'error')
+        return redirect(url_for('importar_cadastros'))
+
+# ROTA PARA LISTAR TODOS OS CADASTROS
+SQL_LISTA_CADASTROS = (
+    # Localizações
+    "SELECT id, nome, tipo, descricao FROM localizacoes ORDER BY nome",
+    # Dispositivos
+    """
+    SELECT d.id, d.nome, d.tipo, d.mac_address, l.nome
+    FROM dispositivos d
+    LEFT JOIN localizacoes l ON d.localizacao_id = l.id
+    ORDER BY d.tipo, d.nome
+    """,
+    # Sensores
+    """
+    SELECT s.id, s.nome, s.tipo, s.posicao, dev.nome
+    FROM sensores s
+    JOIN dataloggers d ON s.datalogger_id = d.id
+    JOIN dispositivos dev ON d.dispositivo_id = dev.id
+    ORDER BY dev.nome, s.nome
+    """,
+    # Configurações de alimentadores
+    """
+    SELECT c.id, dev.nome, c.horario_inicio, c.horario_fim, c.peso_diario, c.ativa
+    FROM config_alimentadores c
+    JOIN alimentadores a ON c.alimentador_id = a.id
+    JOIN dispositivos dev ON a.dispositivo_id = dev.id
+    ORDER BY dev.nome
+    """,
+    # Limites de temperatura
+    """
+    SELECT l.id, loc.nome, l.tipo_sensor, l.maximo, l.minimo
+    FROM limites_temperatura l
+    JOIN localizacoes loc ON l.localizacao_id = loc.id
+    ORDER BY loc.nome, l.tipo_sensor
+    """,
+)
+
+@app.route('/cadastros/lista')
+def lista_cadastros():
+    """Lista todos os cadastros"""
+    try:
+        # Sem escrita nos cadastros desde a última visita: 304
+        versao, resultados = consultar_com_versao(*SQL_LISTA_CADASTROS)
+        etag = versao and calcular_etag('lista_cadastros', versao[0])
+        ultima_alteracao = versao and versao[1]
+        if etag:
+            resposta = nao_modificado(etag, ultima_alteracao)
+            if resposta:
+                return resposta
+
+        # As cinco listas em uma ida e volta
+        (localizacoes, dispositivos, sensores,
+         configs_alimentadores, limites_temperatura) = resultados or consultar(*SQL_LISTA_CADASTROS)
+
+        resposta = render_template('cadastros/lista.html',
+                                   localizacoes=localizacoes,
+                                   dispositivos=dispositivos,
+                                   sensores=sensores,
+                                   configs_alimentadores=configs_alimentadores,
+                                   limites_temperatura=limites_temperatura)
+        return marcar_versao(resposta, etag, ultima_alteracao) if etag else resposta
+
+    except DatabaseUnavailable:
+        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar lista: {e}"), 500
+
+def formatar_estatisticas(stats):
+    """Campos do snapshot expostos pela API de estatísticas"""
+    return {
+        'dispositivos_online': stats['dispositivos_online'],
+        'total_dispositivos': stats['total_dispositivos'],
+        'temperatura_media': stats['temperatura_media'],
+        'alertas_ativos': stats['alertas_ativos']
+    }
+
+@app.route('/api/estatisticas')
+def api_estatisticas():
+    """API para estatísticas em tempo real"""
+    try:
+        stats = stats_snapshot.get()
+        dados = formatar_estatisticas(stats)
+
+        # Servido da memória: o ETag é o próprio conteúdo do snapshot
+        etag = calcular_etag('estatisticas', sorted(dados.items()))
+        resposta = nao_modificado(etag)
+        if resposta:
+            return resposta
+
+        return marcar_versao(jsonify(dados), etag)
+
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
-        print(f"Erro na conexão: {e}")
-        return None
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/')
-def index():
-    """Página inicial - redireciona para dashboard"""
-    return redirect(url_for('dashboard'))
+# Intervalo (s) entre eventos do stream e entre comentários de keep-alive
+SSE_TICK = float(os.environ.get('SSE_TICK', 5))
+SSE_KEEPALIVE = 15
+SSE_FILA_MAX = 20
 
-@app.route('/dashboard')
-def dashboard():
-    """Dashboard principal com estatísticas"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
+
+class DifusorEstatisticas(TarefaPeriodica):
+    """Produtor único do stream de estatísticas (Server-Sent Events).
+
+    A cada tick lê o snapshot de estatísticas e busca os alertas novos uma
+    única vez, e distribui os eventos para a fila de cada assinante. O custo
+    no banco não depende do número de dashboards abertos. Sem assinantes,
+    o tick não faz nada.
+
+    Alertas podem ficar visíveis fora da ordem do id (o id sai no INSERT,
+    não no commit): a busca recomeça do horizonte seguro da sequência de
+    alertas (HorizonteLeituras) e os ids acima dele já publicados são
+    descartados.
+    """
+
+    nome = 'difusor-estatisticas'
+
+    def __init__(self, intervalo):
+        super().__init__(intervalo)
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self._horizonte_alertas = HorizonteLeituras(HORIZONTE_FOLGA)
+        self._marca_alertas = None      # todo alerta até aqui já foi publicado (ou é anterior ao início)
+        self._publicados = set()        # ids acima da marca já publicados
+        self._seguro_alertas = 0
+        self._ultimas_estatisticas = None
+
+    def assinar(self):
+        fila = queue.Queue(maxsize=SSE_FILA_MAX)
+        with self._lock:
+            self._assinantes.add(fila)
+        self.iniciar()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def publicar(self, evento, dados):
+        mensagem = f"event: {evento}\ndata: {json.dumps(dados, default=str)}\n\n"
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for fila in assinantes:
+            try:
+                fila.put_nowait(mensagem)
+            except queue.Full:
+                # Cliente lento: descarta o evento mais antigo
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    pass
+                fila.put_nowait(mensagem)
+
+    def _alertas_novos(self):
+        if self._marca_alertas is None:
+            (maximo,), (marca,) = consultar("SELECT COALESCE(MAX(id), 0) FROM alertas", SQL_HORIZONTE_ALERTAS)
+            self._marca_alertas = maximo[0]
+            self._seguro_alertas = self._horizonte_alertas.observar(*marca)
+            return []
+
+        linhas, (marca,) = consultar(("""
+            SELECT id, tipo, mensagem, timestamp, severidade
+            FROM alertas
+            WHERE id > %s
+            ORDER BY id
+        """, (self._marca_alertas,)), SQL_HORIZONTE_ALERTAS)
+        novos = [linha for linha in linhas if linha[0] not in self._publicados]
+        self._publicados.update(linha[0] for linha in novos)
+
+        # A busca enxergou tudo até o horizonte da passada anterior: a marca
+        # avança até ele; o novo é observado na mesma ida ao banco
+        self._marca_alertas = max(self._marca_alertas, self._seguro_alertas)
+        self._seguro_alertas = self._horizonte_alertas.observar(*marca)
+        self._publicados = {alerta_id for alerta_id in self._publicados if alerta_id > self._marca_alertas}
+        return novos
+
+    def executar(self):
+        if not self._assinantes:
+            return
+
+        # Só publica quando os números mudam; o keep-alive mantém a conexão
+        estatisticas = formatar_estatisticas(stats_snapshot.get())
+        if estatisticas != self._ultimas_estatisticas:
+            self._ultimas_estatisticas = estatisticas
+            self.publicar('estatisticas', estatisticas)
+
+        for alerta_id, tipo, mensagem, timestamp, severidade in self._alertas_novos():
+            self.publicar('alerta', {
+                'id': alerta_id,
+                'tipo': tipo,
+                'mensagem': mensagem,
+                'timestamp': timestamp.isoformat(),
+                'severidade': severidade,
+            })
+
+
+difusor_estatisticas = DifusorEstatisticas(SSE_TICK)
+
+@app.route('/api/estatisticas/stream')
+def api_estatisticas_stream():
+    """Stream SSE com estatísticas periódicas e alertas novos.
+
+    Cada cliente mantém uma conexão aberta: em produção use workers com
+    threads ou gevent no gunicorn.
+    """
+    fila = difusor_estatisticas.assinar()
+
+    def gerar():
+        try:
+            # Estado inicial imediato, sem esperar o próximo tick
+            try:
+                yield f"event: estatisticas\ndata: {json.dumps(formatar_estatisticas(stats_snapshot.get()))}\n\n"
+            except Exception as e:
+                print(f"Erro ao carregar estatísticas: {e}")
+
+            while True:
+                try:
+                    yield fila.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            difusor_estatisticas.cancelar(fila)
+
+    return Response(gerar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Número de linhas buscadas do cursor do servidor a cada ida ao banco
+API_LEITURAS_CHUNK = int(os.environ.get('API_LEITURAS_CHUNK', 5000))
+
+def consulta_api_leituras(args):
+    """Consulta de /api/leituras em ordem cronológica; lança ValueError se algum filtro for inválido.
+
+    Sem LIMIT, descartar na transmissão as linhas de sensores fora da dimensão
+    não encurta a resposta; restringir no banco à lista de todos os sensores
+    trocaria a varredura do índice por timestamp por uma ordenação do período
+    inteiro antes da primeira linha.
+    """
+    condicoes, params = montar_filtros_leituras(args, so_conhecidos=False)
+
+    query = """
+        SELECT ls.sensor_id, ls.valor, ls.timestamp
+        FROM leituras_sensores ls
+        WHERE """ + " AND ".join(condicoes) + """
+        ORDER BY ls.timestamp
+    """
+    return query, params
+
+@app.route('/api/leituras')
+def api_leituras():
+    """API de leituras em NDJSON, transmitida a partir de um cursor no servidor"""
     try:
-        cursor = conn.cursor()
-        
-        # Estatísticas gerais
-        stats = {}
-        
-        # Contagem de dispositivos
-        cursor.execute("SELECT COUNT(*) FROM dispositivos")
-        stats['total_dispositivos'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM dispositivos WHERE tipo = 'alimentador'")
-        stats['total_alimentadores'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM dispositivos WHERE tipo = 'datalogger'")
-        stats['total_dataloggers'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM dispositivos WHERE online = true")
-        stats['dispositivos_online'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM localizacoes")
-        stats['total_localizacoes'] = cursor.fetchone()[0]
-        
-        # Últimas leituras
-        cursor.execute("""
-            SELECT l.nome as localizacao, s.posicao, ls.valor, ls.timestamp
-            FROM leituras_sensores ls
-            JOIN sensores s ON ls.sensor_id = s.id
-            JOIN dataloggers d ON s.datalogger_id = d.id
-            JOIN dispositivos dev ON d.dispositivo_id = dev.id
-            JOIN localizacoes l ON dev.localizacao_id = l.id
-            WHERE ls.timestamp >= NOW() - INTERVAL '1 hour'
-            ORDER BY ls.timestamp DESC
-            LIMIT 10
-        """)
-        ultimas_leituras = cursor.fetchall()
-        
-        # Alertas ativos
-        cursor.execute("""
-            SELECT tipo, mensagem, timestamp, severidade
-            FROM alertas 
-            WHERE resolvido = false
-            ORDER BY timestamp DESC
-            LIMIT 5
-        """)
-        alertas_ativos = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return render_template('dashboard.html', 
-                             stats=stats, 
-                             ultimas_leituras=ultimas_leituras,
-                             alertas_ativos=alertas_ativos)
-    
-    except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar dashboard: {e}"), 500
+        query, params = consulta_api_leituras(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {e}'}), 400
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
 
-@app.route('/dispositivos')
-def dispositivos():
-    """Lista todos os dispositivos"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
+    def gerar():
+        with get_db_connection() as conn:
+            # Cursor nomeado: as linhas ficam no servidor e chegam em blocos
+            with conn.cursor(name='api_leituras') as cursor:
+                cursor.itersize = API_LEITURAS_CHUNK
+                cursor.execute(query, params)
+                yield ''
+
+                while True:
+                    rows = cursor.fetchmany(API_LEITURAS_CHUNK)
+                    if not rows:
+                        break
+                    contexto = dimensao_sensores.contexto(row[0] for row in rows)
+                    yield ''.join(
+                        json.dumps({
+                            'sensor_id': sensor_id,
+                            'localizacao': contexto[sensor_id][0],
+                            'tipo_sensor': contexto[sensor_id][1],
+                            'valor': float(valor),
+                            'timestamp': timestamp.isoformat(),
+                            'datalogger': contexto[sensor_id][2],
+                        }) + '\n'
+                        for sensor_id, valor, timestamp in rows if sensor_id in contexto
+                    )
+
+    stream = gerar()
     try:
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT d.id, d.nome, d.tipo, d.mac_address, d.ip_address, 
-                   d.online, d.ultima_comunicacao, l.nome as localizacao
-            FROM dispositivos d
-            LEFT JOIN localizacoes l ON d.localizacao_id = l.id
-            ORDER BY d.tipo, d.nome
-        """)
-        
-        dispositivos = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return render_template('dispositivos.html', dispositivos=dispositivos)
-    
+        # Executa a consulta antes de enviar os cabeçalhos para poder responder com erro
+        next(stream)
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar dispositivos: {e}"), 500
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/alimentadores')
-def alimentadores():
-    """Página de alimentadores"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
-    try:
+    return Response(stream, mimetype='application/x-ndjson')
+
+# =============================================
+# EXPORTAÇÃO DE LEITURAS (CSV / PARQUET)
+# =============================================
+
+# Bytes do COPY acumulados antes de cada envio da resposta CSV
+EXPORTAR_BLOCO = int(os.environ.get('EXPORTAR_BLOCO', 65536))
+
+COLUNAS_EXPORTACAO = ('timestamp', 'sensor_id', 'localizacao', 'posicao', 'datalogger', 'valor')
+
+
+def esquema_exportacao():
+    import pyarrow as pa
+    return pa.schema([
+        ('timestamp', pa.timestamp('us')),
+        ('sensor_id', pa.int32()),
+        ('localizacao', pa.string()),
+        ('posicao', pa.string()),
+        ('datalogger', pa.string()),
+        ('valor', pa.float64()),
+    ])
+
+
+def dimensao_exportacao(args):
+    """Arrays paralelos (sensor, localização, posição, datalogger) dos sensores exportados"""
+    contexto = dimensao_sensores.contexto()
+    sensores = dimensao_sensores.sensores(args.get('localizacao', ''), args.get('tipo', ''))
+    return {
+        'sensores': sensores,
+        'localizacoes': [contexto[sensor_id][0] for sensor_id in sensores],
+        'posicoes': [contexto[sensor_id][1] for sensor_id in sensores],
+        'dataloggers': [contexto[sensor_id][2] for sensor_id in sensores],
+    }
+
+
+def fatias_exportacao(inicio, fim):
+    """Divide [inicio, fim) do banco em intervalos mensais; fim None deixa a última fatia aberta.
+
+    Cada fatia cai em uma só partição, então o ORDER BY de cada COPY ordena
+    no máximo um mês e a exportação começa sem ordenar o período inteiro.
+    """
+    if inicio == datetime.min:
+        inicio = consultar("SELECT min(timestamp) FROM leituras_sensores")[0][0][0]
+        if inicio is None:
+            return []
+
+    fatias = []
+    mes = datetime(inicio.year, inicio.month, 1)
+    limite = fim or datetime.now()
+    while True:
+        seguinte = proximo_mes(mes)
+        if seguinte >= limite:
+            fatias.append((max(inicio, mes), fim))
+            return fatias
+        fatias.append((max(inicio, mes), seguinte))
+        mes = seguinte
+
+
+def consulta_exportacao(de, ate, dimensao):
+    """Consulta de uma fatia da exportação, com os nomes vindos da dimensão em memória"""
+    condicoes = ["ls.timestamp >= %(de)s"]
+    if ate is not None:
+        condicoes.append("ls.timestamp < %(ate)s")
+
+    # O LATERAL com OFFSET 0 não vira um join comum: cada sensor é procurado
+    # uma vez (Memoize) e as leituras saem na ordem do índice, sem ordenação
+    query = """
+        SELECT ls.timestamp, ls.sensor_id, d.localizacao, d.posicao, d.datalogger, ls.valor
+        FROM leituras_sensores ls
+        JOIN LATERAL (
+            SELECT * FROM unnest(%(sensores)s::int[], %(localizacoes)s::text[],
+                                 %(posicoes)s::text[], %(dataloggers)s::text[])
+                AS d(sensor_id, localizacao, posicao, datalogger)
+            WHERE d.sensor_id = ls.sensor_id
+            OFFSET 0
+        ) d ON true
+        WHERE """ + " AND ".join(condicoes) + """
+        ORDER BY ls.timestamp, ls.id
+    """
+    return query, dict(dimensao, de=de, ate=ate)
+
+
+def grupos_arquivados_exportacao(inicio, fim, dimensao):
+    """Row groups dos meses arquivados em [inicio, fim), filtrados e com os nomes, um por vez"""
+    arquivos = arquivos_do_periodo(inicio, fim)
+    if not arquivos:
+        return
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    esquema = esquema_exportacao()
+    sensores = pa.array(dimensao['sensores'], pa.int32())
+    nomes = [pa.array(dimensao[chave], pa.string()) for chave in ('localizacoes', 'posicoes', 'dataloggers')]
+
+    for caminho in arquivos:
+        arquivo = pq.ParquetFile(caminho)
+        coluna_tempo = arquivo.schema_arrow.get_field_index('timestamp')
+        for grupo in range(arquivo.num_row_groups):
+            if grupo_fora_da_janela(arquivo, grupo, coluna_tempo, inicio, fim):
+                continue
+
+            tabela = arquivo.read_row_group(grupo, columns=['sensor_id', 'valor', 'timestamp'])
+            condicao = pc.and_(pc.greater_equal(tabela['timestamp'], inicio),
+                               pc.is_in(tabela['sensor_id'], value_set=sensores))
+            if fim is not None:
+                condicao = pc.and_(condicao, pc.less(tabela['timestamp'], fim))
+            tabela = tabela.filter(condicao)
+            if not tabela.num_rows:
+                continue
+
+            posicao = pc.index_in(tabela['sensor_id'], value_set=sensores)
+            yield pa.Table.from_arrays(
+                [tabela['timestamp'], tabela['sensor_id']]
+                + [coluna.take(posicao) for coluna in nomes]
+                + [tabela['valor']],
+                schema=esquema)
+
+
+def csv_exportacao(tabela):
+    """Linhas CSV de uma tabela Arrow no mesmo formato que o COPY de transmitir_csv gera"""
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+
+    # O PostgreSQL omite os zeros finais dos microssegundos
+    instantes = pc.strftime(tabela['timestamp'], format='%Y-%m-%d %H:%M:%S')
+    instantes = pc.replace_substring_regex(instantes, pattern=r'\.?0+$', replacement='')
+    saida = io.BytesIO()
+    pcsv.write_csv(tabela.set_column(0, 'timestamp', instantes), saida,
+                   pcsv.WriteOptions(include_header=False, quoting_style='needed'))
+    return saida.getvalue()
+
+
+def transmitir_csv(inicio, fim, fatias, dimensao):
+    """CSV da exportação: meses arquivados e depois COPY ... TO STDOUT de cada fatia do banco"""
+    with get_db_connection() as conn:
+        yield b''
+        yield (','.join(COLUNAS_EXPORTACAO) + '\n').encode()
+
+        for tabela in grupos_arquivados_exportacao(inicio, fim, dimensao):
+            yield csv_exportacao(tabela)
+
+        # Textos e timestamp sempre entre aspas, como no CSV do Arrow
         cursor = conn.cursor()
-        
-        # Alimentadores com informações completas
-        cursor.execute("""
-            SELECT 
-                a.id, dev.nome, l.nome as localizacao, 
-                a.capacidade_racao, a.vazao_media, a.motor_ligado,
-                dev.online, c.ativa as config_ativa, c.peso_diario
-            FROM alimentadores a
-            JOIN dispositivos dev ON a.dispositivo_id = dev.id
-            JOIN localizacoes l ON dev.localizacao_id = l.id
-            LEFT JOIN config_alimentadores c ON a.id = c.alimentador_id
-            ORDER BY dev.nome
-        """)
-        
-        alimentadores = cursor.fetchall()
-        
+        bloco = bytearray()
+        for de, ate in fatias:
+            query, params = consulta_exportacao(de, ate, dimensao)
+            with cursor.copy("COPY (" + query + ") TO STDOUT WITH (FORMAT csv, "
+                             "FORCE_QUOTE (timestamp, localizacao, posicao, datalogger))", params) as copia:
+                for linha in copia:
+                    bloco += linha
+                    if len(bloco) >= EXPORTAR_BLOCO:
+                        yield bytes(bloco)
+                        bloco.clear()
+        if bloco:
+            yield bytes(bloco)
         cursor.close()
-        conn.close()
-        
-        return render_template('alimentadores.html', alimentadores=alimentadores)
-    
+
+
+class SaidaEmBlocos:
+    """Destino de escrita do ParquetWriter que guarda os bytes até a resposta retirá-los"""
+
+    closed = False
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def transmitir_parquet(inicio, fim, fatias, dimensao):
+    """Parquet da exportação, enviado a cada row group (até ARQUIVO_LOTE linhas)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = esquema_exportacao()
+    with get_db_connection() as conn:
+        yield b''
+        saida = SaidaEmBlocos()
+        with pq.ParquetWriter(saida, esquema, compression=ARQUIVO_COMPRESSAO) as escritor:
+            for tabela in grupos_arquivados_exportacao(inicio, fim, dimensao):
+                escritor.write_table(tabela)
+                yield saida.retirar()
+
+            for de, ate in fatias:
+                query, params = consulta_exportacao(de, ate, dimensao)
+                with conn.cursor(name='exportar_leituras') as cursor:
+                    cursor.itersize = ARQUIVO_LOTE
+                    cursor.execute(query, params)
+                    while True:
+                        rows = cursor.fetchmany(ARQUIVO_LOTE)
+                        if not rows:
+                            break
+                        colunas = list(zip(*rows))
+                        escritor.write_table(pa.Table.from_arrays(
+                            [pa.array(coluna, tipo) for coluna, tipo in zip(colunas, esquema.types)],
+                            schema=esquema))
+                        yield saida.retirar()
+        # Rodapé do arquivo, escrito ao fechar o ParquetWriter
+        yield saida.retirar()
+
+
+@app.route('/api/leituras/exportar')
+def api_exportar_leituras():
+    """Exporta as leituras do período em CSV ou Parquet, transmitidas sem carregar tudo em memória.
+
+    Aceita os filtros de /api/leituras (`de`/`ate` ou `horas`, `localizacao`,
+    `tipo`) e `formato` (csv ou parquet). Os meses arquivados entram antes
+    dos que ainda estão no banco, todos em ordem cronológica.
+    """
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'parquet'):
+        return jsonify({'error': 'Formato inválido: use csv ou parquet'}), 400
+    if formato == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return jsonify({'error': 'Exportação em Parquet requer o pacote pyarrow'}), 501
+
+    try:
+        inicio, fim = janela_leituras(request.args)
+        dimensao = dimensao_exportacao(request.args)
+        fatias = fatias_exportacao(inicio, fim)
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {e}'}), 400
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
+
+    gerar = transmitir_csv if formato == 'csv' else transmitir_parquet
+    stream = gerar(inicio, fim, fatias, dimensao)
+    try:
+        # Empresta a conexão antes de enviar os cabeçalhos para poder responder com erro
+        next(stream)
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar alimentadores: {e}"), 500
+        return jsonify({'error': str(e)}), 500
+
+    nome = f"leituras_{datetime.now():%Y%m%d_%H%M%S}.{formato}"
+    mimetype = 'text/csv' if formato == 'csv' else 'application/vnd.apache.parquet'
+    return Response(stream, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nome}"'})
+
+# =============================================
+# INGESTÃO DE LEITURAS
+# =============================================
+
+API_BATCH_MAX = int(os.environ.get('API_BATCH_MAX', 50000))   # leituras por requisição
+
+
+class MapaSensores:
+    """Cache em memória de (mac_address, endereco) -> sensor_id.
+
+    Na primeira consulta de um datalogger todos os seus sensores são
+    carregados de uma vez; `invalidate()` é chamado pelos cadastros. Um
+    endereço desconhecido (sensor cadastrado por outro processo) provoca uma
+    recarga do datalogger; os que continuam sem sensor ficam anotados como
+    ausentes por `ttl` segundos, como na DimensaoSensores, para que um canal
+    sem cadastro não custe uma consulta a cada lote.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._sensores = {}
+        self._ausentes = {}    # mac_address -> (endereços sem sensor, time.monotonic() da recarga)
+        self._lock = threading.Lock()
+
+    def _consultar(self, mac_address):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.endereco, s.id
+                FROM sensores s
+                JOIN dataloggers d ON s.datalogger_id = d.id
+                JOIN dispositivos dev ON d.dispositivo_id = dev.id
+                WHERE dev.mac_address = %s
+            """, (mac_address,))
+            sensores = dict(cursor.fetchall())
+            cursor.close()
+        return sensores
+
+    def _carregar(self, mac_address, enderecos=()):
+        sensores = self._consultar(mac_address)
+        with self._lock:
+            self._sensores[mac_address] = sensores
+            ausentes = set(enderecos) | self._ausentes_validos(mac_address)
+            self._ausentes[mac_address] = (ausentes - sensores.keys(), time.monotonic())
+        return sensores
+
+    def _ausentes_validos(self, mac_address):
+        ausentes, instante = self._ausentes.get(mac_address, ((), 0.0))
+        return set(ausentes) if time.monotonic() - instante < self.ttl else set()
+
+    def sensores_do_datalogger(self, mac_address, enderecos=()):
+        """Mapa endereco -> sensor_id de um datalogger.
+
+        Recarrega se algum dos `enderecos` não está no mapa nem entre os
+        ausentes anotados há menos de `ttl` segundos.
+        """
+        sensores = self._sensores.get(mac_address)
+        if sensores is None:
+            return self._carregar(mac_address, enderecos)
+        faltando = set(enderecos) - sensores.keys()
+        if faltando:
+            with self._lock:
+                conhecidos = faltando <= self._ausentes_validos(mac_address)
+            if not conhecidos:
+                sensores = self._carregar(mac_address, enderecos)
+        return sensores
+
+    def invalidate(self):
+        with self._lock:
+            self._sensores.clear()
+            self._ausentes.clear()
+
+
+mapa_sensores = MapaSensores(METADADOS_TTL)
+
+
+def converter_timestamp(valor):
+    """Aceita epoch em segundos ou ISO 8601; None usa o horário atual.
+
+    Retorna sempre hora local sem fuso, como a coluna timestamp; ISO com fuso
+    é convertido para a hora local.
+    """
+    if valor is None:
+        return datetime.now()
+    if isinstance(valor, (int, float)):
+        return datetime.fromtimestamp(valor)
+    instante = datetime.fromisoformat(valor)
+    if instante.tzinfo is not None:
+        instante = instante.astimezone().replace(tzinfo=None)
+    return instante
+
+@app.route('/api/leituras/batch', methods=['POST'])
+def api_leituras_batch():
+    """Recebe um lote de leituras de um datalogger e grava com COPY.
+
+    Corpo JSON: {"mac_address": "...", "leituras": [[endereco, valor, timestamp], ...]}
+    O timestamp pode ser epoch (s), ISO 8601 ou omitido.
+    """
+    dados = request.get_json(silent=True)
+    if not dados or 'mac_address' not in dados or not isinstance(dados.get('leituras'), list):
+        return jsonify({'error': 'Informe mac_address e a lista de leituras'}), 400
+
+    mac_address = dados['mac_address']
+    lote = dados['leituras']
+    if len(lote) > API_BATCH_MAX:
+        return jsonify({'error': f'Lote maior que {API_BATCH_MAX} leituras'}), 413
 
-@app.route('/dataloggers')
-def dataloggers():
-    """Página de dataloggers"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
     try:
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                d.id, dev.nome, l.nome as localizacao, 
-                d.quantidade_sensores, d.intervalo_leitura,
-                dev.online, dev.ultima_comunicacao
-            FROM dataloggers d
-            JOIN dispositivos dev ON d.dispositivo_id = dev.id
-            JOIN localizacoes l ON dev.localizacao_id = l.id
-            ORDER BY dev.nome
-        """)
-        
-        dataloggers = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return render_template('dataloggers.html', dataloggers=dataloggers)
-    
+        # Endereço desconhecido pode ter sido cadastrado agora: o mapa recarrega uma vez
+        sensores = mapa_sensores.sensores_do_datalogger(mac_address, {leitura[0] for leitura in lote})
+        if not sensores:
+            return jsonify({'error': 'Datalogger não encontrado ou sem sensores'}), 404
+
+        linhas = []
+        ignoradas = set()
+        for leitura in lote:
+            endereco, valor = leitura[0], leitura[1]
+            sensor_id = sensores.get(endereco)
+            if sensor_id is None:
+                ignoradas.add(endereco)
+                continue
+            timestamp = converter_timestamp(leitura[2] if len(leitura) > 2 else None)
+            linhas.append((sensor_id, float(valor), timestamp))
+    except (IndexError, KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Leitura inválida: {e}'}), 400
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            if linhas:
+                with cursor.copy("COPY leituras_sensores (sensor_id, valor, timestamp) FROM STDIN") as copy:
+                    for linha in linhas:
+                        copy.write_row(linha)
+
+            if not PRESENCA_ATIVO:
+                # Sem o MonitorPresenca, o contato é gravado na mesma transação das leituras
+                cursor.execute("""
+                    UPDATE dispositivos SET online = true, ultima_comunicacao = NOW()
+                    WHERE mac_address = %s
+                """, (mac_address,))
+
+            cursor.close()
+
+        # Presença gravada em lote pelo MonitorPresenca
+        if PRESENCA_ATIVO:
+            monitor_presenca.registrar(mac_address)
+
+        # Incorpora as leituras novas às estatísticas contínuas sem esperar o intervalo
+        if ESTATISTICAS_ATIVO and linhas:
+            estatisticas_sensores.acordar()
+
+        if ALERTAS_ATIVO and linhas:
+            try:
+                motor_alertas.avaliar(linhas)
+            except Exception:
+                # Falha na avaliação não deve descartar leituras já gravadas
+                METRICA_ALERTAS_FALHAS.incrementar()
+                app.logger.exception("Erro ao avaliar alertas de %d leituras do datalogger %s",
+                                     len(linhas), mac_address)
+
+        return jsonify({
+            'inseridas': len(linhas),
+            'ignoradas': sorted(ignoradas)
+        })
+
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar dataloggers: {e}"), 500
+        return jsonify({'error': str(e)}), 500
+
+# =============================================
+# MOTOR DE ALERTAS
+# =============================================
+
+ALERTAS_ATIVO = os.environ.get('ALERTAS_ATIVO', '1') == '1'
+ALERTA_HISTERESE = float(os.environ.get('ALERTA_HISTERESE', 0.5))      # °C para encerrar um alerta
+ALERTAS_RECARGA_INTERVAL = float(os.environ.get('ALERTAS_RECARGA_INTERVAL', 300))
+
+
+class MotorAlertas(TarefaPeriodica):
+    """Avalia lotes de leituras contra `limites_temperatura` sem consultar o banco por leitura.
+
+    Mantém em memória os limites por (localizacao_id, tipo_sensor), o
+    contexto de cada sensor e os alertas abertos por (sensor_id, tipo). Só
+    escreve em `alertas` nas transições: abre quando a leitura sai da faixa
+    e resolve quando volta para dentro dela com folga de ALERTA_HISTERESE,
+    com a hora da leitura em `resolvido_em` (migração 011). Uma violação que
+    abre e normaliza no mesmo lote é gravada já resolvida. Um índice único
+    parcial (migração 009) garante um único alerta aberto por sensor e tipo
+    mesmo com vários processos. A recarga periódica capta alterações feitas
+    fora da aplicação.
+    """
+
+    nome = 'motor-alertas'
+
+    def __init__(self, intervalo):
+        super().__init__(intervalo)
+        self._limites = {}
+        self._sensores = {}
+        self._abertos = set()
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    def carregar(self):
+        """Recarrega limites, sensores e alertas abertos do banco"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT localizacao_id, tipo_sensor, minimo, maximo FROM limites_temperatura")
+            limites = {(loc, tipo): (float(minimo), float(maximo)) for loc, tipo, minimo, maximo in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT s.id, dev.localizacao_id, s.posicao, l.nome
+                FROM sensores s
+                JOIN dataloggers d ON s.datalogger_id = d.id
+                JOIN dispositivos dev ON d.dispositivo_id = dev.id
+                LEFT JOIN localizacoes l ON dev.localizacao_id = l.id
+            """)
+            sensores = {sensor_id: (loc, posicao, nome) for sensor_id, loc, posicao, nome in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT sensor_id, tipo FROM alertas
+                WHERE resolvido = false AND sensor_id IS NOT NULL
+            """)
+            abertos = set(cursor.fetchall())
+
+            cursor.close()
+
+        with self._lock:
+            self._limites = limites
+            self._sensores = sensores
+            self._abertos = abertos
+            self._carregado = True
+
+    executar = carregar
+
+    def invalidate(self):
+        """Força a recarga na próxima avaliação (limites ou sensores alterados)"""
+        self._carregado = False
+
+    def avaliar(self, leituras):
+        """Avalia um lote de (sensor_id, valor, timestamp) e grava as transições"""
+        if not self._carregado:
+            self.carregar()
+
+        aberturas = []      # linhas novas de alertas, abertas ou já resolvidas neste lote
+        pendentes = {}      # (sensor_id, tipo) -> índice em aberturas do alerta aberto neste lote
+        resolucoes = []     # (resolvido_em, sensor_id, tipo) dos alertas abertos antes do lote
+
+        with self._lock:
+            for sensor_id, valor, timestamp in sorted(leituras, key=lambda leitura: leitura[2]):
+                contexto = self._sensores.get(sensor_id)
+                if contexto is None:
+                    continue
+                localizacao_id, posicao, localizacao = contexto
+                limite = self._limites.get((localizacao_id, posicao))
+                if limite is None:
+                    continue
+                minimo, maximo = limite
+
+                for tipo, violou, normalizou, referencia, texto in (
+                    ('temperatura_alta', valor > maximo, valor <= maximo - ALERTA_HISTERESE, maximo, 'acima do máximo'),
+                    ('temperatura_baixa', valor < minimo, valor >= minimo + ALERTA_HISTERESE, minimo, 'abaixo do mínimo'),
+                ):
+                    chave = (sensor_id, tipo)
+                    if chave in self._abertos:
+                        if normalizou:
+                            self._abertos.discard(chave)
+                            if chave in pendentes:
+                                # Pico curto: o alerta aberto neste lote já entra resolvido
+                                aberturas[pendentes.pop(chave)][5:] = [True, timestamp]
+                            else:
+                                resolucoes.append((timestamp, sensor_id, tipo))
+                    elif violou:
+                        self._abertos.add(chave)
+                        pendentes[chave] = len(aberturas)
+                        aberturas.append([
+                            tipo,
+                            f"{localizacao} / {posicao}: {valor:.2f}°C {texto} ({referencia:.2f}°C)",
+                            timestamp,
+                            'ALTA',
+                            sensor_id,
+                            False,
+                            None,
+                        ])
+
+        if not aberturas and not resolucoes:
+            return 0
+
+        try:
+            self._gravar(aberturas, resolucoes)
+        except Exception:
+            # O estado em memória já avançou: recarrega do banco na próxima avaliação
+            self._carregado = False
+            raise
+
+        stats_snapshot.invalidate()
+        return len(aberturas) + len(resolucoes)
+
+    def _gravar(self, aberturas, resolucoes):
+        """Resolve os alertas que já estavam abertos e depois insere os do lote.
+
+        Nessa ordem, um alerta aberto no banco que normaliza e volta a violar
+        no mesmo lote é resolvido antes que o novo ocupe a vaga do índice único.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if resolucoes:
+                cursor.executemany("""
+                    UPDATE alertas SET resolvido = true, resolvido_em = %s
+                    WHERE sensor_id = %s AND tipo = %s AND resolvido = false
+                """, resolucoes)
+            if aberturas:
+                cursor.executemany("""
+                    INSERT INTO alertas (tipo, mensagem, timestamp, severidade, sensor_id, resolvido, resolvido_em)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (sensor_id, tipo) WHERE resolvido = false AND sensor_id IS NOT NULL
+                    DO NOTHING
+                """, aberturas)
+            cursor.close()
+
+
+motor_alertas = MotorAlertas(ALERTAS_RECARGA_INTERVAL)
+
+# =============================================
+# PRESENÇA DOS DISPOSITIVOS
+# =============================================
+
+PRESENCA_ATIVO = os.environ.get('PRESENCA_ATIVO', '1') == '1'
+PRESENCA_FLUSH_INTERVAL = float(os.environ.get('PRESENCA_FLUSH_INTERVAL', 5))   # s entre gravações
+PRESENCA_TOLERANCIA = float(os.environ.get('PRESENCA_TOLERANCIA', 3))           # intervalos de leitura sem contato
+PRESENCA_TIMEOUT_PADRAO = float(os.environ.get('PRESENCA_TIMEOUT_PADRAO', 300)) # s, dispositivos sem intervalo_leitura
+
+
+class MonitorPresenca(TarefaPeriodica):
+    """Mantém `dispositivos.online` e `ultima_comunicacao` sem uma escrita por contato.
+
+    `registrar()` só anota em memória o último contato de cada MAC; a cada
+    `intervalo` segundos os contatos acumulados viram um único UPDATE. Na
+    mesma passada, dispositivos sem contato há mais de PRESENCA_TOLERANCIA
+    intervalos de leitura (PRESENCA_TIMEOUT_PADRAO para os que não têm
+    datalogger) são marcados offline e ganham um alerta 'dispositivo_offline',
+    resolvido no próximo contato. A transição é feita no banco (WHERE online),
+    então só um processo a registra.
+    """
+
+    nome = 'presenca-dispositivos'
+
+    SQL_CONTATOS = """
+        /* presenca_contatos */
+        WITH contatos AS (
+            UPDATE dispositivos dev
+            SET ultima_comunicacao = GREATEST(dev.ultima_comunicacao, NOW() - c.atraso * INTERVAL '1 second'),
+                online = true
+            FROM unnest(%s::text[], %s::float8[]) AS c(mac_address, atraso), dispositivos antes
+            WHERE dev.mac_address = c.mac_address AND antes.id = dev.id
+            RETURNING dev.id, antes.online
+        )
+        SELECT id FROM contatos WHERE NOT online
+    """
+
+    SQL_EXPIRADOS = """
+        /* presenca_expirados */
+        UPDATE dispositivos dev
+        SET online = false
+        WHERE dev.online
+          AND dev.ultima_comunicacao < NOW() - make_interval(secs => COALESCE(
+                (SELECT MAX(d.intervalo_leitura) FROM dataloggers d WHERE d.dispositivo_id = dev.id) * %(tolerancia)s,
+                %(padrao)s) + %(folga)s)
+        RETURNING dev.id, dev.nome, dev.ultima_comunicacao
+    """
+
+    def __init__(self, intervalo):
+        super().__init__(intervalo)
+        self._contatos = {}
+        self._lock = threading.Lock()
+        self._com_alertas = None
+
+    def registrar(self, mac_address):
+        """Anota um contato do dispositivo (gravado na próxima passada)"""
+        with self._lock:
+            self._contatos[mac_address] = time.monotonic()
+
+    def _alertas_disponiveis(self, cursor):
+        # Sem a migração 006 os estados continuam sendo mantidos, mas sem alertas
+        if self._com_alertas is None:
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'alertas' AND column_name = 'dispositivo_id'
+                )
+            """)
+            self._com_alertas = cursor.fetchone()[0]
+            if not self._com_alertas:
+                print("Presença: alertas.dispositivo_id não existe (migração 006); alertas de offline desativados")
+        return self._com_alertas
+
+    def executar(self):
+        with self._lock:
+            contatos, self._contatos = self._contatos, {}
+
+        try:
+            voltaram, expirados = self._gravar(contatos)
+        except Exception:
+            # Devolve os contatos não gravados, preservando os mais recentes
+            with self._lock:
+                for mac_address, instante in contatos.items():
+                    if instante > self._contatos.get(mac_address, float('-inf')):
+                        self._contatos[mac_address] = instante
+            raise
+
+        if voltaram or expirados:
+            stats_snapshot.invalidate()
+
+    def _gravar(self, contatos):
+        agora = time.monotonic()
+        # Ordem fixa de MACs para que processos concorrentes travem as linhas na mesma ordem
+        macs = sorted(contatos)
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            com_alertas = self._alertas_disponiveis(cursor)
+
+            voltaram = []
+            if macs:
+                cursor.execute(self.SQL_CONTATOS, (macs, [agora - contatos[mac] for mac in macs]))
+                voltaram = [row[0] for row in cursor.fetchall()]
+                if voltaram and com_alertas:
+                    cursor.execute("""
+                        UPDATE alertas SET resolvido = true, resolvido_em = NOW()
+                        WHERE tipo = 'dispositivo_offline' AND resolvido = false
+                          AND dispositivo_id = ANY(%s)
+                    """, (voltaram,))
+
+            cursor.execute(self.SQL_EXPIRADOS, {
+                'tolerancia': PRESENCA_TOLERANCIA,
+                'padrao': PRESENCA_TIMEOUT_PADRAO,
+                'folga': self.intervalo,
+            })
+            expirados = cursor.fetchall()
+            if expirados and com_alertas:
+                cursor.executemany("""
+                    INSERT INTO alertas (tipo, mensagem, timestamp, severidade, dispositivo_id, resolvido)
+                    VALUES ('dispositivo_offline', %s, NOW(), 'MEDIA', %s, false)
+                    ON CONFLICT (dispositivo_id, tipo) WHERE resolvido = false AND dispositivo_id IS NOT NULL
+                    DO NOTHING
+                """, [
+                    (f"{nome}: sem comunicação desde {ultima_comunicacao:%d/%m/%Y %H:%M:%S}", dispositivo_id)
+                    for dispositivo_id, nome, ultima_comunicacao in expirados
+                ])
+
+            cursor.close()
+
+        return voltaram, expirados
+
+
+monitor_presenca = MonitorPresenca(PRESENCA_FLUSH_INTERVAL)
+
+@app.route('/api/heartbeat', methods=['POST'])
+def api_heartbeat():
+    """Registra um contato do dispositivo; o estado é gravado em lote pelo MonitorPresenca.
+
+    Corpo JSON: {"mac_address": "..."}
+    """
+    dados = request.get_json(silent=True)
+    if not dados or not isinstance(dados.get('mac_address'), str):
+        return jsonify({'error': 'Informe mac_address'}), 400
+
+    if PRESENCA_ATIVO:
+        monitor_presenca.registrar(dados['mac_address'])
+    return jsonify({'status': 'ok'}), 202
+
+# =============================================
+# ESTATÍSTICAS CONTÍNUAS DOS SENSORES
+# =============================================
+
+ESTATISTICAS_ATIVO = os.environ.get('ESTATISTICAS_ATIVO', '1') == '1'
+ESTATISTICAS_INTERVALO = float(os.environ.get('ESTATISTICAS_INTERVALO', 5))   # s entre buscas de leituras novas
+ESTATISTICAS_LOTE = int(os.environ.get('ESTATISTICAS_LOTE', 50000))           # leituras por busca
+# Janelas móveis (s), cada uma dividida em ESTATISTICAS_DIVISOES buckets
+ESTATISTICAS_JANELAS = [int(j) for j in os.environ.get('ESTATISTICAS_JANELAS', '300,3600').split(',')]
+ESTATISTICAS_DIVISOES = int(os.environ.get('ESTATISTICAS_DIVISOES', 30))
+ESTATISTICAS_Z_LIMITE = float(os.environ.get('ESTATISTICAS_Z_LIMITE', 3))      # |z| acima disto é anomalia
+ESTATISTICAS_MIN_AMOSTRAS = int(os.environ.get('ESTATISTICAS_MIN_AMOSTRAS', 10))
+ESTATISTICAS_RESUMO_TTL = float(os.environ.get('ESTATISTICAS_RESUMO_TTL', 5))  # s de validade do resumo da frota
+ESTATISTICAS_RESUMO_MAX = 50                                                   # anomalias listadas no resumo
+
+
+def numero_json(valor, casas=4):
+    """float arredondado, ou None para NaN/infinito (que o JSON não representa)"""
+    valor = float(valor)
+    return round(valor, casas) if np.isfinite(valor) else None
+
+
+class EstatisticasSensores(TarefaPeriodica):
+    """Média, desvio padrão, mínimo, máximo e EWMA móveis de cada sensor, em memória.
+
+    Cada janela é um anel de `divisoes` buckets por sensor com contagem, soma,
+    soma dos quadrados, mínimo e máximo, em arrays numpy (janela x sensor x
+    bucket); a janela efetiva anda em passos de janela/divisoes. A EWMA usa a
+    própria janela como constante de tempo, com peso proporcional ao intervalo
+    entre leituras. A thread de fundo busca as leituras novas por id até o
+    horizonte seguro, como o RollupWorker, e as incorpora em lote com operações
+    vetorizadas; a primeira passada carrega as leituras da maior janela. O
+    z-score compara a última leitura com a média e o desvio da maior janela.
+    """
+
+    nome = 'estatisticas-sensores'
+    executar_ao_iniciar = True
+
+    def __init__(self, intervalo, janelas, divisoes):
+        super().__init__(intervalo)
+        self.janelas = np.asarray(janelas, dtype=np.float64)
+        self.divisoes = divisoes
+        self.larguras = self.janelas / divisoes
+        self._slots = {}                         # sensor_id -> índice nos arrays
+        self._ids = np.zeros(0, dtype=np.int64)  # índice -> sensor_id
+        self._capacidade = 0
+        self._alocar(64)
+        self._ultimo_id = None
+        self._horizonte = 0
+        self._alvo_carga = None                  # último id da sequência quando a carga foi pedida
+        self._resumo = None                      # (instante, JSON do resumo da frota)
+        self._lock = threading.Lock()
+
+    def _alocar(self, capacidade):
+        """Cria ou amplia os arrays de estado; o eixo dos sensores é o último dos 1-D e o 2º dos demais"""
+        forma = (len(self.janelas), capacidade, self.divisoes)
+        novos = {
+            '_contagem': np.zeros(forma),
+            '_soma': np.zeros(forma),
+            '_quadrados': np.zeros(forma),
+            '_minimo': np.full(forma, np.inf),
+            '_maximo': np.full(forma, -np.inf),
+            '_epoca': np.full(forma, -1, dtype=np.int64),   # número absoluto do bucket em cada posição
+            '_ewma': np.full((len(self.janelas), capacidade), np.nan),
+            '_ultimo_valor': np.full(capacidade, np.nan),
+            '_ultimo_tempo': np.full(capacidade, -np.inf),
+        }
+        for nome, novo in novos.items():
+            if self._capacidade:
+                if novo.ndim == 1:
+                    novo[:self._capacidade] = getattr(self, nome)
+                else:
+                    novo[:, :self._capacidade] = getattr(self, nome)
+            setattr(self, nome, novo)
+        self._capacidade = capacidade
+
+    def _indices(self, sensor_ids):
+        """Índice nos arrays de cada leitura, registrando os sensores novos"""
+        unicos, inversos = np.unique(sensor_ids, return_inverse=True)
+        novos = [sensor_id for sensor_id in unicos.tolist() if sensor_id not in self._slots]
+        if novos:
+            for sensor_id in novos:
+                self._slots[sensor_id] = len(self._slots)
+            self._ids = np.concatenate([self._ids, np.asarray(novos, dtype=np.int64)])
+            if len(self._slots) > self._capacidade:
+                self._alocar(max(2 * self._capacidade, len(self._slots)))
+        return np.asarray([self._slots[sensor_id] for sensor_id in unicos.tolist()], dtype=np.int64)[inversos]
+
+    def incorporar(self, sensor_ids, valores, tempos):
+        """Incorpora um lote de leituras (arrays de sensor_id, valor e epoch em segundos)"""
+        if not len(sensor_ids):
+            return
+        with self._lock:
+            slots = self._indices(sensor_ids)
+            for j in range(len(self.janelas)):
+                self._incorporar_janela(j, slots, valores, tempos)
+            self._atualizar_ewma(slots, valores, tempos)
+
+    def _incorporar_janela(self, j, slots, valores, tempos):
+        buckets = np.floor(tempos / self.larguras[j]).astype(np.int64)
+        celulas = slots * self.divisoes + buckets % self.divisoes
+        epoca = self._epoca[j].reshape(-1)
 
-@app.route('/leituras')
-def leituras():
-    """Página de leituras dos sensores"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Filtros
-        localizacao = request.args.get('localizacao', '')
-        sensor_type = request.args.get('tipo', '')
-        horas = request.args.get('horas', '24')
-        
-        query = """
-            SELECT 
-                l.nome as localizacao,
-                s.posicao as tipo_sensor,
-                ls.valor,
-                ls.timestamp,
-                dev.nome as datalogger
-            FROM leituras_sensores ls
-            JOIN sensores s ON ls.sensor_id = s.id
-            JOIN dataloggers d ON s.datalogger_id = d.id
-            JOIN dispositivos dev ON d.dispositivo_id = dev.id
-            JOIN localizacoes l ON dev.localizacao_id = l.id
-            WHERE ls.timestamp >= NOW() - INTERVAL %s hours
+        # Posições do anel que passam a um bucket mais novo são zeradas antes de somar
+        antes = epoca[celulas]
+        np.maximum.at(epoca, celulas, buckets)
+        depois = epoca[celulas]
+        zerar = celulas[depois > antes]
+        self._contagem[j].reshape(-1)[zerar] = 0
+        self._soma[j].reshape(-1)[zerar] = 0
+        self._quadrados[j].reshape(-1)[zerar] = 0
+        self._minimo[j].reshape(-1)[zerar] = np.inf
+        self._maximo[j].reshape(-1)[zerar] = -np.inf
+
+        # Leituras de uma volta anterior do anel já saíram da janela
+        validas = buckets == depois
+        celulas, valores = celulas[validas], valores[validas]
+        np.add.at(self._contagem[j].reshape(-1), celulas, 1)
+        np.add.at(self._soma[j].reshape(-1), celulas, valores)
+        np.add.at(self._quadrados[j].reshape(-1), celulas, valores * valores)
+        np.minimum.at(self._minimo[j].reshape(-1), celulas, valores)
+        np.maximum.at(self._maximo[j].reshape(-1), celulas, valores)
+
+    def _atualizar_ewma(self, slots, valores, tempos):
+        """EWMA com intervalos irregulares, vetorizada por sensor.
+
+        e_n = a_n * e_(n-1) + (1 - a_n) * x_n, com a_n = exp(-dt_n / tau). Só o
+        valor final interessa, então cada leitura entra com o seu peso decaído
+        até a última leitura do sensor no lote.
         """
-        params = [horas]
-        
-        if localizacao:
-            query += " AND l.nome = %s"
-            params.append(localizacao)
-        
-        if sensor_type:
-            query += " AND s.posicao = %s"
-            params.append(sensor_type)
-        
-        query += " ORDER BY ls.timestamp DESC LIMIT 1000"
-        
-        cursor.execute(query, params)
-        leituras = cursor.fetchall()
-        
-        # Localizações para o filtro
-        cursor.execute("SELECT DISTINCT nome FROM localizacoes ORDER BY nome")
-        localizacoes = [row[0] for row in cursor.fetchall()]
-        
-        # Tipos de sensor para o filtro
-        cursor.execute("SELECT DISTINCT posicao FROM sensores ORDER BY posicao")
-        tipos_sensor = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
-        
-        return render_template('leituras.html', 
-                             leituras=leituras,
-                             localizacoes=localizacoes,
-                             tipos_sensor=tipos_sensor,
-                             filtros=request.args)
-    
-    except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar leituras: {e}"), 500
+        ordem = np.lexsort((tempos, slots))
+        slots, valores, tempos = slots[ordem], valores[ordem], tempos[ordem]
 
-@app.route('/graficos')
-def graficos():
-    """Página com gráficos das leituras"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Dados para gráficos - últimas 24 horas
-        cursor.execute("""
-            SELECT 
-                l.nome as localizacao,
-                s.posicao as tipo_sensor,
-                ls.valor,
-                ls.timestamp
-            FROM leituras_sensores ls
-            JOIN sensores s ON ls.sensor_id = s.id
-            JOIN dataloggers d ON s.datalogger_id = d.id
-            JOIN dispositivos dev ON d.dispositivo_id = dev.id
-            JOIN localizacoes l ON dev.localizacao_id = l.id
-            WHERE ls.timestamp >= NOW() - INTERVAL '24 hours'
-            ORDER BY ls.timestamp
-        """)
-        
-        dados = cursor.fetchall()
-        
-        graphs = []
-        
-        if dados:
-            # Converter para DataFrame
-            df = pd.DataFrame(dados, columns=['localizacao', 'tipo_sensor', 'valor', 'timestamp'])
-            
-            # Criar gráficos
-            if not df.empty:
-                # Gráfico de linhas por localização e tipo de sensor
-                fig = px.line(df, x='timestamp', y='valor', color='localizacao', 
-                             line_group='tipo_sensor', title='Temperaturas por Localização')
-                graphs.append(json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder))
-                
-                # Gráfico de boxplot por tipo de sensor
-                fig2 = px.box(df, x='tipo_sensor', y='valor', 
-                             title='Distribuição de Temperaturas por Tipo de Sensor')
-                graphs.append(json.dumps(fig2, cls=plotly.utils.PlotlyJSONEncoder))
-        
-        cursor.close()
-        conn.close()
-        
-        return render_template('graficos.html', graphs=graphs)
-    
-    except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar gráficos: {e}"), 500
+        # Leituras fora de ordem (anteriores à última já vista) ficam só nas janelas
+        novas = tempos > self._ultimo_tempo[slots]
+        slots, valores, tempos = slots[novas], valores[novas], tempos[novas]
+        if not len(slots):
+            return
 
-# =============================================
-# ROTAS DE CADASTRO
-# =============================================
+        inicio = np.r_[True, slots[1:] != slots[:-1]]
+        fim = np.r_[slots[1:] != slots[:-1], True]
+        grupo = np.cumsum(inicio) - 1
+        sensores = slots[fim]
+        tempo_final = tempos[fim]
+        ultimo_tempo = self._ultimo_tempo[sensores]
 
-@app.route('/cadastros')
-def cadastros():
-    """Página principal de cadastros"""
-    return render_template('cadastros.html')
+        anterior = np.r_[0.0, tempos[:-1]]
+        anterior[inicio] = ultimo_tempo
+        # Primeira leitura do sensor: a EWMA começa no próprio valor
+        primeira = ~np.isfinite(anterior)
+        anterior[primeira] = tempos[primeira]
 
-# CADASTRO DE LOCALIZAÇÕES
-@app.route('/cadastros/localizacoes')
-def cadastrar_localizacao():
-    """Formulário para cadastrar localização"""
-    return render_template('cadastros/localizacao.html')
+        for j, tau in enumerate(self.janelas):
+            peso = -np.expm1(-(tempos - anterior) / tau)
+            peso[primeira] = 1.0
+            decaida = np.bincount(grupo, weights=peso * valores * np.exp(-(tempo_final[grupo] - tempos) / tau))
+            ewma = np.nan_to_num(self._ewma[j, sensores])
+            self._ewma[j, sensores] = ewma * np.exp(-(tempo_final - ultimo_tempo) / tau) + decaida
 
-@app.route('/cadastros/localizacoes/salvar', methods=['POST'])
-def salvar_localizacao():
-    """Salva uma nova localização"""
-    try:
-        nome = request.form['nome']
-        descricao = request.form['descricao']
-        tipo = request.form['tipo']
-        
-        conn = get_db_connection()
-        if not conn:
-            flash('Erro de conexão com o banco de dados', 'error')
-            return redirect(url_for('cadastrar_localizacao'))
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO localizacoes (nome, descricao, tipo)
-            VALUES (%s, %s, %s)
-        """, (nome, descricao, tipo))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash('Localização cadastrada com sucesso!', 'success')
-        return redirect(url_for('cadastros'))
-    
-    except Exception as e:
-        flash(f'Erro ao cadastrar localização: {str(e)}', 'error')
-        return redirect(url_for('cadastrar_localizacao'))
+        self._ultimo_valor[sensores] = valores[fim]
+        self._ultimo_tempo[sensores] = tempo_final
 
-# CADASTRO DE DISPOSITIVOS
-@app.route('/cadastros/dispositivos')
-def cadastrar_dispositivo():
-    """Formulário para cadastrar dispositivo"""
-    conn = get_db_connection()
-    if not conn:
-        flash('Erro de conexão com o banco de dados', 'error')
-        return redirect(url_for('cadastros'))
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nome FROM localizacoes ORDER BY nome")
-    localizacoes = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return render_template('cadastros/dispositivo.html', localizacoes=localizacoes)
+    def _agregar(self, slots, agora):
+        """(amostras, média, desvio, mínimo, máximo) por janela x sensor, somando os buckets na janela"""
+        atual = np.floor(agora / self.larguras).astype(np.int64)[:, None, None]
+        validos = self._epoca[:, slots] > atual - self.divisoes
+        contagem = np.where(validos, self._contagem[:, slots], 0).sum(axis=2)
+        soma = np.where(validos, self._soma[:, slots], 0).sum(axis=2)
+        quadrados = np.where(validos, self._quadrados[:, slots], 0).sum(axis=2)
+        minimo = np.where(validos, self._minimo[:, slots], np.inf).min(axis=2)
+        maximo = np.where(validos, self._maximo[:, slots], -np.inf).max(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = soma / contagem
+            # Desvio padrão amostral, como o std() do pandas
+            desvio = np.sqrt(np.maximum(quadrados - soma * media, 0) / (contagem - 1))
+        return contagem, media, desvio, minimo, maximo
 
-@app.route('/cadastros/dispositivos/salvar', methods=['POST'])
-def salvar_dispositivo():
-    """Salva um novo dispositivo"""
-    try:
-        nome = request.form['nome']
-        descricao = request.form['descricao']
-        mac_address = request.form['mac_address']
-        ip_address = request.form.get('ip_address', '')
-        tipo = request.form['tipo']
-        modelo = request.form.get('modelo', '')
-        localizacao_id = request.form.get('localizacao_id') or None
-        
-        conn = get_db_connection()
-        if not conn:
-            flash('Erro de conexão com o banco de dados', 'error')
-            return redirect(url_for('cadastrar_dispositivo'))
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO dispositivos (localizacao_id, nome, descricao, mac_address, ip_address, tipo, modelo)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (localizacao_id, nome, descricao, mac_address, ip_address, tipo, modelo))
-        
-        # Obter o ID do dispositivo inserido
-        dispositivo_id = cursor.fetchone()[0]
-        
-        # Se for alimentador ou datalogger, criar registro na tabela específica
-        if tipo == 'alimentador':
-            cursor.execute("""
-                INSERT INTO alimentadores (dispositivo_id, capacidade_racao, vazao_media)
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (dispositivo_id, 0, 0))
-            
-            alimentador_id = cursor.fetchone()[0]
-            
-            # Criar configuração padrão
-            cursor.execute("""
-                INSERT INTO config_alimentadores (alimentador_id, ativa)
-                VALUES (%s, false)
-            """, (alimentador_id,))
-            
-            # Criar calibração padrão
-            cursor.execute("""
-                INSERT INTO calibracao_alimentadores (alimentador_id)
-                VALUES (%s)
-            """, (alimentador_id,))
-            
-        elif tipo == 'datalogger':
+    @staticmethod
+    def _z_score(ultimo_valor, contagem, media, desvio):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (ultimo_valor - media) / desvio
+        z[(contagem < ESTATISTICAS_MIN_AMOSTRAS) | ~(desvio > 0)] = np.nan
+        return z
+
+    def sensor(self, sensor_id):
+        """Estatísticas de um sensor, ou None se ele não tem leituras incorporadas"""
+        agora = time.time()
+        with self._lock:
+            slot = self._slots.get(sensor_id)
+            if slot is None:
+                return None
+            contagem, media, desvio, minimo, maximo = self._agregar(np.array([slot]), agora)
+            ewma = self._ewma[:, slot].copy()
+            ultimo_valor = self._ultimo_valor[slot]
+            ultimo_tempo = self._ultimo_tempo[slot]
+
+        z = self._z_score(np.array([ultimo_valor]), contagem[-1], media[-1], desvio[-1])[0]
+        return {
+            'sensor_id': sensor_id,
+            'ultimo_valor': numero_json(ultimo_valor),
+            'ultima_leitura': datetime.fromtimestamp(ultimo_tempo, timezone.utc).isoformat(),
+            'janelas': [{
+                'segundos': int(janela),
+                'amostras': int(contagem[j, 0]),
+                'media': numero_json(media[j, 0]),
+                'desvio': numero_json(desvio[j, 0]),
+                'minimo': numero_json(minimo[j, 0]),
+                'maximo': numero_json(maximo[j, 0]),
+                'ewma': numero_json(ewma[j]),
+            } for j, janela in enumerate(self.janelas)],
+            'z_score': numero_json(z, 2),
+            'anomalia': bool(abs(z) > ESTATISTICAS_Z_LIMITE),
+        }
+
+    def resumo(self):
+        """JSON do resumo da frota, recalculado no máximo a cada ESTATISTICAS_RESUMO_TTL s"""
+        agora = time.time()
+        resumo = self._resumo
+        if resumo is not None and agora - resumo[0] < ESTATISTICAS_RESUMO_TTL:
+            return resumo[1]
+
+        with self._lock:
+            slots = np.arange(len(self._slots))
+            contagem, media, desvio, minimo, maximo = self._agregar(slots, agora)
+            ultimo_valor = self._ultimo_valor[slots]
+            ids = self._ids.copy()
+
+        z = self._z_score(ultimo_valor, contagem[-1], media[-1], desvio[-1])
+        anomalos = np.flatnonzero(np.abs(np.nan_to_num(z)) > ESTATISTICAS_Z_LIMITE)
+        anomalos = anomalos[np.argsort(-np.abs(z[anomalos]))][:ESTATISTICAS_RESUMO_MAX]
+        contexto = dimensao_sensores.contexto(ids[anomalos].tolist())
+
+        janelas = []
+        for j, janela in enumerate(self.janelas):
+            ativos = contagem[j] > 0
+            total = contagem[j][ativos].sum()
+            janelas.append({
+                'segundos': int(janela),
+                'sensores': int(ativos.sum()),
+                'amostras': int(total),
+                'media': numero_json((media[j][ativos] * contagem[j][ativos]).sum() / total) if total else None,
+                'minimo': numero_json(minimo[j].min()) if ativos.any() else None,
+                'maximo': numero_json(maximo[j].max()) if ativos.any() else None,
+            })
+
+        anomalias = []
+        for i in anomalos.tolist():
+            localizacao, posicao = contexto.get(int(ids[i]), (None, None, None))[:2]
+            anomalias.append({
+                'sensor_id': int(ids[i]),
+                'localizacao': localizacao,
+                'posicao': posicao,
+                'ultimo_valor': numero_json(ultimo_valor[i]),
+                'media': numero_json(media[-1, i]),
+                'desvio': numero_json(desvio[-1, i]),
+                'z_score': numero_json(z[i], 2),
+            })
+
+        corpo = json.dumps({
+            'atualizado_em': datetime.fromtimestamp(agora, timezone.utc).isoformat(),
+            'sensores': len(ids),
+            'janelas': janelas,
+            'z_limite': ESTATISTICAS_Z_LIMITE,
+            'total_anomalias': int(np.count_nonzero(np.abs(np.nan_to_num(z)) > ESTATISTICAS_Z_LIMITE)),
+            'anomalias': anomalias,
+        }).encode('utf-8')
+        self._resumo = (agora, corpo)
+        return corpo
+
+    def _incorporar_linhas(self, linhas):
+        """Linhas (sensor_id, valor, timestamp) do banco -> incorporar()"""
+        sensor_ids, valores, instantes = zip(*linhas)
+        # timestamp é hora local sem fuso, como o datetime.now() de quem grava
+        tempos = np.fromiter((instante.timestamp() for instante in instantes), dtype=np.float64,
+                             count=len(instantes))
+        self.incorporar(np.asarray(sensor_ids, dtype=np.int64), np.asarray(valores, dtype=np.float64), tempos)
+
+    def carregar(self):
+        """Primeira passada: leituras da maior janela, em lotes por um cursor no servidor.
+
+        Espera (retornando False) até o horizonte_leituras cobrir as leituras
+        já gravadas quando a carga foi pedida; daí em diante buscar_novas()
+        segue do horizonte.
+        """
+        (marca,), = consultar(SQL_HORIZONTE)
+        horizonte = horizonte_leituras.observar(*marca)
+        if self._alvo_carga is None:
+            self._alvo_carga = marca[0]
+        if horizonte < self._alvo_carga:
+            return False
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(name='estatisticas_carga')
             cursor.execute("""
-                INSERT INTO dataloggers (dispositivo_id)
-                VALUES (%s)
-            """, (dispositivo_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash('Dispositivo cadastrado com sucesso!', 'success')
-        return redirect(url_for('cadastros'))
-    
-    except Exception as e:
-        flash(f'Erro ao cadastrar dispositivo: {str(e)}', 'error')
-        return redirect(url_for('cadastrar_dispositivo'))
+                SELECT sensor_id, valor, timestamp
+                FROM leituras_sensores
+                WHERE timestamp >= %s AND id <= %s
+            """, (datetime.now() - timedelta(seconds=float(self.janelas.max())), horizonte))
+            while True:
+                linhas = cursor.fetchmany(ESTATISTICAS_LOTE)
+                if not linhas:
+                    break
+                self._incorporar_linhas(linhas)
+            cursor.close()
 
-# CADASTRO DE SENSORES
-@app.route('/cadastros/sensores')
-def cadastrar_sensor():
-    """Formulário para cadastrar sensor"""
-    conn = get_db_connection()
-    if not conn:
-        flash('Erro de conexão com o banco de dados', 'error')
-        return redirect(url_for('cadastros'))
-    
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT d.id, dev.nome, l.nome 
-        FROM dataloggers d
-        JOIN dispositivos dev ON d.dispositivo_id = dev.id
-        JOIN localizacoes l ON dev.localizacao_id = l.id
-        ORDER BY dev.nome
-    """)
-    dataloggers = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return render_template('cadastros/sensor.html', dataloggers=dataloggers)
+        self._ultimo_id = self._horizonte = horizonte
+        return True
+
+    def buscar_novas(self):
+        """Incorpora um lote de leituras entre o último id visto e o horizonte; retorna quantas.
+
+        O horizonte usado é o da passada anterior; o novo é observado na
+        mesma ida ao banco.
+        """
+        linhas, (marca,) = consultar(("""
+            SELECT id, sensor_id, valor, timestamp
+            FROM leituras_sensores
+            WHERE id > %s AND id <= %s
+            ORDER BY id
+            LIMIT %s
+        """, (self._ultimo_id, self._horizonte, ESTATISTICAS_LOTE)), SQL_HORIZONTE)
+        if linhas:
+            self._incorporar_linhas([linha[1:] for linha in linhas])
+        if len(linhas) < ESTATISTICAS_LOTE:
+            # Lote incompleto: até o horizonte não falta mais nenhuma leitura
+            self._ultimo_id = max(self._ultimo_id, self._horizonte)
+        else:
+            self._ultimo_id = linhas[-1][0]
+        self._horizonte = horizonte_leituras.observar(*marca)
+        return len(linhas)
+
+    def executar(self):
+        if self._ultimo_id is None and not self.carregar():
+            return
+        # Esvazia o atraso acumulado antes de dormir novamente
+        while self.buscar_novas() >= ESTATISTICAS_LOTE:
+            pass
+
+
+estatisticas_sensores = EstatisticasSensores(ESTATISTICAS_INTERVALO, ESTATISTICAS_JANELAS, ESTATISTICAS_DIVISOES)
+
+
+@app.route('/api/sensores/<int:sensor_id>/estatisticas')
+def api_estatisticas_sensor(sensor_id):
+    """Estatísticas móveis e z-score de um sensor, servidas da memória"""
+    if not ESTATISTICAS_ATIVO:
+        return jsonify({'error': 'Estatísticas contínuas desativadas'}), 503
+
+    estatisticas = estatisticas_sensores.sensor(sensor_id)
+    if estatisticas is None:
+        return jsonify({'error': 'Sensor sem leituras recentes'}), 404
+    return jsonify(estatisticas)
+
+@app.route('/api/sensores/estatisticas')
+def api_estatisticas_sensores():
+    """Resumo da frota: agregados por janela e sensores com z-score acima do limite"""
+    if not ESTATISTICAS_ATIVO:
+        return jsonify({'error': 'Estatísticas contínuas desativadas'}), 503
 
-@app.route('/cadastros/sensores/salvar', methods=['POST'])
-def salvar_sensor():
-    """Salva um novo sensor"""
     try:
-        datalogger_id = request.form['datalogger_id']
-        nome = request.form['nome']
-        tipo = request.form['tipo']
-        unidade = request.form['unidade']
-        posicao = request.form['posicao']
-        endereco = request.form.get('endereco', '')
-        
-        conn = get_db_connection()
-        if not conn:
-            flash('Erro de conexão com o banco de dados', 'error')
-            return redirect(url_for('cadastrar_sensor'))
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO sensores (datalogger_id, nome, tipo, unidade, posicao, endereco)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (datalogger_id, nome, tipo, unidade, posicao, endereco))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash('Sensor cadastrado com sucesso!', 'success')
-        return redirect(url_for('cadastros'))
-    
+        return Response(estatisticas_sensores.resumo(), mimetype='application/json')
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
-        flash(f'Erro ao cadastrar sensor: {str(e)}', 'error')
-        return redirect(url_for('cadastrar_sensor'))
+        return jsonify({'error': str(e)}), 500
 
-# CADASTRO DE CONFIGURAÇÕES DE ALIMENTADOR
-@app.route('/cadastros/config-alimentador')
-def cadastrar_config_alimentador():
-    """Formulário para configurar alimentador"""
-    conn = get_db_connection()
-    if not conn:
-        flash('Erro de conexão com o banco de dados', 'error')
-        return redirect(url_for('cadastros'))
-    
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT a.id, dev.nome, l.nome 
+# =============================================
+# AGENDA DOS ALIMENTADORES
+# =============================================
+
+AGENDA_TTL = float(os.environ.get('AGENDA_TTL', 300))   # s até recalcular (mudanças feitas em outro processo)
+AGENDA_RECARGA_MIN = 5                                  # s entre recargas por MAC desconhecido
+
+
+class AgendaAlimentadores:
+    """Tabela diária de porções de todos os alimentadores, calculada de uma vez com numpy.
+
+    Cada configuração ativa gera porções a partir de `horario_inicio`, a cada
+    `intervalo` minutos, até `horario_fim` (janelas podem cruzar a
+    meia-noite; fim igual ao início é o dia inteiro) e no máximo `porcoes`
+    porções; `peso_diario` é dividido igualmente entre elas. A duração de
+    cada porção é gramas / (vazao_media * fator_calibracao), com a vazão em
+    g/s e a calibração mais recente.
+
+    O resultado fica em memória como o corpo JSON pronto de cada MAC e o seu
+    ETag (hash do conteúdo, igual em todos os processos). É recalculado quando
+    `invalidate()` é chamado pelos cadastros ou após `ttl` segundos.
+    """
+
+    QUERY = """
+        /* agenda_alimentadores */
+        SELECT
+            a.id, dev.mac_address, c.ativa,
+            EXTRACT(EPOCH FROM c.horario_inicio), EXTRACT(EPOCH FROM c.horario_fim),
+            c.intervalo, c.peso_diario, c.porcoes, a.vazao_media, cal.fator_calibracao
         FROM alimentadores a
         JOIN dispositivos dev ON a.dispositivo_id = dev.id
-        JOIN localizacoes l ON dev.localizacao_id = l.id
-        ORDER BY dev.nome
-    """)
-    alimentadores = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return render_template('cadastros/config_alimentador.html', alimentadores=alimentadores)
+        LEFT JOIN LATERAL (
+            SELECT * FROM config_alimentadores
+            WHERE alimentador_id = a.id
+            ORDER BY updated_at DESC NULLS LAST, id DESC
+            LIMIT 1
+        ) c ON true
+        LEFT JOIN LATERAL (
+            SELECT fator_calibracao FROM calibracao_alimentadores
+            WHERE alimentador_id = a.id
+            ORDER BY data_calibracao DESC NULLS LAST, id DESC
+            LIMIT 1
+        ) cal ON true
+        ORDER BY a.id
+    """
 
-@app.route('/cadastros/config-alimentador/salvar', methods=['POST'])
-def salvar_config_alimentador():
-    """Salva configuração do alimentador"""
-    try:
-        alimentador_id = request.form['alimentador_id']
-        horario_inicio = request.form['horario_inicio']
-        horario_fim = request.form['horario_fim']
-        intervalo = request.form['intervalo']
-        peso_diario = request.form['peso_diario']
-        porcoes = request.form['porcoes']
-        ativa = 'ativa' in request.form
-        
-        conn = get_db_connection()
-        if not conn:
-            flash('Erro de conexão com o banco de dados', 'error')
-            return redirect(url_for('cadastrar_config_alimentador'))
-        
-        cursor = conn.cursor()
-        
-        # Verificar se já existe configuração
-        cursor.execute("SELECT id FROM config_alimentadores WHERE alimentador_id = %s", (alimentador_id,))
-        existing_config = cursor.fetchone()
-        
-        if existing_config:
-            # Atualizar configuração existente
-            cursor.execute("""
-                UPDATE config_alimentadores 
-                SET horario_inicio = %s, horario_fim = %s, intervalo = %s, 
-                    peso_diario = %s, porcoes = %s, ativa = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE alimentador_id = %s
-            """, (horario_inicio, horario_fim, intervalo, peso_diario, porcoes, ativa, alimentador_id))
-        else:
-            # Inserir nova configuração
-            cursor.execute("""
-                INSERT INTO config_alimentadores 
-                (alimentador_id, horario_inicio, horario_fim, intervalo, peso_diario, porcoes, ativa)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (alimentador_id, horario_inicio, horario_fim, intervalo, peso_diario, porcoes, ativa))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash('Configuração do alimentador salva com sucesso!', 'success')
-        return redirect(url_for('cadastros'))
-    
-    except Exception as e:
-        flash(f'Erro ao salvar configuração: {str(e)}', 'error')
-        return redirect(url_for('cadastrar_config_alimentador'))
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._agendas = None
+        self._calculado_em = 0.0
+        self._geracao = 0
+        self._lock = threading.Lock()
 
-# CADASTRO DE LIMITES DE TEMPERATURA
-@app.route('/cadastros/limites-temperatura')
-def cadastrar_limites_temperatura():
-    """Formulário para cadastrar limites de temperatura"""
-    conn = get_db_connection()
-    if not conn:
-        flash('Erro de conexão com o banco de dados', 'error')
-        return redirect(url_for('cadastros'))
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nome FROM localizacoes ORDER BY nome")
-    localizacoes = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return render_template('cadastros/limites_temperatura.html', localizacoes=localizacoes)
+    @staticmethod
+    def calcular(linhas):
+        """{mac_address: agenda} para as linhas de QUERY (vetorizado por porção)"""
+        def coluna(indice):
+            return np.array([np.nan if linha[indice] is None else float(linha[indice]) for linha in linhas],
+                            dtype=float)
 
-@app.route('/cadastros/limites-temperatura/salvar', methods=['POST'])
-def salvar_limites_temperatura():
-    """Salva limites de temperatura"""
-    try:
-        localizacao_id = request.form['localizacao_id']
-        tipo_sensor = request.form['tipo_sensor']
-        maximo = float(request.form['maximo'])
-        minimo = float(request.form['minimo'])
-        
-        conn = get_db_connection()
-        if not conn:
-            flash('Erro de conexão com o banco de dados', 'error')
-            return redirect(url_for('cadastrar_limites_temperatura'))
-        
-        cursor = conn.cursor()
-        
-        # Verificar se já existe limite para esta localização e tipo
-        cursor.execute("""
-            SELECT id FROM limites_temperatura 
-            WHERE localizacao_id = %s AND tipo_sensor = %s
-        """, (localizacao_id, tipo_sensor))
-        
-        existing_limit = cursor.fetchone()
-        
-        if existing_limit:
-            # Atualizar limite existente
-            cursor.execute("""
-                UPDATE limites_temperatura 
-                SET maximo = %s, minimo = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE localizacao_id = %s AND tipo_sensor = %s
-            """, (maximo, minimo, localizacao_id, tipo_sensor))
-        else:
-            # Inserir novo limite
-            cursor.execute("""
-                INSERT INTO limites_temperatura (localizacao_id, tipo_sensor, maximo, minimo)
-                VALUES (%s, %s, %s, %s)
-            """, (localizacao_id, tipo_sensor, maximo, minimo))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash('Limites de temperatura salvos com sucesso!', 'success')
-        return redirect(url_for('cadastros'))
-    
-    except Exception as e:
-        flash(f'Erro ao salvar limites: {str(e)}', 'error')
-        return redirect(url_for('cadastrar_limites_temperatura'))
+        ativa = np.array([bool(linha[2]) for linha in linhas], dtype=bool)
+        inicio, fim, intervalo, peso, porcoes, vazao, fator = (coluna(i) for i in range(3, 10))
+        fator = np.where(np.isnan(fator), 1.0, fator)
 
-# ROTA PARA LISTAR TODOS OS CADASTROS
-@app.route('/cadastros/lista')
-def lista_cadastros():
-    """Lista todos os cadastros"""
-    conn = get_db_connection()
-    if not conn:
-        return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Localizações
-        cursor.execute("SELECT id, nome, tipo, descricao FROM localizacoes ORDER BY nome")
-        localizacoes = cursor.fetchall()
-        
-        # Dispositivos
-        cursor.execute("""
-            SELECT d.id, d.nome, d.tipo, d.mac_address, l.nome 
-            FROM dispositivos d 
-            LEFT JOIN localizacoes l ON d.localizacao_id = l.id 
-            ORDER BY d.tipo, d.nome
-        """)
-        dispositivos = cursor.fetchall()
-        
-        # Sensores
-        cursor.execute("""
-            SELECT s.id, s.nome, s.tipo, s.posicao, dev.nome 
-            FROM sensores s
-            JOIN dataloggers d ON s.datalogger_id = d.id
-            JOIN dispositivos dev ON d.dispositivo_id = dev.id
-            ORDER BY dev.nome, s.nome
-        """)
-        sensores = cursor.fetchall()
-        
-        # Configurações de alimentadores
-        cursor.execute("""
-            SELECT c.id, dev.nome, c.horario_inicio, c.horario_fim, c.peso_diario, c.ativa
-            FROM config_alimentadores c
-            JOIN alimentadores a ON c.alimentador_id = a.id
-            JOIN dispositivos dev ON a.dispositivo_id = dev.id
-            ORDER BY dev.nome
-        """)
-        configs_alimentadores = cursor.fetchall()
-        
-        # Limites de temperatura
-        cursor.execute("""
-            SELECT l.id, loc.nome, l.tipo_sensor, l.maximo, l.minimo
-            FROM limites_temperatura l
-            JOIN localizacoes loc ON l.localizacao_id = loc.id
-            ORDER BY loc.nome, l.tipo_sensor
-        """)
-        limites_temperatura = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return render_template('cadastros/lista.html',
-                             localizacoes=localizacoes,
-                             dispositivos=dispositivos,
-                             sensores=sensores,
-                             configs_alimentadores=configs_alimentadores,
-                             limites_temperatura=limites_temperatura)
-    
-    except Exception as e:
-        return render_template('error.html', message=f"Erro ao carregar lista: {e}"), 500
+        with np.errstate(invalid='ignore'):
+            valida = (ativa & np.isfinite(inicio) & np.isfinite(fim) & (intervalo > 0)
+                      & (peso > 0) & (porcoes >= 1))
+            passo = np.where(valida, intervalo * 60, 1.0)
+            janela = np.where(valida, (fim - inicio) % 86400, 0.0)
 
-@app.route('/api/estatisticas')
-def api_estatisticas():
-    """API para estatísticas em tempo real"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Erro de conexão'}), 500
-    
+            # Porções por alimentador: as que cabem na janela, limitadas a `porcoes`. A janela
+            # de 24 h não repete no fim o horário inicial, que é o mesmo instante do dia seguinte
+            cabem = np.where(janela == 0, np.ceil(86400 / passo), np.floor(janela / passo) + 1)
+            quantidade = np.where(valida, np.minimum(np.floor(porcoes), cabem), 0).astype(int)
+
+        dono = np.repeat(np.arange(len(linhas)), quantidade)
+        ordem = np.arange(dono.size) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+        horarios = (inicio[dono] + ordem * passo[dono]) % 86400
+
+        gramas = np.divide(peso, quantidade, out=np.zeros(len(linhas)), where=quantidade > 0)[dono]
+        vazao_efetiva = vazao * fator
+        vazao_porcao = vazao_efetiva[dono]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            duracoes = np.where(vazao_porcao > 0, gramas / vazao_porcao, np.nan)
+
+        agendas = {}
+        limites = np.cumsum(quantidade)
+        for i, linha in enumerate(linhas):
+            fatia = slice(limites[i] - quantidade[i], limites[i])
+            agendas[linha[1]] = {
+                'alimentador_id': linha[0],
+                'ativa': bool(valida[i]),
+                'peso_diario': float(peso[i]) if valida[i] else 0.0,
+                'vazao_efetiva': round(float(vazao_efetiva[i]), 4) if vazao_efetiva[i] > 0 else None,
+                'porcoes': [
+                    {
+                        'horario': f"{int(segundos) // 3600:02d}:{int(segundos) % 3600 // 60:02d}:{int(segundos) % 60:02d}",
+                        'gramas': round(float(g), 1),
+                        'duracao_s': None if np.isnan(d) else round(float(d), 2),
+                    }
+                    for segundos, g, d in zip(horarios[fatia], gramas[fatia], duracoes[fatia])
+                ],
+            }
+        return agendas
+
+    def _recalcular(self):
+        with self._lock:
+            geracao = self._geracao
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.QUERY)
+            linhas = cursor.fetchall()
+            cursor.close()
+
+        agendas = {}
+        for mac_address, agenda in self.calcular(linhas).items():
+            corpo = json.dumps(agenda, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            agendas[mac_address] = (corpo, hashlib.sha1(corpo).hexdigest()[:20])
+
+        with self._lock:
+            # Não guarda o resultado se houve invalidação durante o cálculo
+            if geracao == self._geracao:
+                self._agendas = agendas
+                self._calculado_em = time.monotonic()
+        return agendas
+
+    def obter(self, mac_address):
+        """(corpo JSON, ETag) da agenda do alimentador, ou None se o MAC não for de um alimentador"""
+        agendas = self._agendas
+        idade = time.monotonic() - self._calculado_em
+        if agendas is None or idade >= self.ttl:
+            agendas = self._recalcular()
+        elif mac_address not in agendas and idade >= AGENDA_RECARGA_MIN:
+            # Alimentador cadastrado por outro processo
+            agendas = self._recalcular()
+        return agendas.get(mac_address)
+
+    def invalidate(self):
+        with self._lock:
+            self._geracao += 1
+            self._agendas = None
+
+
+agenda_alimentadores = AgendaAlimentadores(AGENDA_TTL)
+
+@app.route('/api/alimentadores/<mac_address>/agenda')
+def api_agenda_alimentador(mac_address):
+    """Agenda diária do alimentador com ETag: alimentadores que consultam periodicamente recebem 304"""
     try:
-        cursor = conn.cursor()
-        
-        # Dispositivos online
-        cursor.execute("SELECT COUNT(*) FROM dispositivos WHERE online = true")
-        online = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM dispositivos")
-        total = cursor.fetchone()[0]
-        
-        # Últimas temperaturas
-        cursor.execute("""
-            SELECT AVG(valor) 
-            FROM leituras_sensores 
-            WHERE timestamp >= NOW() - INTERVAL '10 minutes'
-        """)
-        temp_media = cursor.fetchone()[0] or 0
-        
-        # Alertas ativos
-        cursor.execute("SELECT COUNT(*) FROM alertas WHERE resolvido = false")
-        alertas = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'dispositivos_online': online,
-            'total_dispositivos': total,
-            'temperatura_media': round(temp_media, 2),
-            'alertas_ativos': alertas
-        })
-    
+        agenda = agenda_alimentadores.obter(mac_address)
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Erro de conexão'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    if agenda is None:
+        return jsonify({'error': 'Alimentador não encontrado'}), 404
+
+    # A consulta da agenda também conta como contato do dispositivo
+    if PRESENCA_ATIVO:
+        monitor_presenca.registrar(mac_address)
+
+    corpo, etag = agenda
+    resposta = Response(corpo, mimetype='application/json')
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
+@app.route('/api/pool')
+def api_pool():
+    """API com estatísticas do pool de conexões"""
+    return jsonify(get_pool_stats())
+
+@app.route('/metrics')
+def metrics():
+    """Métricas do processo no formato de exposição do Prometheus.
+
+    Cada worker do gunicorn mantém as suas; configure o Prometheus para
+    coletar de cada processo (ou use um único worker com várias threads).
+    """
+    linhas = []
+    for metrica in METRICAS:
+        linhas.extend(metrica.exportar())
+
+    # Estado atual do pool como gauges
+    for chave, valor in get_pool_stats().items():
+        nome = f"englife_db_pool_{chave}"
+        linhas.append(f"# TYPE {nome} gauge")
+        linhas.append(f"{nome} {float(valor)}")
+
+    return Response('\n'.join(linhas) + '\n', mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,376 @@
+"""Modo de execução assíncrono (ASGI).
+
+As páginas de leitura (dashboard, dispositivos, alimentadores, dataloggers,
+leituras, gráficos, /api/graficos e /api/estatisticas) são atendidas por views assíncronas
+com psycopg.AsyncConnection e um AsyncConnectionPool, de modo que um único
+processo multiplexa centenas de requisições esperando pelo banco. Todas as
+demais rotas continuam sendo atendidas pela aplicação Flask (WSGI) de app.py.
+
+Execução:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+O modo síncrono continua disponível com `gunicorn app:app`.
+"""
+import asyncio
+import time
+
+import psycopg
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template, request
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from werkzeug.test import EnvironBuilder
+
+import app as aplicacao
+from app import (app, DB_CONFIG, DB_PREPARAR, POOL_CONFIG, GRAFICO_HORAS_PADRAO,
+                 GRAFICO_HORAS_MAX, GRAFICO_LARGURA_PADRAO, SQL_ULTIMAS_LEITURAS, SQL_ALERTAS_ATIVOS,
+                 SQL_DISPOSITIVOS, SQL_ALIMENTADORES, SQL_DATALOGGERS, METRICA_CONEXAO,
+                 METRICA_CONEXAO_FALHAS, nome_consulta, origem_consulta, registrar_consulta,
+                 registrar_leitura)
+
+_pool = None
+
+
+class CursorAssincronoMedido(psycopg.AsyncCursor):
+    """Versão assíncrona de app.MedicaoCursor (mesmas métricas de consulta)"""
+
+    _consulta = None
+
+    async def execute(self, query, params=None, **kwargs):
+        sql = query if isinstance(query, str) else str(query)
+        if not sql.strip():
+            # Verificação de conexão do pool (check_connection)
+            return await super().execute(query, params, **kwargs)
+        self._consulta = (origem_consulta(), nome_consulta(sql))
+        inicio = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            registrar_consulta(self._consulta, time.perf_counter() - inicio, sql)
+
+    async def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = await super().fetchall()
+        registrar_leitura(self._consulta, inicio, len(linhas))
+        return linhas
+
+
+async def configurar_conexao(conn):
+    """Só há consultas de leitura aqui: autocommit poupa o BEGIN/COMMIT de cada uma"""
+    conn.cursor_factory = CursorAssincronoMedido
+    await conn.set_autocommit(True)
+    if not DB_PREPARAR:
+        conn.prepare_threshold = None
+
+
+async def verificar_conexao(conn):
+    """Versão assíncrona de app.verificar_conexao"""
+    if not aplicacao.conexao_recente(conn):
+        await AsyncConnectionPool.check_connection(conn)
+
+
+async def get_async_pool():
+    """Pool assíncrono, aberto no primeiro uso dentro do event loop"""
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            kwargs=DB_CONFIG,
+            configure=configurar_conexao,
+            check=verificar_conexao,
+            name='englife-async',
+            open=False,
+            **POOL_CONFIG
+        )
+        await _pool.open()
+    return _pool
+
+
+async def buscar(query, params=None):
+    """Executa uma consulta em uma conexão do pool assíncrono e retorna todas as linhas.
+
+    Compartilha o disjuntor_banco de app.py: com o circuito aberto, falha na hora.
+    """
+    if aplicacao.disjuntor_banco.aberto:
+        raise aplicacao.DatabaseUnavailable('circuito aberto: banco indisponível')
+
+    pool = await get_async_pool()
+    inicio = time.perf_counter()
+    try:
+        async with pool.connection() as conn:
+            METRICA_CONEXAO.observar(time.perf_counter() - inicio)
+            try:
+                cursor = await conn.execute(query, params, prepare=DB_PREPARAR or None)
+                linhas = await cursor.fetchall()
+            except psycopg.OperationalError as e:
+                if not conn.broken:
+                    raise
+                # Conexão perdida durante a consulta: conta como banco indisponível
+                aplicacao.disjuntor_banco.registrar_falha(e)
+                raise aplicacao.DatabaseUnavailable(str(e)) from e
+            finally:
+                aplicacao.marcar_devolucao(conn)
+    except PoolTimeout as e:
+        METRICA_CONEXAO_FALHAS.incrementar()
+        aplicacao.disjuntor_banco.registrar_falha(e)
+        print(f"Erro na conexão: {e}")
+        raise aplicacao.DatabaseUnavailable(str(e)) from e
+    aplicacao.disjuntor_banco.registrar_sucesso()
+    return linhas
+
+
+async def versao_atual(leituras=False):
+    """Versão assíncrona de app.versao_atual"""
+    if not await asyncio.to_thread(aplicacao.versoes_disponiveis):
+        return None
+    linhas = await buscar(aplicacao.consulta_versao(leituras))
+    return linhas[0] if linhas else None
+
+
+def erro_conexao():
+    return render_template('error.html', message="Erro de conexão com o banco de dados"), 500
+
+# =============================================
+# VIEWS ASSÍNCRONAS
+# =============================================
+
+async def dashboard():
+    """Dashboard principal com estatísticas"""
+    try:
+        sensores = await asyncio.to_thread(aplicacao.dimensao_sensores.sensores)
+
+        # Snapshot e consultas independentes rodam em paralelo
+        stats, ultimas_leituras, alertas_ativos = await asyncio.gather(
+            asyncio.to_thread(aplicacao.stats_snapshot.get),
+            buscar(SQL_ULTIMAS_LEITURAS, (sensores,)),
+            buscar(SQL_ALERTAS_ATIVOS),
+        )
+        ultimas_leituras = await asyncio.to_thread(aplicacao.enriquecer_ultimas_leituras, ultimas_leituras)
+
+        return render_template('dashboard.html',
+                             stats=stats,
+                             ultimas_leituras=ultimas_leituras,
+                             alertas_ativos=alertas_ativos)
+
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dashboard: {e}"), 500
+
+
+async def dispositivos():
+    """Lista todos os dispositivos"""
+    try:
+        dispositivos = await buscar(SQL_DISPOSITIVOS)
+        return render_template('dispositivos.html', dispositivos=dispositivos)
+
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dispositivos: {e}"), 500
+
+
+async def alimentadores():
+    """Página de alimentadores"""
+    try:
+        alimentadores = await buscar(SQL_ALIMENTADORES)
+        return render_template('alimentadores.html', alimentadores=alimentadores)
+
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar alimentadores: {e}"), 500
+
+
+async def dataloggers():
+    """Página de dataloggers"""
+    try:
+        dataloggers = await buscar(SQL_DATALOGGERS)
+        return render_template('dataloggers.html', dataloggers=dataloggers)
+
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar dataloggers: {e}"), 500
+
+
+async def leituras():
+    """Página de leituras dos sensores, paginada por (timestamp, id)"""
+    try:
+        # Filtros por localização/tipo podem carregar a dimensão de sensores do banco
+        query, params, pagina = await asyncio.to_thread(aplicacao.consulta_leituras, request.args)
+    except ValueError as e:
+        return render_template('error.html', message=f"Parâmetro inválido: {e}"), 400
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+
+    try:
+        versao = await versao_atual(leituras=True)
+        etag = versao and aplicacao.etag_leituras(versao, request.args)
+        if etag:
+            resposta = aplicacao.nao_modificado(etag)
+            if resposta:
+                return resposta
+
+        leituras, arquivadas, localizacoes, tipos_sensor = await asyncio.gather(
+            buscar(query, params),
+            asyncio.to_thread(aplicacao.leituras_arquivadas, request.args, pagina),
+            asyncio.to_thread(aplicacao.cache_metadados.obter, 'nomes_localizacoes'),
+            asyncio.to_thread(aplicacao.cache_metadados.obter, 'posicoes_sensores'),
+        )
+        leituras = await asyncio.to_thread(aplicacao.enriquecer_leituras, leituras)
+        leituras = aplicacao.mesclar_leituras(leituras, arquivadas, pagina)
+
+        resposta = render_template('leituras.html',
+                                   localizacoes=[row[0] for row in localizacoes],
+                                   tipos_sensor=[row[0] for row in tipos_sensor],
+                                   **aplicacao.contexto_leituras(leituras, pagina))
+        return aplicacao.marcar_versao(resposta, etag) if etag else resposta
+
+    except aplicacao.DatabaseUnavailable:
+        return erro_conexao()
+    except Exception as e:
+        return render_template('error.html', message=f"Erro ao carregar leituras: {e}"), 500
+
+
+async def graficos():
+    """Página com gráficos das leituras (os dados vêm de /api/graficos)"""
+    horas = aplicacao.parametro_int('horas', GRAFICO_HORAS_PADRAO, 1, GRAFICO_HORAS_MAX)
+    return render_template('graficos.html', horas=horas)
+
+
+async def api_graficos():
+    """Dados agregados dos gráficos em formato colunar compacto"""
+    horas = aplicacao.parametro_int('horas', GRAFICO_HORAS_PADRAO, 1, GRAFICO_HORAS_MAX)
+    largura = aplicacao.parametro_int('largura', GRAFICO_LARGURA_PADRAO, 1, 10000)
+    bucket = aplicacao.calcular_bucket(horas, largura)
+    sql_serie, sql_quartis = aplicacao.consultas_graficos(bucket)
+
+    try:
+        versao = await versao_atual(leituras=True)
+        etag = versao and aplicacao.etag_graficos(versao, horas, largura, bucket)
+        if etag:
+            resposta = aplicacao.nao_modificado(etag)
+            if resposta:
+                return resposta
+
+        parametros, grupos, tipos = await asyncio.to_thread(aplicacao.dimensao_sensores.graficos)
+        params = {'bucket': bucket, 'horas': horas, **parametros}
+
+        dados, quartis = await asyncio.gather(
+            buscar(sql_serie, params),
+            buscar(sql_quartis, params),
+        )
+
+        resposta = aplicacao.montar_dados_graficos(dados, quartis, bucket, grupos, tipos)
+        return aplicacao.marcar_versao(resposta, etag) if etag else resposta
+
+    except aplicacao.DatabaseUnavailable:
+        return {'error': 'Erro de conexão'}, 500
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+async def api_estatisticas():
+    """API para estatísticas em tempo real"""
+    try:
+        stats = await asyncio.to_thread(aplicacao.stats_snapshot.get)
+        dados = aplicacao.formatar_estatisticas(stats)
+
+        etag = aplicacao.calcular_etag('estatisticas', sorted(dados.items()))
+        return aplicacao.nao_modificado(etag) or aplicacao.marcar_versao(dados, etag)
+
+    except aplicacao.DatabaseUnavailable:
+        return {'error': 'Erro de conexão'}, 500
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+# Endpoints do Flask atendidos pelas views assíncronas
+VIEWS_ASYNC = {
+    'dashboard': dashboard,
+    'dispositivos': dispositivos,
+    'alimentadores': alimentadores,
+    'dataloggers': dataloggers,
+    'leituras': leituras,
+    'graficos': graficos,
+    'api_graficos': api_graficos,
+    'api_estatisticas': api_estatisticas,
+}
+
+# =============================================
+# APLICAÇÃO ASGI
+# =============================================
+
+wsgi_application = WsgiToAsgi(app)
+
+
+def construir_environ(scope):
+    """Environ WSGI equivalente ao escopo ASGI (para reaproveitar o contexto do Flask)"""
+    headers = [(nome.decode('latin-1'), valor.decode('latin-1')) for nome, valor in scope['headers']]
+    host = next((valor for nome, valor in headers if nome.lower() == 'host'), 'localhost')
+    builder = EnvironBuilder(
+        path=scope['path'],
+        base_url=f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}",
+        query_string=scope.get('query_string', b'').decode('latin-1'),
+        method=scope['method'],
+        headers=headers,
+    )
+    environ = builder.get_environ()
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    return environ
+
+
+async def atender(view, environ, send, head):
+    """Executa uma view assíncrona com o mesmo ciclo de requisição do Flask"""
+    with app.request_context(environ):
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view()
+        except HTTPException as e:
+            rv = e
+        response = app.process_response(app.make_response(rv))
+
+        corpo = b'' if head else response.get_data()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                        for nome, valor in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': corpo})
+
+
+async def lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            await get_async_pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            if _pool is not None:
+                await _pool.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """Encaminha as rotas de leitura para as views assíncronas e o resto para o Flask"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        environ = construir_environ(scope)
+        try:
+            endpoint, _ = app.url_map.bind_to_environ(environ).match()
+        except (HTTPException, RequestRedirect):
+            endpoint = None
+
+        view = VIEWS_ASYNC.get(endpoint)
+        if view is not None:
+            return await atender(view, environ, send, scope['method'] == 'HEAD')
+
+    return await wsgi_application(scope, receive, send)
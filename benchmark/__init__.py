@@ -0,0 +1 @@
+"""Suíte de benchmark e teste de carga do servidor Englife (ver __main__.py)."""
@@ -0,0 +1,218 @@
+"""Benchmark e teste de carga reproduzível do servidor Englife.
+
+Provisiona um PostgreSQL local descartável com o esquema das rotas
+(migrações de migracoes/), gera uma frota sintética, sobe a aplicação e mede cada rota
+em concorrência fixa. O resultado é um JSON com p50/p95/p99, vazão, erros e
+tempo de banco por rota, que pode ser comparado entre versões.
+
+Uso:
+    python -m benchmark executar --saida antes.json
+    python -m benchmark executar --dataloggers 500 --sensores 8 --dias 90 --saida depois.json
+    python -m benchmark executar --asgi --concorrencia 64 --saida asgi.json
+    python -m benchmark comparar antes.json depois.json
+
+    # Mede o efeito de uma migração: esquema só até a versão 1 (sem índices)
+    python -m benchmark executar --migracoes 1 --saida sem_indices.json
+
+    # Banco já existente (os dados são APAGADOS e recriados)
+    python -m benchmark popular --db 127.0.0.1:5432 --dias 30
+    python -m benchmark executar --db 127.0.0.1:5432 --sem-popular
+
+O PostgreSQL não roda como root: execute como um usuário comum ou use --db.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+import migracoes
+from benchmark import carga, dados, postgres
+
+
+def config_banco(args):
+    host, _, porta = args.db.rpartition(':')
+    return {
+        'host': host or '127.0.0.1',
+        'port': int(porta),
+        'dbname': args.db_nome,
+        'user': args.db_usuario,
+        'password': args.db_senha,
+    }
+
+
+def versao_codigo():
+    """Commit atual e se há alterações não commitadas"""
+    def git(*comando):
+        return subprocess.run(['git', *comando], cwd=carga.RAIZ, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', '--short', 'HEAD') or None,
+            'alterado': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def popular(args, config):
+    migracoes.aplicar(config, ate=args.migracoes)
+    print(f"Gerando frota: {args.dataloggers} dataloggers × {args.sensores} sensores × "
+          f"{args.dias} dias (intervalo {args.intervalo}s)")
+    resumo = dados.popular(config, dataloggers=args.dataloggers, sensores=args.sensores,
+                           dias=args.dias, intervalo=args.intervalo,
+                           localizacoes=args.localizacoes, alimentadores=args.alimentadores)
+    print(f"  {resumo['leituras']} leituras em {resumo['segundos']}s")
+    return resumo
+
+
+def comando_popular(args):
+    popular(args, config_banco(args))
+
+
+def comando_executar(args):
+    cluster = None
+    if args.db:
+        config = config_banco(args)
+    else:
+        cluster = postgres.ClusterLocal(pg_bin=args.pg_bin, manter=args.manter_cluster).iniciar()
+        config = cluster.config
+        print(f"PostgreSQL local em {cluster.diretorio} (porta {cluster.porta})")
+
+    try:
+        resumo = None if args.sem_popular else popular(args, config)
+
+        ambiente = {'ROLLUP_ATIVO': '1' if args.rollup else '0', 'ALERTAS_ATIVO': '1'}
+        servidor = None
+        url = args.url
+        if not url:
+            servidor = carga.ServidorApp(config, args.porta or postgres.porta_livre(), asgi=args.asgi,
+                                         workers=args.workers, threads=args.threads,
+                                         ambiente=ambiente).iniciar()
+            url = servidor.url
+
+        try:
+            print(f"Carga em {url}: concorrência {args.concorrencia}, {args.duracao}s por rota")
+            rotas, fonte = carga.executar_carga(url, config, concorrencia=args.concorrencia,
+                                                duracao=args.duracao, aquecimento=args.aquecimento,
+                                                espera_stats=args.espera_stats,
+                                                dataloggers=args.dataloggers, sensores=args.sensores,
+                                                filtro=args.rotas)
+        finally:
+            if servidor:
+                servidor.parar()
+    finally:
+        if cluster:
+            cluster.parar()
+
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'versao': versao_codigo(),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'cpus': os.cpu_count()},
+        'servidor': {'modo': 'asgi' if args.asgi else 'wsgi', 'workers': args.workers,
+                     'threads': args.threads, 'url': args.url, 'rollup': args.rollup},
+        'carga': {'concorrencia': args.concorrencia, 'duracao': args.duracao,
+                  'aquecimento': args.aquecimento},
+        'dados': resumo,
+        'migracoes': args.migracoes,
+        'tempo_banco': fonte,
+        'rotas': rotas,
+    }
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"Resultado salvo em {args.saida}")
+    else:
+        json.dump(resultado, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+
+METRICAS_COMPARACAO = [('rps', 'req/s'), ('p50_ms', 'p50'), ('p95_ms', 'p95'), ('p99_ms', 'p99'),
+                       ('db_ms_por_req', 'db/req')]
+
+
+def variacao(antes, depois):
+    if antes is None or depois is None:
+        return '      -'
+    if not antes:
+        return '      ∞' if depois else '     0%'
+    return f"{(depois - antes) / antes * 100:+6.0f}%"
+
+
+def comando_comparar(args):
+    with open(args.antes, encoding='utf-8') as arquivo:
+        antes = json.load(arquivo)
+    with open(args.depois, encoding='utf-8') as arquivo:
+        depois = json.load(arquivo)
+
+    for titulo, resultado in (('antes', antes), ('depois', depois)):
+        versao = resultado['versao']
+        print(f"{titulo + ':':<8}{versao['commit']}{'+' if versao['alterado'] else ''} {resultado['data']} "
+              f"({resultado['servidor']['modo']}, concorrência {resultado['carga']['concorrencia']})")
+    print(f"{'rota':<30}" + ''.join(f"{titulo:>26}" for _, titulo in METRICAS_COMPARACAO))
+    for nome, rota in depois['rotas'].items():
+        anterior = antes['rotas'].get(nome)
+        if anterior is None:
+            print(f"{nome:<30} (nova)")
+            continue
+        linha = f"{nome:<30}"
+        for chave, _ in METRICAS_COMPARACAO:
+            a, d = anterior.get(chave), rota.get(chave)
+            linha += f"{a if a is not None else '-':>9} → {d if d is not None else '-':>7} {variacao(a, d)}"
+        print(linha)
+        if rota['erros'] or anterior['erros']:
+            print(f"{'':<30} erros {anterior['erros']} → {rota['erros']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description=__doc__.splitlines()[0])
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    banco = argparse.ArgumentParser(add_help=False)
+    banco.add_argument('--db', help='host:porta de um PostgreSQL existente (em vez de provisionar um)')
+    banco.add_argument('--db-nome', default='englife_db')
+    banco.add_argument('--db-usuario', default='englife')
+    banco.add_argument('--db-senha', default='')
+
+    frota = argparse.ArgumentParser(add_help=False)
+    frota.add_argument('--dataloggers', type=int, default=50)
+    frota.add_argument('--sensores', type=int, default=8, help='sensores por datalogger')
+    frota.add_argument('--dias', type=int, default=7)
+    frota.add_argument('--intervalo', type=int, default=300, help='segundos entre leituras de um sensor')
+    frota.add_argument('--localizacoes', type=int, default=20)
+    frota.add_argument('--alimentadores', type=int, default=20)
+    frota.add_argument('--migracoes', type=int, help='aplica as migrações só até esta versão')
+
+    p = subcomandos.add_parser('popular', parents=[banco, frota], help='recria os dados sintéticos em --db')
+    p.set_defaults(funcao=comando_popular)
+
+    p = subcomandos.add_parser('executar', parents=[banco, frota], help='provisiona, popula e mede todas as rotas')
+    p.add_argument('--pg-bin', help='diretório com initdb e pg_ctl')
+    p.add_argument('--manter-cluster', action='store_true', help='não apaga o diretório do cluster ao final')
+    p.add_argument('--sem-popular', action='store_true', help='usa os dados já existentes em --db')
+    p.add_argument('--url', help='mede uma aplicação já em execução em vez de subir uma')
+    p.add_argument('--asgi', action='store_true', help='sobe asgi:application com uvicorn')
+    p.add_argument('--porta', type=int)
+    p.add_argument('--workers', type=int, default=1)
+    p.add_argument('--threads', type=int, default=16, help='threads por worker (gunicorn gthread)')
+    p.add_argument('--rollup', action='store_true', help='mantém o RollupWorker ativo durante a carga')
+    p.add_argument('--concorrencia', type=int, default=8)
+    p.add_argument('--duracao', type=float, default=10, help='segundos medidos por rota')
+    p.add_argument('--aquecimento', type=float, default=2, help='segundos de aquecimento por rota')
+    p.add_argument('--espera-stats', type=float, default=2.0,
+                   help='espera pela publicação de pg_stat_database (sem pg_stat_statements)')
+    p.add_argument('--rotas', nargs='*', help='mede apenas os cenários cujo nome contém um destes trechos')
+    p.add_argument('--saida', help='arquivo JSON de resultado (padrão: stdout)')
+    p.set_defaults(funcao=comando_executar)
+
+    p = subcomandos.add_parser('comparar', help='compara dois resultados JSON')
+    p.add_argument('antes')
+    p.add_argument('depois')
+    p.set_defaults(funcao=comando_comparar)
+
+    args = parser.parse_args(argv)
+    if args.comando == 'popular' and not args.db:
+        parser.error('popular exige --db')
+    args.funcao(args)
+
+
+if __name__ == '__main__':
+    main()
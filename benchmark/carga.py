@@ -0,0 +1,285 @@
+"""Servidor sob teste, cenários de requisição e medição de latência e tempo de banco."""
+import functools
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import psycopg
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (nome, método, caminho); o corpo do POST é gerado por requisição
+CENARIOS = [
+    ('index', 'GET', '/'),
+    ('dashboard', 'GET', '/dashboard'),
+    ('dispositivos', 'GET', '/dispositivos'),
+    ('alimentadores', 'GET', '/alimentadores'),
+    ('dataloggers', 'GET', '/dataloggers'),
+    ('leituras', 'GET', '/leituras'),
+    ('leituras_filtro', 'GET', '/leituras?horas=24&tipo=estufa&localizacao=Local+1'),
+    ('graficos', 'GET', '/graficos'),
+    ('api_graficos_24h', 'GET', '/api/graficos?horas=24'),
+    ('api_graficos_30d', 'GET', '/api/graficos?horas=720'),
+    ('cadastros', 'GET', '/cadastros'),
+    ('cadastros_localizacoes', 'GET', '/cadastros/localizacoes'),
+    ('cadastros_dispositivos', 'GET', '/cadastros/dispositivos'),
+    ('cadastros_sensores', 'GET', '/cadastros/sensores'),
+    ('cadastros_config_alimentador', 'GET', '/cadastros/config-alimentador'),
+    ('cadastros_limites', 'GET', '/cadastros/limites-temperatura'),
+    ('cadastros_lista', 'GET', '/cadastros/lista'),
+    ('api_estatisticas', 'GET', '/api/estatisticas'),
+    ('api_leituras_1h', 'GET', '/api/leituras?horas=1'),
+    ('api_exportar_1h', 'GET', '/api/leituras/exportar?horas=1'),
+    ('api_pool', 'GET', '/api/pool'),
+    ('api_leituras_batch', 'POST', '/api/leituras/batch'),
+    ('api_heartbeat', 'POST', '/api/heartbeat'),
+]
+
+
+def mac_aleatorio(dataloggers):
+    return 'DL:' + format(random.randint(1, dataloggers), 'x').rjust(14, '0')
+
+
+def corpo_batch(dataloggers, sensores):
+    """Lote de um datalogger aleatório com uma leitura por sensor"""
+    agora = time.time()
+    leituras = [[f'28-{n:04d}', round(random.uniform(18, 30), 2), agora] for n in range(1, sensores + 1)]
+    return json.dumps({'mac_address': mac_aleatorio(dataloggers), 'leituras': leituras})
+
+
+def corpo_heartbeat(dataloggers, sensores):
+    """Contato de um datalogger aleatório"""
+    return json.dumps({'mac_address': mac_aleatorio(dataloggers)})
+
+
+# Gerador do corpo de cada cenário POST
+CORPOS = {
+    'api_leituras_batch': corpo_batch,
+    'api_heartbeat': corpo_heartbeat,
+}
+
+# =============================================
+# SERVIDOR SOB TESTE
+# =============================================
+
+class ServidorApp:
+    """Sobe app.py com gunicorn (WSGI, gthread) ou uvicorn (asgi.py) apontando para o banco do benchmark"""
+
+    def __init__(self, config, porta, asgi=False, workers=1, threads=16, ambiente=None):
+        self.url = f'http://127.0.0.1:{porta}'
+        if asgi:
+            comando = ['uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(porta),
+                       '--workers', str(workers), '--no-access-log']
+        else:
+            comando = ['gunicorn', 'app:app', '-b', f'127.0.0.1:{porta}', '-k', 'gthread',
+                       '-w', str(workers), '--threads', str(threads)]
+        self.comando = [sys.executable, '-m', *comando]
+
+        self.env = dict(os.environ)
+        self.env.update({
+            'DB_HOST': config['host'],
+            'DB_PORT': str(config['port']),
+            'DB_NAME': config['dbname'],
+            'DB_USER': config['user'],
+            'DB_PASSWORD': config.get('password', ''),
+        })
+        self.env.update(ambiente or {})
+        self.processo = None
+
+    def iniciar(self, espera=30):
+        self.processo = subprocess.Popen(self.comando, cwd=RAIZ, env=self.env,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            if self.processo.poll() is not None:
+                raise RuntimeError(f"Servidor encerrou ao iniciar: {' '.join(self.comando)}")
+            try:
+                if requisitar(self.url, 'GET', '/api/pool')[0] == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.parar()
+        raise RuntimeError("Servidor não respondeu a tempo")
+
+    def parar(self):
+        if self.processo and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(10)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+def requisitar(url, metodo, caminho, corpo=None, conexao=None):
+    """Uma requisição HTTP; devolve (status, bytes lidos)"""
+    partes = urlsplit(url)
+    conn = conexao or http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+    headers = {'Content-Type': 'application/json'} if corpo is not None else {}
+    conn.request(metodo, caminho, body=corpo, headers=headers)
+    resposta = conn.getresponse()
+    dados = resposta.read()
+    if conexao is None:
+        conn.close()
+    return resposta.status, len(dados)
+
+# =============================================
+# TEMPO DE BANCO
+# =============================================
+
+class TempoBanco:
+    """Tempo gasto no PostgreSQL entre duas leituras.
+
+    Usa pg_stat_statements quando a extensão está carregada (tempo de
+    execução e número de consultas exatos); caso contrário usa
+    pg_stat_database.active_time, que os backends só publicam ao ficarem
+    ociosos — por isso a leitura aguarda `espera` segundos antes.
+    """
+
+    def __init__(self, config, espera=2.0):
+        self.conn = psycopg.connect(**config, autocommit=True)
+        self.espera = espera
+        try:
+            self.conn.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+            self.conn.execute("SELECT 1 FROM pg_stat_statements LIMIT 1")
+            self.fonte = 'pg_stat_statements'
+        except psycopg.Error:
+            self.fonte = 'pg_stat_database.active_time'
+
+    def ler(self):
+        """(ms acumulados, consultas acumuladas ou None)"""
+        if self.fonte == 'pg_stat_statements':
+            ms, consultas = self.conn.execute("""
+                SELECT COALESCE(sum(total_exec_time), 0), COALESCE(sum(calls), 0)
+                FROM pg_stat_statements
+                WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                  AND query NOT LIKE '%%pg_stat_statements%%'
+            """).fetchone()
+            return float(ms), int(consultas)
+
+        time.sleep(self.espera)
+        self.conn.execute("SELECT pg_stat_clear_snapshot()")
+        ms, = self.conn.execute("""
+            SELECT active_time FROM pg_stat_database WHERE datname = current_database()
+        """).fetchone()
+        return float(ms or 0), None
+
+    def fechar(self):
+        self.conn.close()
+
+# =============================================
+# CARGA
+# =============================================
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    indice = min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def executar_cenario(url, metodo, caminho, concorrencia, duracao, gerar_corpo=None):
+    """Carga em concorrência fixa durante `duracao` segundos (conexões keep-alive por thread)"""
+    partes = urlsplit(url)
+    latencias = []
+    erros = []
+    lock = threading.Lock()
+    parar = threading.Event()
+
+    def trabalhador():
+        conn = http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+        locais, erros_locais = [], []
+        while not parar.is_set():
+            corpo = gerar_corpo() if gerar_corpo else None
+            inicio = time.perf_counter()
+            try:
+                status, _ = requisitar(url, metodo, caminho, corpo, conn)
+                falhou = status >= 400 and status
+            except (OSError, http.client.HTTPException) as e:
+                falhou = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+            locais.append((time.perf_counter() - inicio) * 1000)
+            if falhou:
+                erros_locais.append(str(falhou))
+        conn.close()
+        with lock:
+            latencias.extend(locais)
+            erros.extend(erros_locais)
+
+    threads = [threading.Thread(target=trabalhador, daemon=True) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duracao)
+    parar.set()
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'requisicoes': len(latencias),
+        'erros': len(erros),
+        'tipos_erro': sorted(set(erros)),
+        'rps': round(len(latencias) / decorrido, 1),
+        'p50_ms': arredondar(percentil(latencias, 50)),
+        'p95_ms': arredondar(percentil(latencias, 95)),
+        'p99_ms': arredondar(percentil(latencias, 99)),
+        'media_ms': arredondar(statistics.fmean(latencias) if latencias else None),
+        'max_ms': arredondar(latencias[-1] if latencias else None),
+    }
+
+
+def arredondar(valor):
+    return None if valor is None else round(valor, 2)
+
+
+def executar_carga(url, config, concorrencia=8, duracao=10, aquecimento=2, espera_stats=2.0,
+                   dataloggers=50, sensores=8, filtro=None, progresso=print):
+    """Roda todos os cenários em sequência e agrega latência e tempo de banco por rota"""
+    medidor = TempoBanco(config, espera_stats)
+    resultados = {}
+    try:
+        for nome, metodo, caminho in CENARIOS:
+            if filtro and not any(parte in nome for parte in filtro):
+                continue
+            gerar_corpo = None
+            if metodo == 'POST':
+                gerar_corpo = functools.partial(CORPOS[nome], dataloggers, sensores)
+
+            # Aquecimento (caches, pool, planos) fora da medição
+            if aquecimento:
+                executar_cenario(url, metodo, caminho, concorrencia, aquecimento, gerar_corpo)
+
+            antes, consultas_antes = medidor.ler()
+            resultado = executar_cenario(url, metodo, caminho, concorrencia, duracao, gerar_corpo)
+            depois, consultas_depois = medidor.ler()
+
+            requisicoes = resultado['requisicoes']
+            resultado['db_ms_total'] = round(depois - antes, 1)
+            resultado['db_ms_por_req'] = arredondar((depois - antes) / requisicoes) if requisicoes else None
+            if consultas_antes is not None:
+                resultado['consultas_por_req'] = (
+                    arredondar((consultas_depois - consultas_antes) / requisicoes) if requisicoes else None)
+
+            resultados[nome] = {'metodo': metodo, 'caminho': caminho, **resultado}
+            progresso(f"  {nome:<30} {resultado['rps']:>8} req/s  p50 {resultado['p50_ms']} ms  "
+                      f"p99 {resultado['p99_ms']} ms  db {resultado['db_ms_por_req']} ms/req  "
+                      f"erros {resultado['erros']}")
+    finally:
+        medidor.fechar()
+    return resultados, medidor.fonte
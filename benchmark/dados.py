@@ -0,0 +1,147 @@
+"""Gerador de frota sintética para o benchmark.
+
+Toda a geração roda no servidor com generate_series, de modo que uma frota
+de 500 dataloggers × 8 sensores × 90 dias não passa pela rede do cliente.
+"""
+import time
+
+import psycopg
+
+POSICOES = ['agua', 'estufa', 'externa', 'solo', 'ar']
+TIPOS_LOCALIZACAO = ['estufa', 'setor', 'area', 'laboratorio']
+
+
+def limpar(conn):
+    conn.execute("""
+        TRUNCATE alertas, limites_temperatura, calibracao_alimentadores, config_alimentadores,
+                 alimentadores, leituras_sensores, sensores, dataloggers, dispositivos,
+                 localizacoes
+        RESTART IDENTITY CASCADE
+    """)
+    # Rollups da migração 010 (ausentes com --migracoes anterior a ela): esvaziados
+    # junto com as leituras, e o RollupWorker recomeça do primeiro id
+    if conn.execute("SELECT to_regclass('rollup_controle') IS NOT NULL").fetchone()[0]:
+        conn.execute("TRUNCATE leituras_rollup_1m, leituras_rollup_1h, leituras_rollup_1d")
+        conn.execute("""
+            INSERT INTO rollup_controle (nome, ultimo_id) VALUES ('leituras_sensores', 0)
+            ON CONFLICT (nome) DO UPDATE SET ultimo_id = 0
+        """)
+
+
+def gerar_frota(conn, localizacoes, dataloggers, sensores, alimentadores):
+    """Cadastros: localizações, dispositivos, dataloggers, sensores, alimentadores e limites"""
+    conn.execute("""
+        INSERT INTO localizacoes (nome, descricao, tipo)
+        SELECT 'Local ' || i, 'Localização sintética ' || i, (%s::text[])[1 + i %% 4]
+        FROM generate_series(1, %s) AS i
+    """, (TIPOS_LOCALIZACAO, localizacoes))
+
+    conn.execute("""
+        INSERT INTO dispositivos (localizacao_id, nome, mac_address, ip_address, tipo, modelo,
+                                  online, ultima_comunicacao)
+        SELECT 1 + i %% %s, 'Datalogger ' || i,
+               'DL:' || lpad(to_hex(i), 14, '0'), '10.0.' || (i / 256) || '.' || (i %% 256),
+               'datalogger', 'ESP32', true, NOW()
+        FROM generate_series(1, %s) AS i
+    """, (localizacoes, dataloggers))
+    conn.execute("""
+        INSERT INTO dataloggers (dispositivo_id, quantidade_sensores, intervalo_leitura)
+        SELECT id, %s, 60 FROM dispositivos WHERE tipo = 'datalogger' ORDER BY id
+    """, (sensores,))
+    conn.execute("""
+        INSERT INTO sensores (datalogger_id, nome, tipo, unidade, posicao, endereco)
+        SELECT d.id, 'Sensor ' || d.id || '.' || n, 'temperatura', '°C',
+               (%s::text[])[1 + (d.id + n) %% 5], '28-' || lpad(n::text, 4, '0')
+        FROM dataloggers d, generate_series(1, %s) AS n
+    """, (POSICOES, sensores))
+
+    conn.execute("""
+        INSERT INTO dispositivos (localizacao_id, nome, mac_address, tipo, modelo, online, ultima_comunicacao)
+        SELECT 1 + i %% %s, 'Alimentador ' || i, 'AL:' || lpad(to_hex(i), 14, '0'),
+               'alimentador', 'ESP32', i %% 3 <> 0, NOW() - (i %% 120) * INTERVAL '1 minute'
+        FROM generate_series(1, %s) AS i
+    """, (localizacoes, alimentadores))
+    conn.execute("""
+        INSERT INTO alimentadores (dispositivo_id, capacidade_racao, vazao_media, motor_ligado)
+        SELECT id, 50, 0.8 + random() * 0.4, false FROM dispositivos WHERE tipo = 'alimentador' ORDER BY id
+    """)
+    conn.execute("""
+        INSERT INTO config_alimentadores (alimentador_id, horario_inicio, horario_fim, intervalo,
+                                          peso_diario, porcoes, ativa)
+        SELECT id, '06:00', '18:00', 60, 10 + id % 20, 12, true FROM alimentadores
+    """)
+    conn.execute("INSERT INTO calibracao_alimentadores (alimentador_id) SELECT id FROM alimentadores")
+
+    conn.execute("""
+        INSERT INTO limites_temperatura (localizacao_id, tipo_sensor, maximo, minimo)
+        SELECT l.id, p, 30, 18 FROM localizacoes l, unnest(%s::text[]) AS p
+    """, (POSICOES,))
+
+
+def gerar_leituras(conn, dias, intervalo, progresso=print):
+    """Série de leituras de todos os sensores, um dia por transação.
+
+    Os valores seguem um ciclo diário (18–30 °C) com ruído, de forma que
+    alguns sensores cruzem os limites e os gráficos tenham forma real.
+    """
+    # Com leituras_sensores particionada (migração 005), cria os meses gerados
+    particionada, = conn.execute(
+        "SELECT to_regprocedure('criar_particoes_leituras(date, date)') IS NOT NULL").fetchone()
+    if particionada:
+        conn.execute("SELECT criar_particoes_leituras((CURRENT_DATE - %s)::date, CURRENT_DATE)", (dias,))
+        conn.commit()
+
+    total = 0
+    for dia in range(dias, 0, -1):
+        cursor = conn.execute("""
+            INSERT INTO leituras_sensores (sensor_id, valor, timestamp)
+            SELECT s.id,
+                   round((24 + 6 * sin(extract(epoch FROM t) / 13751 + s.id) + random() * 2 - 1)::numeric, 2),
+                   t
+            FROM generate_series(
+                     date_trunc('minute', NOW()::timestamp) - make_interval(days => %(dia)s),
+                     date_trunc('minute', NOW()::timestamp) - make_interval(days => %(dia)s - 1)
+                         - make_interval(secs => %(intervalo)s),
+                     make_interval(secs => %(intervalo)s)) AS t,
+                 sensores s
+        """, {'dia': dia, 'intervalo': intervalo})
+        total += cursor.rowcount
+        conn.commit()
+        progresso(f"  dia -{dia}: {total} leituras")
+    return total
+
+
+def gerar_alertas(conn, quantidade):
+    """Alguns alertas abertos e resolvidos para o dashboard e /api/estatisticas"""
+    conn.execute("""
+        INSERT INTO alertas (tipo, mensagem, timestamp, severidade, resolvido)
+        SELECT 'temperatura_alta', 'Alerta sintético ' || i, NOW() - i * INTERVAL '7 minutes',
+               (ARRAY['baixa', 'media', 'alta'])[1 + i %% 3], i %% 4 <> 0
+        FROM generate_series(1, %s) AS i
+    """, (quantidade,))
+
+
+def popular(config, dataloggers=50, sensores=8, dias=7, intervalo=300, localizacoes=20,
+            alimentadores=20, alertas=200, progresso=print):
+    """Recria os dados sintéticos e devolve um resumo com o tempo de geração"""
+    inicio = time.perf_counter()
+    with psycopg.connect(**config) as conn:
+        limpar(conn)
+        gerar_frota(conn, localizacoes, dataloggers, sensores, alimentadores)
+        gerar_alertas(conn, alertas)
+        conn.commit()
+        total = gerar_leituras(conn, dias, intervalo, progresso)
+
+    with psycopg.connect(**config, autocommit=True) as conn:
+        conn.execute("VACUUM ANALYZE")
+
+    return {
+        'localizacoes': localizacoes,
+        'dataloggers': dataloggers,
+        'sensores_por_datalogger': sensores,
+        'alimentadores': alimentadores,
+        'dias': dias,
+        'intervalo': intervalo,
+        'leituras': total,
+        'segundos': round(time.perf_counter() - inicio, 1),
+    }
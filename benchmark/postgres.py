@@ -0,0 +1,94 @@
+"""Provisiona um cluster PostgreSQL descartável para o benchmark."""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg
+
+
+def localizar_binarios(pg_bin=None):
+    """Diretório com initdb/pg_ctl: --pg-bin, PATH ou `pg_config --bindir`"""
+    if pg_bin:
+        return pg_bin
+    initdb = shutil.which('initdb')
+    if initdb:
+        return os.path.dirname(initdb)
+    if shutil.which('pg_config'):
+        saida = subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True, check=True)
+        return saida.stdout.strip()
+    raise RuntimeError("initdb não encontrado: instale o PostgreSQL ou informe --pg-bin")
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ClusterLocal:
+    """Cluster temporário (initdb + pg_ctl) ouvindo apenas em 127.0.0.1.
+
+    Uso como context manager: o diretório de dados é removido ao sair,
+    a menos que `manter=True`.
+    """
+
+    def __init__(self, pg_bin=None, porta=None, diretorio=None, manter=False):
+        self.bin = localizar_binarios(pg_bin)
+        self.porta = porta or porta_livre()
+        self.diretorio = diretorio or tempfile.mkdtemp(prefix='englife-bench-')
+        self.manter = manter
+        self.usuario = 'englife'
+        self.dbname = 'englife_db'
+
+    def _executar(self, programa, *args):
+        subprocess.run([os.path.join(self.bin, programa), *args], check=True,
+                       stdout=subprocess.DEVNULL)
+
+    @property
+    def config(self):
+        """Parâmetros de conexão no mesmo formato de DB_CONFIG"""
+        return {
+            'host': '127.0.0.1',
+            'port': self.porta,
+            'dbname': self.dbname,
+            'user': self.usuario,
+            'password': '',
+        }
+
+    def _bibliotecas(self):
+        """pg_stat_statements é pré-carregado quando a instalação o inclui"""
+        for diretorio in ('lib/postgresql', 'lib', 'lib64/pgsql'):
+            if os.path.exists(os.path.join(self.bin, '..', diretorio, 'pg_stat_statements.so')):
+                return '-c shared_preload_libraries=pg_stat_statements '
+        return ''
+
+    def iniciar(self):
+        dados = os.path.join(self.diretorio, 'dados')
+        if not os.path.exists(os.path.join(dados, 'PG_VERSION')):
+            self._executar('initdb', '-D', dados, '-U', self.usuario, '-A', 'trust', '-E', 'UTF8')
+        self._executar(
+            'pg_ctl', '-D', dados, '-l', os.path.join(self.diretorio, 'postgres.log'), '-w',
+            '-o', f"-p {self.porta} -k {self.diretorio} -c listen_addresses=127.0.0.1 "
+                  "-c fsync=off -c track_io_timing=on " + self._bibliotecas(),
+            'start')
+
+        with psycopg.connect(**{**self.config, 'dbname': 'postgres'}, autocommit=True) as conn:
+            existe = conn.execute("SELECT 1 FROM pg_database WHERE datname = %s",
+                                  (self.dbname,)).fetchone()
+            if not existe:
+                conn.execute(f'CREATE DATABASE {self.dbname}')
+        return self
+
+    def parar(self):
+        self._executar('pg_ctl', '-D', os.path.join(self.diretorio, 'dados'), '-m', 'fast', 'stop')
+        if not self.manter:
+            shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
@@ -0,0 +1,93 @@
+-- Esquema base usado pelas rotas de app.py (sem efeito em bancos que já o possuem)
+
+CREATE TABLE IF NOT EXISTS localizacoes (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL,
+    descricao TEXT,
+    tipo VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS dispositivos (
+    id SERIAL PRIMARY KEY,
+    localizacao_id INTEGER REFERENCES localizacoes(id),
+    nome VARCHAR(100) NOT NULL,
+    descricao TEXT,
+    mac_address VARCHAR(17) UNIQUE NOT NULL,
+    ip_address VARCHAR(45),
+    tipo VARCHAR(20) NOT NULL,
+    modelo VARCHAR(50),
+    online BOOLEAN DEFAULT false,
+    ultima_comunicacao TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS dataloggers (
+    id SERIAL PRIMARY KEY,
+    dispositivo_id INTEGER NOT NULL REFERENCES dispositivos(id),
+    quantidade_sensores INTEGER DEFAULT 0,
+    intervalo_leitura INTEGER DEFAULT 60
+);
+
+CREATE TABLE IF NOT EXISTS sensores (
+    id SERIAL PRIMARY KEY,
+    datalogger_id INTEGER NOT NULL REFERENCES dataloggers(id),
+    nome VARCHAR(100) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    unidade VARCHAR(20),
+    posicao VARCHAR(50),
+    endereco VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS leituras_sensores (
+    id BIGSERIAL PRIMARY KEY,
+    sensor_id INTEGER NOT NULL REFERENCES sensores(id),
+    valor DOUBLE PRECISION NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS alimentadores (
+    id SERIAL PRIMARY KEY,
+    dispositivo_id INTEGER NOT NULL REFERENCES dispositivos(id),
+    capacidade_racao DOUBLE PRECISION DEFAULT 0,
+    vazao_media DOUBLE PRECISION DEFAULT 0,
+    motor_ligado BOOLEAN DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS config_alimentadores (
+    id SERIAL PRIMARY KEY,
+    alimentador_id INTEGER NOT NULL REFERENCES alimentadores(id),
+    horario_inicio TIME,
+    horario_fim TIME,
+    intervalo INTEGER,
+    peso_diario DOUBLE PRECISION,
+    porcoes INTEGER,
+    ativa BOOLEAN DEFAULT false,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS calibracao_alimentadores (
+    id SERIAL PRIMARY KEY,
+    alimentador_id INTEGER NOT NULL REFERENCES alimentadores(id),
+    fator_calibracao DOUBLE PRECISION DEFAULT 1.0,
+    data_calibracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS limites_temperatura (
+    id SERIAL PRIMARY KEY,
+    localizacao_id INTEGER NOT NULL REFERENCES localizacoes(id),
+    tipo_sensor VARCHAR(50) NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS alertas (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    mensagem TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    severidade VARCHAR(20),
+    resolvido BOOLEAN DEFAULT false
+);
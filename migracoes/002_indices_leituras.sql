@@ -0,0 +1,14 @@
+-- sem-transacao
+-- Índices das janelas de tempo sobre leituras_sensores (dashboard, leituras,
+-- gráficos, /api/leituras e snapshot de estatísticas). CONCURRENTLY não bloqueia
+-- a ingestão enquanto os índices são construídos.
+
+-- Leituras de um sensor em um intervalo (rollups, estatísticas por sensor)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS leituras_sensores_sensor_timestamp_idx
+    ON leituras_sensores (sensor_id, timestamp);
+
+-- Filtros "timestamp >= NOW() - ..." e a paginação keyset por (timestamp, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS leituras_sensores_timestamp_idx
+    ON leituras_sensores (timestamp, id);
+
+ANALYZE leituras_sensores;
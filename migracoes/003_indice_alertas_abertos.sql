@@ -0,0 +1,8 @@
+-- sem-transacao
+-- Alertas não resolvidos: contagem do snapshot e lista do dashboard
+-- (ORDER BY timestamp DESC LIMIT 5) sem varrer o histórico de alertas.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS alertas_abertos_idx
+    ON alertas (timestamp DESC)
+    WHERE resolvido = false;
+
+ANALYZE alertas;
@@ -0,0 +1,7 @@
+-- Chaves estrangeiras usadas nos JOINs das páginas e dos cadastros
+CREATE INDEX IF NOT EXISTS sensores_datalogger_idx ON sensores (datalogger_id);
+CREATE INDEX IF NOT EXISTS dataloggers_dispositivo_idx ON dataloggers (dispositivo_id);
+CREATE INDEX IF NOT EXISTS dispositivos_localizacao_idx ON dispositivos (localizacao_id);
+CREATE INDEX IF NOT EXISTS alimentadores_dispositivo_idx ON alimentadores (dispositivo_id);
+CREATE INDEX IF NOT EXISTS config_alimentadores_alimentador_idx ON config_alimentadores (alimentador_id);
+CREATE INDEX IF NOT EXISTS limites_temperatura_localizacao_idx ON limites_temperatura (localizacao_id, tipo_sensor);
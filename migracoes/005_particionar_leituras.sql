@@ -0,0 +1,86 @@
+-- Particionamento mensal de leituras_sensores (PARTITION BY RANGE (timestamp)).
+-- A tabela é reescrita uma única vez em partições mensais preservando os ids,
+-- que o RollupWorker usa como marca d'água. Leituras de meses sem partição
+-- caem em leituras_sensores_padrao até que criar_particoes_leituras() crie o mês.
+
+-- Meses exportados para Parquet e removidos do banco pela política de retenção
+CREATE TABLE IF NOT EXISTS leituras_arquivo (
+    mes DATE PRIMARY KEY,
+    arquivo TEXT NOT NULL,
+    linhas BIGINT NOT NULL,
+    arquivado_em TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE leituras_sensores RENAME TO leituras_sensores_legado;
+ALTER INDEX IF EXISTS leituras_sensores_pkey RENAME TO leituras_sensores_legado_pkey;
+ALTER INDEX IF EXISTS leituras_sensores_sensor_timestamp_idx RENAME TO leituras_sensores_legado_sensor_timestamp_idx;
+ALTER INDEX IF EXISTS leituras_sensores_timestamp_idx RENAME TO leituras_sensores_legado_timestamp_idx;
+
+CREATE TABLE leituras_sensores (LIKE leituras_sensores_legado INCLUDING DEFAULTS)
+    PARTITION BY RANGE (timestamp);
+ALTER TABLE leituras_sensores ALTER COLUMN timestamp SET NOT NULL;
+CREATE TABLE leituras_sensores_padrao PARTITION OF leituras_sensores DEFAULT;
+
+-- A sequência dos ids passa a pertencer à nova tabela (senão cairia junto com a antiga)
+DO $$
+DECLARE
+    sequencia TEXT := pg_get_serial_sequence('leituras_sensores_legado', 'id');
+BEGIN
+    IF sequencia IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY leituras_sensores.id', sequencia);
+    END IF;
+END
+$$;
+
+-- Cria as partições mensais de [inicio, fim], movendo para cada uma as linhas
+-- do mês que estavam na partição padrão. Chamada pela aplicação
+-- (GerenciadorParticoes) para manter meses futuros sempre criados.
+CREATE OR REPLACE FUNCTION criar_particoes_leituras(inicio DATE, fim DATE) RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    mes DATE;
+    nome TEXT;
+    criadas INTEGER := 0;
+BEGIN
+    -- Mesmo lock do arquivamento: dois processos não criam/removem partições juntos
+    PERFORM pg_advisory_xact_lock(4491003);
+
+    FOR mes IN
+        SELECT generate_series(date_trunc('month', inicio), date_trunc('month', fim), INTERVAL '1 month')::date
+    LOOP
+        nome := 'leituras_sensores_' || to_char(mes, 'YYYY_MM');
+        CONTINUE WHEN to_regclass(nome) IS NOT NULL;
+
+        CREATE TEMP TABLE leituras_pendentes (LIKE leituras_sensores) ON COMMIT DROP;
+        WITH movidas AS (
+            DELETE FROM leituras_sensores_padrao
+            WHERE timestamp >= mes AND timestamp < mes + INTERVAL '1 month'
+            RETURNING *
+        )
+        INSERT INTO leituras_pendentes SELECT * FROM movidas;
+
+        EXECUTE format('CREATE TABLE %I PARTITION OF leituras_sensores FOR VALUES FROM (%L) TO (%L)',
+                       nome, mes, (mes + INTERVAL '1 month')::date);
+        INSERT INTO leituras_sensores SELECT * FROM leituras_pendentes;
+        DROP TABLE leituras_pendentes;
+        criadas := criadas + 1;
+    END LOOP;
+
+    RETURN criadas;
+END
+$$;
+
+SELECT criar_particoes_leituras(
+    COALESCE((SELECT MIN(timestamp) FROM leituras_sensores_legado)::date, CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::date);
+
+INSERT INTO leituras_sensores SELECT * FROM leituras_sensores_legado;
+DROP TABLE leituras_sensores_legado;
+
+-- Índices criados depois da carga; em tabelas particionadas a chave primária inclui a chave de partição
+ALTER TABLE leituras_sensores ADD PRIMARY KEY (id, timestamp);
+ALTER TABLE leituras_sensores ADD FOREIGN KEY (sensor_id) REFERENCES sensores(id);
+CREATE INDEX leituras_sensores_sensor_timestamp_idx ON leituras_sensores (sensor_id, timestamp);
+CREATE INDEX leituras_sensores_timestamp_idx ON leituras_sensores (timestamp, id);
+
+ANALYZE leituras_sensores;
@@ -0,0 +1,8 @@
+-- sem-transacao
+-- Alertas de presença (dispositivo offline) ligados ao dispositivo, com no
+-- máximo um alerta aberto por dispositivo e tipo, mesmo com vários processos.
+ALTER TABLE alertas ADD COLUMN IF NOT EXISTS dispositivo_id INTEGER REFERENCES dispositivos(id);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS alertas_dispositivo_aberto_idx
+    ON alertas (dispositivo_id, tipo)
+    WHERE resolvido = false AND dispositivo_id IS NOT NULL;
@@ -0,0 +1,40 @@
+-- Contador de versão dos cadastros, usado nos ETags/Last-Modified das páginas.
+-- Triggers por comando incrementam a versão a cada escrita nas tabelas de
+-- cadastro; a presença dos dispositivos (online, ultima_comunicacao) não conta.
+CREATE TABLE IF NOT EXISTS versoes_dados (
+    nome TEXT PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO versoes_dados (nome) VALUES ('cadastros') ON CONFLICT (nome) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_versao_dados() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE versoes_dados SET versao = versao + 1, atualizado_em = NOW()
+    WHERE nome = TG_ARGV[0];
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['localizacoes', 'dataloggers', 'sensores', 'alimentadores',
+                                  'config_alimentadores', 'calibracao_alimentadores', 'limites_temperatura']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tabela || '_versao', tabela);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_dados(''cadastros'')',
+                       tabela || '_versao', tabela);
+    END LOOP;
+END
+$$;
+
+DROP TRIGGER IF EXISTS dispositivos_versao ON dispositivos;
+CREATE TRIGGER dispositivos_versao
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF localizacao_id, nome, descricao, mac_address, ip_address, tipo, modelo
+    ON dispositivos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_dados('cadastros');
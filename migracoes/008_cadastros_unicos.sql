@@ -0,0 +1,24 @@
+-- Uma configuração por alimentador e um limite por (localização, tipo de sensor),
+-- para que os cadastros gravem com INSERT ... ON CONFLICT DO UPDATE em vez de
+-- SELECT seguido de UPDATE/INSERT. Duplicatas antigas: fica a mais recente.
+DELETE FROM config_alimentadores c
+USING config_alimentadores recente
+WHERE c.alimentador_id = recente.alimentador_id
+  AND (COALESCE(c.updated_at, '-infinity'), c.id)
+    < (COALESCE(recente.updated_at, '-infinity'), recente.id);
+
+DELETE FROM limites_temperatura l
+USING limites_temperatura recente
+WHERE l.localizacao_id = recente.localizacao_id
+  AND l.tipo_sensor = recente.tipo_sensor
+  AND (COALESCE(l.updated_at, '-infinity'), l.id)
+    < (COALESCE(recente.updated_at, '-infinity'), recente.id);
+
+-- Os índices únicos substituem os índices simples da migração 004
+DROP INDEX IF EXISTS config_alimentadores_alimentador_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS config_alimentadores_alimentador_unico
+    ON config_alimentadores (alimentador_id);
+
+DROP INDEX IF EXISTS limites_temperatura_localizacao_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS limites_temperatura_localizacao_unico
+    ON limites_temperatura (localizacao_id, tipo_sensor);
@@ -0,0 +1,8 @@
+-- sem-transacao
+-- Alertas de limite de temperatura (MotorAlertas) ligados ao sensor, com no
+-- máximo um alerta aberto por sensor e tipo, mesmo com vários processos.
+ALTER TABLE alertas ADD COLUMN IF NOT EXISTS sensor_id INTEGER;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS alertas_sensor_aberto_idx
+    ON alertas (sensor_id, tipo)
+    WHERE resolvido = false AND sensor_id IS NOT NULL;
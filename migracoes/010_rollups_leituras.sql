@@ -0,0 +1,46 @@
+-- Rollups por sensor mantidos pelo RollupWorker (1 minuto, 1 hora e 1 dia)
+-- e a marca d'água do que já foi agregado. Antes eram criados pela aplicação.
+CREATE TABLE IF NOT EXISTS leituras_rollup_1m (
+    sensor_id INTEGER NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    contagem BIGINT NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    soma DOUBLE PRECISION NOT NULL,
+    soma_quadrados DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS leituras_rollup_1m_bucket_idx ON leituras_rollup_1m (bucket);
+
+CREATE TABLE IF NOT EXISTS leituras_rollup_1h (
+    sensor_id INTEGER NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    contagem BIGINT NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    soma DOUBLE PRECISION NOT NULL,
+    soma_quadrados DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS leituras_rollup_1h_bucket_idx ON leituras_rollup_1h (bucket);
+
+CREATE TABLE IF NOT EXISTS leituras_rollup_1d (
+    sensor_id INTEGER NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    contagem BIGINT NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    soma DOUBLE PRECISION NOT NULL,
+    soma_quadrados DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS leituras_rollup_1d_bucket_idx ON leituras_rollup_1d (bucket);
+
+CREATE TABLE IF NOT EXISTS rollup_controle (
+    nome VARCHAR(50) PRIMARY KEY,
+    ultimo_id BIGINT NOT NULL
+);
+
+INSERT INTO rollup_controle (nome, ultimo_id)
+VALUES ('leituras_sensores', 0)
+ON CONFLICT (nome) DO NOTHING;
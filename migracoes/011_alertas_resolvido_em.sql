@@ -0,0 +1,4 @@
+-- Hora em que o alerta foi resolvido: a leitura que normalizou (MotorAlertas)
+-- ou o contato que trouxe o dispositivo de volta (MonitorPresenca). Picos
+-- curtos, abertos e normalizados no mesmo lote, são gravados já resolvidos.
+ALTER TABLE alertas ADD COLUMN IF NOT EXISTS resolvido_em TIMESTAMP;
@@ -0,0 +1,109 @@
+"""Migrações versionadas do esquema do banco.
+
+Cada arquivo NNN_descricao.sql deste diretório é uma migração, aplicada em
+ordem e registrada em `schema_migracoes`. Arquivos cuja primeira linha é
+`-- sem-transacao` rodam fora de transação, um comando por vez (necessário
+para CREATE INDEX CONCURRENTLY); os demais rodam em uma única transação.
+
+Uso: python -m migracoes aplicar | status | verificar (ver __main__.py)
+"""
+import os
+import re
+
+import psycopg
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Chave do advisory lock que impede dois processos de migrarem ao mesmo tempo
+MIGRACOES_LOCK_ID = 4491002
+
+RE_ARQUIVO = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+class Migracao:
+    def __init__(self, arquivo):
+        versao, nome = RE_ARQUIVO.match(arquivo).groups()
+        self.versao = int(versao)
+        self.nome = nome
+        self.arquivo = arquivo
+        with open(os.path.join(DIRETORIO, arquivo), encoding='utf-8') as f:
+            self.sql = f.read()
+        self.transacao = not self.sql.lstrip().startswith('-- sem-transacao')
+
+    def comandos(self):
+        """Comandos individuais (as migrações não usam ';' dentro de literais ou funções)"""
+        for comando in self.sql.split(';'):
+            linhas = [linha for linha in comando.splitlines() if not linha.strip().startswith('--')]
+            if ''.join(linhas).strip():
+                yield '\n'.join(linhas).strip()
+
+
+def listar():
+    """Migrações disponíveis, em ordem de versão"""
+    migracoes = [Migracao(arquivo) for arquivo in os.listdir(DIRETORIO) if RE_ARQUIVO.match(arquivo)]
+    return sorted(migracoes, key=lambda m: m.versao)
+
+
+def criar_controle(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def versoes_aplicadas(conn):
+    criar_controle(conn)
+    return {versao: aplicada_em for versao, aplicada_em in
+            conn.execute("SELECT versao, aplicada_em FROM schema_migracoes")}
+
+
+def indices_invalidos(conn):
+    """Índices deixados inválidos por um CREATE INDEX CONCURRENTLY interrompido"""
+    return [nome for nome, in conn.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid
+    """)]
+
+
+def aplicar(config, ate=None, progresso=print):
+    """Aplica as migrações pendentes (até a versão `ate`); retorna as versões aplicadas"""
+    aplicadas = []
+    with psycopg.connect(**config, autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (MIGRACOES_LOCK_ID,))
+        try:
+            existentes = versoes_aplicadas(conn)
+            for migracao in listar():
+                if migracao.versao in existentes or (ate is not None and migracao.versao > ate):
+                    continue
+                progresso(f"Aplicando {migracao.arquivo}")
+
+                if migracao.transacao:
+                    with conn.transaction():
+                        conn.execute(migracao.sql)
+                        conn.execute("INSERT INTO schema_migracoes (versao, nome) VALUES (%s, %s)",
+                                     (migracao.versao, migracao.nome))
+                else:
+                    for comando in migracao.comandos():
+                        conn.execute(comando)
+                    # IF NOT EXISTS aceitaria um índice inválido de uma tentativa anterior
+                    invalidos = indices_invalidos(conn)
+                    if invalidos:
+                        raise RuntimeError(
+                            f"Índices inválidos após {migracao.arquivo}: {', '.join(invalidos)}. "
+                            "Remova-os com DROP INDEX CONCURRENTLY e aplique novamente.")
+                    conn.execute("INSERT INTO schema_migracoes (versao, nome) VALUES (%s, %s)",
+                                 (migracao.versao, migracao.nome))
+                aplicadas.append(migracao.versao)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRACOES_LOCK_ID,))
+    return aplicadas
+
+
+def status(config):
+    """[(versao, arquivo, aplicada_em ou None)] de todas as migrações"""
+    with psycopg.connect(**config, autocommit=True) as conn:
+        existentes = versoes_aplicadas(conn)
+    return [(m.versao, m.arquivo, existentes.get(m.versao)) for m in listar()]
@@ -0,0 +1,49 @@
+"""Linha de comando das migrações.
+
+    python -m migracoes aplicar [--ate VERSAO]
+    python -m migracoes status
+    python -m migracoes verificar [--forcar-indices] [--planos]
+
+O banco é o de app.DB_CONFIG (variáveis DB_HOST, DB_PORT, DB_NAME, DB_USER e
+DB_PASSWORD). `verificar` termina com código 1 se alguma consulta das rotas
+fizer varredura sequencial em leituras_sensores, alertas ou nos rollups.
+"""
+import argparse
+import sys
+
+from app import DB_CONFIG
+from migracoes import aplicar, status
+from migracoes.verificacao import PAGINAS_MINIMAS, verificar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migracoes')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    p = subcomandos.add_parser('aplicar', help='aplica as migrações pendentes')
+    p.add_argument('--ate', type=int, help='última versão a aplicar')
+    subcomandos.add_parser('status', help='lista as migrações e quando foram aplicadas')
+    p = subcomandos.add_parser('verificar', help='EXPLAIN das consultas das rotas')
+    p.add_argument('--forcar-indices', action='store_true',
+                   help='desliga enable_seqscan (bancos pequenos de desenvolvimento)')
+    p.add_argument('--planos', action='store_true', help='mostra o plano de todas as consultas')
+    p.add_argument('--paginas-minimas', type=int, default=PAGINAS_MINIMAS,
+                   help='ignora tabelas menores que isto (páginas de 8 kB)')
+
+    args = parser.parse_args(argv)
+    if args.comando == 'aplicar':
+        aplicadas = aplicar(DB_CONFIG, ate=args.ate)
+        print(f"{len(aplicadas)} migração(ões) aplicada(s)")
+    elif args.comando == 'status':
+        for versao, arquivo, aplicada_em in status(DB_CONFIG):
+            print(f"{versao:>4}  {arquivo:<40} {aplicada_em or 'pendente'}")
+    else:
+        reprovadas = verificar(DB_CONFIG, forcar_indices=args.forcar_indices, mostrar_planos=args.planos,
+                               paginas_minimas=args.paginas_minimas)
+        if reprovadas:
+            print(f"{len(reprovadas)} consulta(s) com varredura sequencial em tabelas grandes")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Verificação dos planos das consultas das rotas com EXPLAIN.
+
+Monta as consultas exatamente como as rotas de app.py (com parâmetros
+típicos) e falha se o plano de alguma delas fizer varredura sequencial em
+uma das tabelas grandes.
+"""
+from datetime import datetime, timedelta
+
+import psycopg
+from flask import request
+
+import app as aplicacao
+
+# Tabelas em que uma varredura sequencial é considerada regressão
+TABELAS_GRANDES = {'leituras_sensores', 'alertas', 'leituras_rollup_1m', 'leituras_rollup_1h',
+                   'leituras_rollup_1d'}
+
+# Abaixo deste tamanho (páginas de 8 kB) varrer a tabela é legítimo
+PAGINAS_MINIMAS = 128
+
+
+def consulta_da_rota(funcao, query_string):
+    """Executa um montador de consulta de app.py no contexto de uma requisição"""
+    with aplicacao.app.test_request_context(f'/?{query_string}'):
+        return funcao(request.args)[:2]
+
+
+def consultas_das_rotas():
+    """[(nome, sql, params)] das consultas de leitura das rotas"""
+    cursor_pagina = aplicacao.codificar_cursor(datetime.now() - timedelta(hours=1), 2 ** 31)
+    snapshot = aplicacao.StatsSnapshot
+    consultas = [
+        ('dashboard: ultimas_leituras', aplicacao.SQL_ULTIMAS_LEITURAS,
+         (aplicacao.dimensao_sensores.sensores(),)),
+        ('dashboard: alertas_ativos', aplicacao.SQL_ALERTAS_ATIVOS, None),
+        ('api_estatisticas: snapshot',
+         snapshot.QUERY.format(temperatura_media=snapshot.TEMPERATURA_MEDIA_BRUTA), None),
+        ('leituras', *consulta_da_rota(aplicacao.consulta_leituras, '')),
+        ('leituras: filtros', *consulta_da_rota(aplicacao.consulta_leituras,
+                                                'horas=24&tipo=estufa&localizacao=Local+1')),
+        ('leituras: página anterior', *consulta_da_rota(aplicacao.consulta_leituras,
+                                                        f'antes={cursor_pagina}')),
+        ('api_leituras', *consulta_da_rota(aplicacao.consulta_api_leituras, 'horas=1')),
+        ('versao_dados', aplicacao.consulta_versao(leituras=True), None),
+    ]
+    # Sem rollups, janelas longas leem boa parte da tabela: só a janela padrão é verificada
+    parametros_graficos = aplicacao.dimensao_sensores.graficos()[0]
+    for horas in (aplicacao.GRAFICO_HORAS_PADRAO,):
+        bucket = aplicacao.calcular_bucket(horas, aplicacao.GRAFICO_LARGURA_PADRAO)
+        serie, quartis = aplicacao.consultas_graficos(bucket)
+        params = {'bucket': bucket, 'horas': horas, **parametros_graficos}
+        consultas.append((f'api_graficos {horas}h: serie', serie, params))
+        consultas.append((f'api_graficos {horas}h: quartis', quartis, params))
+
+    # Variantes usadas quando o RollupWorker já preencheu os rollups da migração 010
+    # (janelas que cobrem toda a retenção leem a tabela inteira e não entram na verificação)
+    consultas.append(('api_estatisticas: snapshot (rollup)',
+                      snapshot.QUERY.format(temperatura_media=snapshot.TEMPERATURA_MEDIA_ROLLUP), None))
+    aplicacao.rollup_worker.pronto = True
+    try:
+        for horas in (aplicacao.GRAFICO_HORAS_PADRAO,):
+            bucket = aplicacao.calcular_bucket(horas, aplicacao.GRAFICO_LARGURA_PADRAO)
+            serie, quartis = aplicacao.consultas_graficos(bucket)
+            params = {'bucket': bucket, 'horas': horas, **parametros_graficos}
+            consultas.append((f'api_graficos {horas}h: serie (rollup)', serie, params))
+            consultas.append((f'api_graficos {horas}h: quartis (rollup)', quartis, params))
+    finally:
+        aplicacao.rollup_worker.pronto = False
+    return consultas
+
+
+def nos_do_plano(plano):
+    yield plano
+    for filho in plano.get('Plans', []):
+        yield from nos_do_plano(filho)
+
+
+def verificar(config, forcar_indices=False, mostrar_planos=False, paginas_minimas=PAGINAS_MINIMAS,
+              progresso=print):
+    """Roda EXPLAIN em cada consulta; retorna a lista de consultas reprovadas.
+
+    Com `forcar_indices` (enable_seqscan = off) a verificação independe do
+    tamanho das tabelas: só sobra varredura sequencial onde nenhum índice
+    atende a consulta. Sem ela, tabelas com menos de `paginas_minimas`
+    páginas são ignoradas, já que nelas o planejador prefere a varredura.
+    """
+    reprovadas = []
+    with psycopg.connect(**config, autocommit=True) as conn:
+        if forcar_indices:
+            conn.execute("SET enable_seqscan = off")
+            paginas_minimas = 0
+
+        # Partições (leituras_sensores_2026_01, ...) são avaliadas pelo próprio tamanho e
+        # reportadas pelo nome da tabela mãe
+        tabela_logica = {}
+        for tabela, mae, relpages in conn.execute("""
+            SELECT c.relname, COALESCE(mae.relname, c.relname), c.relpages
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            LEFT JOIN pg_class mae ON mae.oid = i.inhparent
+            WHERE c.relkind = 'r' AND COALESCE(mae.relname, c.relname) = ANY(%s)
+        """, (list(TABELAS_GRANDES),)):
+            if relpages >= paginas_minimas:
+                tabela_logica[tabela] = mae
+
+        for nome, sql, params in consultas_das_rotas():
+            (plano,), = conn.execute("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()
+            nos = list(nos_do_plano(plano['Plan']))
+            varreduras = sorted({tabela_logica[no['Relation Name']] for no in nos
+                                 if no['Node Type'] == 'Seq Scan' and no.get('Relation Name') in tabela_logica})
+            indices = sorted({no['Index Name'] for no in nos if 'Index Name' in no})
+
+            if varreduras:
+                reprovadas.append(nome)
+                progresso(f"FALHA  {nome}: varredura sequencial em {', '.join(varreduras)}")
+            else:
+                progresso(f"ok     {nome}: {', '.join(indices) or 'sem tabelas grandes'}")
+
+            if mostrar_planos or varreduras:
+                for linha, in conn.execute("EXPLAIN " + sql, params):
+                    progresso(f"         {linha}")
+    return reprovadas
@@ -0,0 +1,12 @@
+"""Configuração dos testes: a aplicação é importada sem tarefas de fundo.
+
+Os testes cobrem a lógica que não depende do banco; nenhum deles abre
+conexão (o pool só é criado na primeira consulta).
+"""
+import os
+import sys
+
+for variavel in ('ROLLUP_ATIVO', 'PARTICOES_ATIVO', 'ALERTAS_ATIVO', 'PRESENCA_ATIVO', 'ESTATISTICAS_ATIVO'):
+    os.environ.setdefault(variavel, '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
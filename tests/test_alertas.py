@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from app import MotorAlertas
+
+INICIO = datetime(2024, 5, 1, 12)
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    motor = MotorAlertas(intervalo=300)
+    motor._limites = {(1, 'estufa'): (10.0, 30.0)}
+    motor._sensores = {7: (1, 'estufa', 'Galpão')}
+    motor._carregado = True
+    motor.gravados = []
+    monkeypatch.setattr(motor, '_gravar', lambda aberturas, resolucoes: motor.gravados.append((aberturas, resolucoes)))
+    monkeypatch.setattr(app.stats_snapshot, 'invalidate', lambda: None)
+    return motor
+
+
+def lote(*valores):
+    return [(7, valor, INICIO + timedelta(minutes=i)) for i, valor in enumerate(valores)]
+
+
+def test_violacao_abre_alerta(motor):
+    assert motor.avaliar(lote(35.0)) == 1
+    (aberturas, resolucoes), = motor.gravados
+    assert [linha[0] for linha in aberturas] == ['temperatura_alta']
+    assert aberturas[0][2:] == [INICIO, 'ALTA', 7, False, None]
+    assert resolucoes == []
+    assert (7, 'temperatura_alta') in motor._abertos
+
+
+def test_pico_curto_no_mesmo_lote_e_gravado_resolvido(motor):
+    motor.avaliar(lote(35.0, 20.0))
+    (aberturas, resolucoes), = motor.gravados
+    assert len(aberturas) == 1
+    assert aberturas[0][5:] == [True, INICIO + timedelta(minutes=1)]
+    assert resolucoes == []
+    assert not motor._abertos
+
+
+def test_alerta_aberto_que_normaliza_e_volta_a_violar(motor):
+    motor._abertos = {(7, 'temperatura_alta')}
+    motor.avaliar(lote(20.0, 36.0))
+    (aberturas, resolucoes), = motor.gravados
+    # A resolução do alerta antigo e a abertura do novo são escritas separadas
+    assert resolucoes == [(INICIO, 7, 'temperatura_alta')]
+    assert len(aberturas) == 1 and aberturas[0][5:] == [False, None]
+    assert motor._abertos == {(7, 'temperatura_alta')}
+
+
+def test_dois_picos_no_mesmo_lote(motor):
+    motor.avaliar(lote(35.0, 20.0, 36.0))
+    (aberturas, resolucoes), = motor.gravados
+    assert [linha[5] for linha in aberturas] == [True, False]
+    assert resolucoes == []
+
+
+def test_histerese_mantem_o_alerta_aberto(motor):
+    motor._abertos = {(7, 'temperatura_alta')}
+    assert motor.avaliar(lote(29.8)) == 0
+    assert motor.gravados == []
+
+
+def test_sensor_sem_limite_e_ignorado(motor):
+    assert motor.avaliar([(99, 50.0, INICIO)]) == 0
@@ -0,0 +1,56 @@
+from app import AgendaAlimentadores
+
+
+def horas(h, m=0):
+    return h * 3600 + m * 60
+
+
+def agenda(inicio, fim, intervalo=60, peso=240.0, porcoes=48, vazao=2.0, fator=None, ativa=True):
+    linha = (1, 'AA:BB', ativa, inicio, fim, intervalo, peso, porcoes, vazao, fator)
+    return AgendaAlimentadores.calcular([linha])['AA:BB']
+
+
+def horarios(resultado):
+    return [porcao['horario'] for porcao in resultado['porcoes']]
+
+
+def test_janela_no_mesmo_dia_inclui_o_fim():
+    resultado = agenda(horas(8), horas(12))
+    assert horarios(resultado) == ['08:00:00', '09:00:00', '10:00:00', '11:00:00', '12:00:00']
+    assert [porcao['gramas'] for porcao in resultado['porcoes']] == [48.0] * 5
+    assert resultado['porcoes'][0]['duracao_s'] == 24.0
+
+
+def test_janela_cruza_a_meia_noite():
+    resultado = agenda(horas(22), horas(2))
+    assert horarios(resultado) == ['22:00:00', '23:00:00', '00:00:00', '01:00:00', '02:00:00']
+
+
+def test_fim_igual_ao_inicio_e_o_dia_inteiro():
+    resultado = agenda(horas(6), horas(6), intervalo=180)
+    assert horarios(resultado) == ['06:00:00', '09:00:00', '12:00:00', '15:00:00',
+                                   '18:00:00', '21:00:00', '00:00:00', '03:00:00']
+    assert sum(porcao['gramas'] for porcao in resultado['porcoes']) == 240.0
+
+
+def test_dia_inteiro_com_intervalo_que_nao_divide_24h():
+    resultado = agenda(horas(0), horas(0), intervalo=7 * 60)
+    assert horarios(resultado) == ['00:00:00', '07:00:00', '14:00:00', '21:00:00']
+
+
+def test_porcoes_limitam_a_quantidade():
+    resultado = agenda(horas(6), horas(6), intervalo=30, porcoes=3)
+    assert horarios(resultado) == ['06:00:00', '06:30:00', '07:00:00']
+    assert [porcao['gramas'] for porcao in resultado['porcoes']] == [80.0] * 3
+
+
+def test_configuracao_inativa_ou_incompleta_nao_gera_porcoes():
+    assert agenda(horas(8), horas(12), ativa=False)['porcoes'] == []
+    assert agenda(None, horas(12))['porcoes'] == []
+    assert agenda(horas(8), horas(12), intervalo=0)['porcoes'] == []
+
+
+def test_calibracao_ajusta_a_duracao():
+    resultado = agenda(horas(8), horas(8, 30), intervalo=30, peso=100.0, fator=0.5)
+    assert resultado['vazao_efetiva'] == 1.0
+    assert [porcao['duracao_s'] for porcao in resultado['porcoes']] == [50.0, 50.0]
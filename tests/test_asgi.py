@@ -0,0 +1,22 @@
+import asyncio
+
+import app
+import asgi
+
+
+def test_versao_atual_sem_linhas_e_none(monkeypatch):
+    async def buscar(query, params=None):
+        return []
+
+    monkeypatch.setattr(app, 'versoes_disponiveis', lambda: True)
+    monkeypatch.setattr(asgi, 'buscar', buscar)
+    assert asyncio.run(asgi.versao_atual(leituras=True)) is None
+
+
+def test_versao_atual_retorna_a_linha(monkeypatch):
+    async def buscar(query, params=None):
+        return [(7, None)]
+
+    monkeypatch.setattr(app, 'versoes_disponiveis', lambda: True)
+    monkeypatch.setattr(asgi, 'buscar', buscar)
+    assert asyncio.run(asgi.versao_atual()) == (7, None)
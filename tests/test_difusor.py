@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import app
+from app import DifusorEstatisticas
+
+
+def alerta(alerta_id):
+    return (alerta_id, 'LIMITE', f'alerta {alerta_id}', datetime(2024, 5, 1, 12), 'ALTA')
+
+
+def test_alerta_com_id_menor_commitado_depois_e_publicado(monkeypatch):
+    difusor = DifusorEstatisticas(intervalo=1)
+    difusor._horizonte_alertas = app.HorizonteLeituras(folga=0)
+    respostas = [
+        [[(10,)], [(10, 100, 100)]],
+        # 12 visível antes de 11 (commit fora da ordem do id)
+        [[alerta(12)], [(12, 105, 101)]],
+        [[alerta(11), alerta(12)], [(12, 106, 106)]],
+        [[alerta(11), alerta(12)], [(12, 107, 107)]],
+        [[alerta(13)], [(13, 108, 108)]],
+    ]
+    pedidos = []
+
+    def consultar(*consultas):
+        pedidos.append(consultas[0])
+        return respostas.pop(0)
+
+    monkeypatch.setattr(app, 'consultar', consultar)
+    publicados = [[linha[0] for linha in difusor._alertas_novos()] for _ in range(5)]
+    assert publicados == [[], [12], [11], [], [13]]
+    # A marca só passa de 10 depois que o horizonte cobre o 12
+    assert [pedido[1][0] for pedido in pedidos[1:]] == [10, 10, 10, 12]
+    assert difusor._publicados == {13}
@@ -0,0 +1,111 @@
+import psycopg
+import pytest
+from flask import Response
+
+import app
+from app import DisjuntorBanco, ReservaPaginas
+
+
+class ConexaoFalsa:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+    def execute(self, sql):
+        pass
+
+
+@pytest.fixture
+def disjuntor(monkeypatch):
+    disjuntor = DisjuntorBanco(intervalo=5, limite=3)
+    # Sem thread de sonda nos testes: executar() é chamado diretamente
+    monkeypatch.setattr(disjuntor, 'iniciar', lambda: None)
+    return disjuntor
+
+
+def test_abre_apos_o_limite_de_falhas_seguidas(disjuntor):
+    disjuntor.registrar_falha('timeout')
+    disjuntor.registrar_falha('timeout')
+    assert not disjuntor.aberto
+    disjuntor.registrar_falha('timeout')
+    assert disjuntor.aberto
+
+
+def test_sucesso_zera_as_falhas(disjuntor):
+    disjuntor.registrar_falha('timeout')
+    disjuntor.registrar_falha('timeout')
+    disjuntor.registrar_sucesso()
+    disjuntor.registrar_falha('timeout')
+    disjuntor.registrar_falha('timeout')
+    assert not disjuntor.aberto
+
+
+def test_sonda_fecha_o_circuito_so_com_o_banco_de_volta(disjuntor, monkeypatch):
+    for _ in range(3):
+        disjuntor.registrar_falha('timeout')
+
+    def recusar(**config):
+        raise psycopg.OperationalError('connection refused')
+
+    monkeypatch.setattr(app.psycopg, 'connect', recusar)
+    disjuntor.executar()
+    assert disjuntor.aberto
+
+    monkeypatch.setattr(app.psycopg, 'connect', lambda **config: ConexaoFalsa())
+    disjuntor.executar()
+    assert not disjuntor.aberto
+    assert disjuntor.fechado_em > 0
+    # Fechado, as falhas recomeçam do zero
+    disjuntor.registrar_falha('timeout')
+    assert not disjuntor.aberto
+
+
+def test_circuito_aberto_falha_sem_tentar_conectar(monkeypatch):
+    disjuntor = DisjuntorBanco(intervalo=5, limite=1)
+    monkeypatch.setattr(disjuntor, 'iniciar', lambda: None)
+    disjuntor.registrar_falha('timeout')
+    monkeypatch.setattr(app, 'disjuntor_banco', disjuntor)
+    monkeypatch.setattr(app, 'get_pool', lambda: None)
+    with pytest.raises(app.DatabaseUnavailable):
+        with app.get_db_connection():
+            pass
+
+
+class PoolFalso:
+    max_size = 10
+
+    def getconn(self):
+        raise app.PoolTimeout('timeout do pool')
+
+
+@pytest.mark.parametrize('emprestadas, abre', [(10, False), (0, True)])
+def test_timeout_com_o_pool_ocupado_nao_abre_o_circuito(monkeypatch, emprestadas, abre):
+    disjuntor = DisjuntorBanco(intervalo=5, limite=1)
+    monkeypatch.setattr(disjuntor, 'iniciar', lambda: None)
+    monkeypatch.setattr(app, 'disjuntor_banco', disjuntor)
+    monkeypatch.setattr(app, 'get_pool', lambda: PoolFalso())
+    monkeypatch.setattr(app, '_emprestadas', emprestadas)
+    with pytest.raises(app.DatabaseUnavailable):
+        with app.get_db_connection():
+            pass
+    assert disjuntor.aberto is abre
+
+
+def test_reserva_descarta_as_paginas_mais_antigas():
+    reserva = ReservaPaginas(max_bytes=10)
+    reserva.guardar('/a', Response(b'12345', content_type='application/json'))
+    reserva.guardar('/b', Response(b'12345', content_type='application/json'))
+    reserva.guardar('/c', Response(b'123', content_type='application/json'))
+    assert reserva.responder('/a') is None
+    resposta = reserva.responder('/c')
+    assert resposta.get_data() == b'123'
+    assert resposta.headers['Warning'] == '110 - "Response is Stale"'
+    assert resposta.headers['Cache-Control'] == 'no-store'
+
+
+def test_reserva_avisa_nas_paginas_html():
+    reserva = ReservaPaginas(max_bytes=1000)
+    reserva.guardar('/p', Response(b'<main>' + app.MARCADOR_AVISO + b'</main>', content_type='text/html; charset=utf-8'))
+    assert b'Banco de dados indispon' in reserva.responder('/p').get_data()
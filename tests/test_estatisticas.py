@@ -0,0 +1,81 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import app
+from app import EstatisticasSensores
+
+
+def novas_estatisticas():
+    return EstatisticasSensores(intervalo=5, janelas=[300, 3600], divisoes=30)
+
+
+def test_media_desvio_minimo_e_maximo_da_janela():
+    estatisticas = novas_estatisticas()
+    agora = time.time()
+    valores = np.arange(20, dtype=np.float64)
+    estatisticas.incorporar(np.full(20, 7), valores, agora - 100 + np.arange(20))
+
+    resultado = estatisticas.sensor(7)
+    janela = resultado['janelas'][0]
+    assert janela['amostras'] == 20
+    assert math.isclose(janela['media'], valores.mean(), abs_tol=1e-3)
+    assert math.isclose(janela['desvio'], valores.std(ddof=1), abs_tol=1e-3)
+    assert (janela['minimo'], janela['maximo']) == (0, 19)
+    assert estatisticas.sensor(8) is None
+
+
+def test_leituras_antigas_saem_da_janela_curta():
+    estatisticas = novas_estatisticas()
+    agora = time.time()
+    estatisticas.incorporar(np.array([1, 1]), np.array([10.0, 30.0]), np.array([agora - 1000, agora - 10]))
+
+    curta, longa = estatisticas.sensor(1)['janelas']
+    assert curta['amostras'] == 1 and curta['media'] == 30
+    assert longa['amostras'] == 2 and longa['media'] == 20
+
+
+def test_ewma_em_lote_igual_a_sequencial():
+    tempos = time.time() - 600 + np.cumsum(np.random.default_rng(1).uniform(1, 20, 30))
+    valores = np.random.default_rng(2).normal(25, 3, 30)
+
+    em_lote = novas_estatisticas()
+    em_lote.incorporar(np.full(30, 1), valores, tempos)
+    uma_a_uma = novas_estatisticas()
+    for valor, tempo in zip(valores, tempos):
+        uma_a_uma.incorporar(np.array([1]), np.array([valor]), np.array([tempo]))
+
+    # Referência: e_n = a_n * e_(n-1) + (1 - a_n) * x_n
+    for j, tau in enumerate([300, 3600]):
+        esperado = valores[0]
+        for anterior, tempo, valor in zip(tempos[:-1], tempos[1:], valores[1:]):
+            alfa = math.exp(-(tempo - anterior) / tau)
+            esperado = alfa * esperado + (1 - alfa) * valor
+        assert math.isclose(em_lote._ewma[j, 0], esperado, rel_tol=1e-9)
+        assert math.isclose(uma_a_uma._ewma[j, 0], esperado, rel_tol=1e-9)
+
+
+def test_timestamps_do_banco_sao_hora_local():
+    estatisticas = novas_estatisticas()
+    instante = datetime.now().replace(microsecond=0) - timedelta(seconds=30)
+    estatisticas._incorporar_linhas([(3, 21.5, instante)])
+    assert estatisticas._ultimo_tempo[estatisticas._slots[3]] == instante.timestamp()
+
+
+def test_busca_nao_passa_do_horizonte(monkeypatch):
+    estatisticas = novas_estatisticas()
+    estatisticas._ultimo_id, estatisticas._horizonte = 100, 150
+    pedidos = []
+
+    def consultar(*consultas):
+        pedidos.append(consultas[0][1])
+        return [[(120, 1, 20.0, datetime.now())], [(400, 90, 80)]]
+
+    monkeypatch.setattr(app, 'consultar', consultar)
+    monkeypatch.setattr(app, 'horizonte_leituras', app.HorizonteLeituras(folga=0))
+    assert estatisticas.buscar_novas() == 1
+    assert pedidos[0][:2] == (100, 150)
+    # Lote incompleto: tudo até o horizonte anterior já foi visto, nada além dele
+    assert estatisticas._ultimo_id == 150
@@ -0,0 +1,77 @@
+import base64
+import time
+from array import array
+from datetime import datetime, timezone
+
+import pytest
+
+from app import GRAFICO_PONTOS_MAX, GRAFICO_PONTOS_MIN, calcular_bucket, montar_dados_graficos
+
+
+def test_bucket_rende_no_maximo_um_ponto_por_pixel():
+    for horas, largura in ((1, 1200), (24, 1200), (24 * 90, 800), (7, 333)):
+        bucket = calcular_bucket(horas, largura)
+        assert horas * 3600 / bucket <= largura
+        # O menor bucket que cumpre o limite
+        assert bucket == 1 or horas * 3600 / (bucket - 1) > largura
+
+
+def test_bucket_respeita_os_limites_de_pontos():
+    assert calcular_bucket(24, 10) == calcular_bucket(24, GRAFICO_PONTOS_MIN) == 24 * 3600 // GRAFICO_PONTOS_MIN
+    assert calcular_bucket(24, 100000) == calcular_bucket(24, GRAFICO_PONTOS_MAX)
+
+
+def decodificar(tipo, texto):
+    # O navegador lê como Int32Array/Float32Array little-endian
+    valores = array(tipo)
+    valores.frombytes(base64.b64decode(texto))
+    return valores.tolist()
+
+
+def test_payload_colunar_por_serie():
+    grupos = [('Estufa', 'entrada'), ('Galpão', None)]
+    tipos = ['entrada', None]
+    t0 = datetime(2024, 5, 1, 12)
+    t1 = datetime(2024, 5, 1, 12, 10)
+    dados = [
+        (0, t0, 20.0, 21.5, 23.0),
+        (0, t1, 19.5, 20.0, 20.5),
+        (1, t1, 30.0, 30.25, 30.5),
+    ]
+    quartis = [(0, 19.5, 20.0, 21.0, 22.0, 23.0)]
+
+    payload = montar_dados_graficos(dados, quartis, 600, grupos, tipos)
+
+    assert payload['bucket'] == 600
+    assert payload['inicio'] == int((t0 - datetime(1970, 1, 1)).total_seconds())
+    estufa, galpao = payload['series']
+    assert (estufa['localizacao'], estufa['tipo_sensor']) == ('Estufa', 'entrada')
+    assert decodificar('i', estufa['t']) == [0, 600]
+    assert decodificar('f', estufa['media']) == [21.5, 20.0]
+    assert decodificar('i', galpao['t']) == [600]
+    assert decodificar('f', galpao['maximo']) == [30.5]
+    assert payload['quartis'] == [{'tipo_sensor': 'entrada', 'minimo': 19.5, 'q1': 20.0, 'mediana': 21.0,
+                                   'q3': 22.0, 'maximo': 23.0}]
+
+
+def test_payload_sem_dados():
+    payload = montar_dados_graficos([], [], 60, [], [])
+    assert payload == {'bucket': 60, 'inicio': 0, 'series': [], 'quartis': []}
+
+
+@pytest.fixture
+def fuso_sao_paulo(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/Sao_Paulo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_instante_sem_fuso_volta_com_o_mesmo_horario(fuso_sao_paulo):
+    instante = datetime(2024, 5, 1, 23, 30)
+    payload = montar_dados_graficos([(0, instante, 1.0, 2.0, 3.0)], [], 60, [('Estufa', 'entrada')], ['entrada'])
+    segundos = payload['inicio'] + decodificar('i', payload['series'][0]['t'])[0]
+    # Mesmo cálculo do navegador: new Date(ms).toISOString().slice(0, 19).replace('T', ' ')
+    rotulo = datetime.fromtimestamp(segundos, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    assert rotulo == '2024-05-01 23:30:00'
@@ -0,0 +1,65 @@
+from app import ImportacaoCadastros
+
+
+def importar(**arquivos):
+    return ImportacaoCadastros(arquivos)
+
+
+def test_delimitador_detectado_pelo_cabecalho():
+    for separador in (',', ';', '\t'):
+        conteudo = separador.join(['nome', 'tipo', 'descricao']) + '\n' + separador.join(['Galpão 1', 'galpao', '"a, b"'])
+        importacao = importar(localizacoes=conteudo)
+        assert importacao.erros == []
+        assert importacao.linhas['localizacoes'][0]['nome'] == 'Galpão 1'
+        assert importacao.linhas['localizacoes'][0]['descricao'] == 'a, b'
+
+
+def test_cabecalho_ignora_maiusculas_e_espacos():
+    importacao = importar(localizacoes='Nome ; TIPO\nEstufa;estufa\n')
+    assert importacao.erros == []
+    assert importacao.linhas['localizacoes'][0]['tipo'] == 'estufa'
+
+
+def test_colunas_desconhecidas_ou_ausentes():
+    importacao = importar(localizacoes='nome;cor\nEstufa;azul\n')
+    assert importacao.erros == ['localizacoes.csv, linha 1: colunas desconhecidas: cor',
+                                'localizacoes.csv, linha 1: colunas obrigatórias ausentes: tipo']
+    assert importacao.linhas['localizacoes'] == []
+
+
+def test_campos_a_mais_que_o_cabecalho():
+    importacao = importar(localizacoes='nome,tipo\nEstufa,estufa,sobra\n')
+    assert importacao.erros == ['localizacoes.csv, linha 2: 1 campo(s) a mais que o cabeçalho']
+
+
+def test_obrigatorios_e_tamanhos_com_numero_da_linha():
+    importacao = importar(localizacoes='nome;tipo\nEstufa;\n' + 'x' * 101 + ';galpao\n')
+    assert importacao.erros == ["localizacoes.csv, linha 2: 'tipo' é obrigatório",
+                                "localizacoes.csv, linha 3: 'nome' excede 100 caracteres"]
+
+
+def test_numeros_aceitam_virgula_decimal():
+    importacao = importar(dispositivos=(
+        'nome;mac_address;tipo;vazao_media;intervalo_leitura\n'
+        'A1;AA:00;alimentador;2,5;\n'
+        'D1;DD:00;datalogger;;0\n'
+        'D2;DD:01;datalogger;abc;30\n'
+    ))
+    a1, d1, d2 = importacao.linhas['dispositivos']
+    assert a1['vazao_media'] == 2.5 and a1['intervalo_leitura'] == 60
+    assert importacao.erros == ["dispositivos.csv, linha 3: 'intervalo_leitura' fora do intervalo: 0",
+                                "dispositivos.csv, linha 4: 'vazao_media' não é um número válido: abc"]
+
+
+def test_tipos_macs_e_enderecos_repetidos():
+    importacao = importar(
+        dispositivos='nome,mac_address,tipo\nD1,DD:00,datalogger\nD2,DD:00,datalogger\nX,XX:00,sensor\nA1,AA:00,alimentador\n',
+        sensores='datalogger_mac,nome,tipo,endereco\nDD:00,S1,temperatura,28-01\nDD:00,S2,temperatura,28-01\n'
+                 'AA:00,S3,temperatura,28-02\nEE:00,S4,temperatura,28-01\n',
+    )
+    assert importacao.erros == [
+        'dispositivos.csv, linha 3: MAC repetido: DD:00',
+        'dispositivos.csv, linha 4: tipo deve ser alimentador ou datalogger: sensor',
+        'sensores.csv, linha 3: endereço 28-01 repetido no datalogger DD:00',
+        'sensores.csv, linha 4: AA:00 não é um datalogger',
+    ]
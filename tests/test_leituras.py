@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from app import DimensaoSensores, codificar_cursor, decodificar_cursor
+
+
+class CacheFixo:
+    """cache_metadados com a entrada 'contexto_sensores' fixa, sem banco"""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def obter(self, nome):
+        return self.linhas
+
+    def invalidate(self, *nomes):
+        pass
+
+
+@pytest.fixture
+def dimensao(monkeypatch):
+    dimensao = DimensaoSensores(CacheFixo([
+        (1, 'Estufa', 'entrada', 'DL-1'),
+        (2, 'Estufa', 'saida', 'DL-1'),
+        (3, 'Galpão', 'entrada', 'DL-2'),
+    ]))
+    monkeypatch.setattr(app, 'dimensao_sensores', dimensao)
+    return dimensao
+
+
+def consulta(funcao, query_string):
+    with app.app.test_request_context(f'/leituras?{query_string}'):
+        return funcao(app.request.args)
+
+
+def test_pagina_fica_nos_sensores_conhecidos_mesmo_sem_filtro(dimensao):
+    query, params, pagina = consulta(app.consulta_leituras, 'por_pagina=50')
+    assert 'ls.sensor_id = ANY(%s)' in query
+    assert sorted(params[1]) == [1, 2, 3]
+    assert params[-1] == 51
+
+
+def test_filtros_viram_lista_de_sensores(dimensao):
+    query, params, _ = consulta(app.consulta_leituras, 'localizacao=Estufa&tipo=entrada')
+    assert params[1] == [1]
+
+
+def test_transmissao_sem_filtro_nao_restringe_os_sensores(dimensao):
+    query, params = consulta(app.consulta_api_leituras, 'horas=1')
+    assert 'ANY' not in query
+    query, params = consulta(app.consulta_api_leituras, 'horas=1&tipo=saida')
+    assert params[-1] == [2]
+
+
+def test_linha_extra_indica_outra_pagina(dimensao):
+    agora = datetime(2024, 5, 1, 12)
+    linhas = [(1, 20.0, agora - timedelta(minutes=i), 100 - i) for i in range(4)]
+    with app.app.test_request_context('/leituras?por_pagina=3'):
+        _, _, pagina = app.consulta_leituras(app.request.args)
+        contexto = app.contexto_leituras(app.enriquecer_leituras(linhas), pagina)
+    assert len(contexto['leituras']) == 3
+    assert contexto['url_anterior'] is None
+    assert codificar_cursor(linhas[2][2], linhas[2][3]) in contexto['url_proxima'].replace('%3A', ':')
+
+
+def test_cursor_ida_e_volta():
+    instante = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decodificar_cursor(codificar_cursor(instante, 42)) == (instante, 42)
+    assert decodificar_cursor(codificar_cursor(datetime(2024, 5, 1), 7)) == (datetime(2024, 5, 1), 7)
+    for invalido in ('nao-e-um-cursor', '2024-05-01T12:00:00_x', '_42'):
+        with pytest.raises(ValueError):
+            decodificar_cursor(invalido)
+
+
+def test_pagina_anterior_e_seguinte_usam_o_cursor(dimensao):
+    cursor = codificar_cursor(datetime(2024, 5, 1, 12), 42)
+    query, params, pagina = consulta(app.consulta_leituras, f'antes={cursor}')
+    assert '(ls.timestamp, ls.id) < (%s, %s)' in query and 'DESC' in query
+    assert params[2:4] == [datetime(2024, 5, 1, 12), 42]
+
+    query, params, pagina = consulta(app.consulta_leituras, f'depois={cursor}')
+    assert '(ls.timestamp, ls.id) > (%s, %s)' in query and 'ASC' in query
+
+
+def test_cursor_invalido_e_erro_de_parametro(dimensao):
+    with pytest.raises(ValueError):
+        consulta(app.consulta_leituras, 'antes=lixo')
+
+
+def test_pagina_seguinte_volta_na_ordem_da_tela(dimensao):
+    agora = datetime(2024, 5, 1, 12)
+    # Busca ascendente (depois=...): a página é invertida para a ordem decrescente
+    linhas = [(1, 20.0, agora + timedelta(minutes=i), 200 + i) for i in range(3)]
+    cursor = codificar_cursor(agora - timedelta(minutes=1), 199)
+    with app.app.test_request_context(f'/leituras?por_pagina=3&depois={cursor}'):
+        _, _, pagina = app.consulta_leituras(app.request.args)
+        contexto = app.contexto_leituras(app.enriquecer_leituras(linhas), pagina)
+    assert [linha[5] for linha in contexto['leituras']] == [202, 201, 200]
+    assert contexto['url_anterior'] is None
+    assert contexto['url_proxima'] is not None
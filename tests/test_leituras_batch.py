@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+from app import converter_timestamp
+
+
+def test_epoch_vira_hora_local_sem_fuso():
+    instante = converter_timestamp(1700000000)
+    assert instante.tzinfo is None
+    assert instante == datetime.fromtimestamp(1700000000)
+    assert converter_timestamp(1700000000.5) == datetime.fromtimestamp(1700000000.5)
+
+
+def test_iso_com_fuso_vira_hora_local():
+    instante = converter_timestamp('2024-03-01T12:00:00+00:00')
+    assert instante.tzinfo is None
+    esperado = datetime(2024, 3, 1, 12, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert instante == esperado
+    assert converter_timestamp('2024-03-01T12:00:00Z') == esperado
+
+
+def test_iso_sem_fuso_e_mantido():
+    assert converter_timestamp('2024-03-01T12:00:00') == datetime(2024, 3, 1, 12)
+
+
+def test_omitido_usa_o_horario_local_atual():
+    instante = converter_timestamp(None)
+    assert instante.tzinfo is None
+    assert abs(datetime.now() - instante) < timedelta(seconds=5)
+
+
+def test_lote_misto_pode_ser_ordenado():
+    # MotorAlertas.avaliar ordena o lote pelo timestamp
+    instantes = [converter_timestamp(valor) for valor in
+                 (1700000000, '2023-11-14T22:00:00+00:00', '2023-11-14T10:00:00', None)]
+    assert sorted(instantes)[-1] == instantes[-1]
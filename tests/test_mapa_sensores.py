@@ -0,0 +1,49 @@
+import pytest
+
+from app import MapaSensores
+
+
+@pytest.fixture
+def mapa(monkeypatch):
+    mapa = MapaSensores(ttl=60)
+    mapa.cadastro = {'28-01': 1, '28-02': 2}
+    mapa.consultas = 0
+
+    def consultar(mac_address):
+        mapa.consultas += 1
+        return dict(mapa.cadastro)
+
+    monkeypatch.setattr(mapa, '_consultar', consultar)
+    return mapa
+
+
+def test_canal_sem_cadastro_nao_consulta_a_cada_lote(mapa):
+    for _ in range(5):
+        assert mapa.sensores_do_datalogger('DL:1', {'28-01', '28-99'}) == {'28-01': 1, '28-02': 2}
+    assert mapa.consultas == 1
+
+
+def test_endereco_novo_recarrega_uma_vez(mapa):
+    mapa.sensores_do_datalogger('DL:1', {'28-01', '28-99'})
+    mapa.cadastro['28-03'] = 3
+    assert mapa.sensores_do_datalogger('DL:1', {'28-03'})['28-03'] == 3
+    assert mapa.consultas == 2
+    # 28-99 continua anotado como ausente depois da recarga
+    mapa.sensores_do_datalogger('DL:1', {'28-99'})
+    assert mapa.consultas == 2
+
+
+def test_ausentes_expiram_apos_o_ttl(mapa, monkeypatch):
+    mapa.sensores_do_datalogger('DL:1', {'28-99'})
+    mapa.cadastro['28-99'] = 99
+    monkeypatch.setattr(mapa, 'ttl', 0)
+    assert mapa.sensores_do_datalogger('DL:1', {'28-99'})['28-99'] == 99
+    assert mapa.consultas == 2
+
+
+def test_invalidate_descarta_mapa_e_ausentes(mapa):
+    mapa.sensores_do_datalogger('DL:1', {'28-99'})
+    mapa.cadastro['28-99'] = 99
+    mapa.invalidate()
+    assert mapa.sensores_do_datalogger('DL:1', {'28-99'})['28-99'] == 99
+    assert mapa.consultas == 2
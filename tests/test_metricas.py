@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import app
+
+
+def amostras(metrica):
+    return [linha for linha in metrica.exportar() if not linha.startswith('#')]
+
+
+def test_pipeline_e_registrado_como_um_bloco(monkeypatch):
+    consultas = app.Histograma('teste_consulta_segundos', 'teste', ('origem', 'consulta'))
+    lentas = app.Contador('teste_lentas_total', 'teste', ('origem', 'consulta'))
+    monkeypatch.setattr(app, 'METRICA_CONSULTAS', consultas)
+    monkeypatch.setattr(app, 'METRICA_LENTAS', lentas)
+    cursores = [
+        SimpleNamespace(_consulta=('dashboard', 'ultimas_leituras'), _sql='SELECT 1'),
+        SimpleNamespace(_consulta=('dashboard', 'alertas_ativos'), _sql='SELECT 2'),
+    ]
+
+    app.registrar_pipeline(cursores, app.CONSULTA_LENTA_MS / 1000 + 0.1)
+
+    assert 'teste_consulta_segundos_count{origem="dashboard",consulta="ultimas_leituras+alertas_ativos"} 1' \
+        in amostras(consultas)
+    assert amostras(lentas) == ['teste_lentas_total{origem="dashboard",consulta="ultimas_leituras+alertas_ativos"} 1']
+
+
+def test_pipeline_vazio_nao_registra(monkeypatch):
+    consultas = app.Histograma('teste_consulta_segundos', 'teste', ('origem', 'consulta'))
+    monkeypatch.setattr(app, 'METRICA_CONSULTAS', consultas)
+    app.registrar_pipeline([], 1.0)
+    assert amostras(consultas) == []
@@ -0,0 +1,40 @@
+import os
+import re
+
+import migracoes
+
+# Esquema permanente (CREATE TEMP TABLE e as partições mensais continuam na aplicação)
+RE_DDL = re.compile(r'\b(ALTER TABLE|CREATE (UNIQUE )?INDEX|CREATE TABLE)\b')
+
+
+def test_versoes_unicas_e_em_sequencia():
+    versoes = [migracao.versao for migracao in migracoes.listar()]
+    assert versoes == list(range(1, len(versoes) + 1))
+
+
+def test_indices_concorrentes_rodam_fora_de_transacao():
+    for migracao in migracoes.listar():
+        if re.search(r'\bCONCURRENTLY\b', migracao.sql):
+            assert not migracao.transacao, migracao.arquivo
+
+
+def test_comandos_ignoram_comentarios():
+    migracao = next(m for m in migracoes.listar() if m.versao == 9)
+    comandos = list(migracao.comandos())
+    assert len(comandos) == 2
+    assert comandos[0].startswith('ALTER TABLE alertas ADD COLUMN IF NOT EXISTS sensor_id')
+    assert 'CREATE UNIQUE INDEX CONCURRENTLY' in comandos[1]
+
+
+def test_aplicacao_nao_cria_esquema_em_tempo_de_execucao():
+    raiz = os.path.dirname(migracoes.DIRETORIO)
+    for nome in ('app.py', 'asgi.py'):
+        with open(os.path.join(raiz, nome), encoding='utf-8') as arquivo:
+            fonte = arquivo.read()
+        assert not RE_DDL.search(fonte), nome
+
+
+def test_rollups_vem_das_migracoes():
+    sql = '\n'.join(migracao.sql for migracao in migracoes.listar())
+    for tabela in ('leituras_rollup_1m', 'leituras_rollup_1h', 'leituras_rollup_1d', 'rollup_controle'):
+        assert f'CREATE TABLE IF NOT EXISTS {tabela} (' in sql
@@ -0,0 +1,71 @@
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from flask import Response
+from werkzeug.datastructures import MultiDict
+
+import app
+
+CORPO = ('{"leituras": [' + ','.join(['{"valor": 21.5}'] * 200) + ']}').encode('utf-8')
+
+
+def comprimir(corpo, aceitas, mimetype='application/json', **kwargs):
+    with app.app.test_request_context('/', headers={'Accept-Encoding': aceitas}):
+        return app.comprimir_resposta(Response(corpo, mimetype=mimetype, **kwargs))
+
+
+def test_gzip_quando_brotli_nao_e_aceito():
+    resposta = comprimir(CORPO, 'gzip')
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(resposta.get_data()) == CORPO
+    assert 'Accept-Encoding' in resposta.vary
+
+
+@pytest.mark.skipif(app.brotli is None, reason='Brotli não instalado')
+def test_brotli_tem_preferencia():
+    resposta = comprimir(CORPO, 'gzip, br')
+    assert resposta.headers['Content-Encoding'] == 'br'
+    assert app.brotli.decompress(resposta.get_data()) == CORPO
+
+
+def test_respostas_pequenas_binarias_ou_sem_aceite_passam_direto():
+    assert 'Content-Encoding' not in comprimir(b'{}', 'gzip').headers
+    assert 'Content-Encoding' not in comprimir(CORPO, 'gzip', mimetype='image/png').headers
+    assert 'Content-Encoding' not in comprimir(CORPO, 'identity').headers
+    assert 'Content-Encoding' not in comprimir(CORPO, 'gzip', status=304).headers
+
+
+def test_etag_forte_vira_fraco_ao_comprimir():
+    with app.app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+        resposta = Response(CORPO, mimetype='application/json')
+        resposta.set_etag('abc')
+        resposta = app.comprimir_resposta(resposta)
+    assert resposta.get_etag() == ('abc', True)
+
+
+def test_etag_leituras_ignora_a_ordem_dos_filtros():
+    versao = (10, None, 500)
+    with app.app.test_request_context('/'):
+        a = app.etag_leituras(versao, MultiDict([('de', '2024-01-01'), ('tipo', 'estufa')]))
+        b = app.etag_leituras(versao, MultiDict([('tipo', 'estufa'), ('de', '2024-01-01')]))
+        c = app.etag_leituras((10, None, 501), MultiDict([('tipo', 'estufa'), ('de', '2024-01-01')]))
+    assert a == b != c
+
+
+def test_nao_modificado_por_if_none_match():
+    with app.app.test_request_context('/', headers={'If-None-Match': 'W/"abc"'}):
+        resposta = app.nao_modificado('abc')
+        assert resposta.status_code == 304
+        assert resposta.get_etag() == ('abc', True)
+        assert resposta.headers['Cache-Control'] == 'no-cache'
+        assert app.nao_modificado('outro') is None
+
+
+def test_nao_modificado_por_if_modified_since():
+    # versoes_dados.atualizado_em é TIMESTAMPTZ
+    alteracao = datetime(2024, 5, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    with app.app.test_request_context('/', headers={'If-Modified-Since': 'Wed, 01 May 2024 12:00:00 GMT'}):
+        assert app.nao_modificado('abc', alteracao).status_code == 304
+        assert app.nao_modificado('abc', datetime(2024, 5, 1, 12, 0, 1, tzinfo=timezone.utc)) is None
+        assert app.nao_modificado('abc') is None
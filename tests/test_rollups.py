@@ -0,0 +1,46 @@
+import app
+from app import HorizonteLeituras
+
+
+def test_horizonte_comeca_em_zero_e_so_avanca_apos_a_folga():
+    horizonte = HorizonteLeituras(folga=5)
+    assert horizonte.observar(100, xmax=50, xmin=50, agora=0) == 0
+    # Transações anteriores já terminaram, mas a folga ainda não passou
+    assert horizonte.observar(120, xmax=55, xmin=55, agora=1) == 0
+    assert horizonte.observar(130, xmax=60, xmin=60, agora=5) == 100
+
+
+def test_horizonte_espera_transacoes_em_andamento():
+    horizonte = HorizonteLeituras(folga=0)
+    horizonte.observar(100, xmax=50, xmin=40, agora=0)
+    # A transação 45 (ids possivelmente abaixo de 100) continua aberta
+    assert horizonte.observar(150, xmax=60, xmin=45, agora=10) == 0
+    assert horizonte.observar(160, xmax=61, xmin=49, agora=20) == 0
+    assert horizonte.observar(170, xmax=62, xmin=50, agora=30) == 100
+
+
+def test_candidato_pendente_nao_e_substituido():
+    horizonte = HorizonteLeituras(folga=0)
+    horizonte.observar(100, xmax=50, xmin=50, agora=0)
+    # Sob carga contínua o candidato antigo amadurece em vez de ser trocado pelo mais novo
+    assert horizonte.observar(200, xmax=70, xmin=50, agora=1) == 100
+    assert horizonte.observar(300, xmax=90, xmin=70, agora=2) == 200
+
+
+def test_horizonte_nao_regride():
+    horizonte = HorizonteLeituras(folga=0)
+    horizonte.observar(100, xmax=50, xmin=50, agora=0)
+    assert horizonte.observar(100, xmax=50, xmin=50, agora=1) == 100
+    assert horizonte.observar(90, xmax=51, xmin=51, agora=2) == 100
+
+
+def test_escolher_rollup_usa_a_resolucao_mais_grossa_que_cabe():
+    app.rollup_worker.pronto = True
+    try:
+        assert app.escolher_rollup(30) is None
+        assert app.escolher_rollup(60) == 'leituras_rollup_1m'
+        assert app.escolher_rollup(7200) == 'leituras_rollup_1h'
+        assert app.escolher_rollup(86400 * 7) == 'leituras_rollup_1d'
+    finally:
+        app.rollup_worker.pronto = False
+    assert app.escolher_rollup(86400) is None